@@ -1,20 +1,39 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-from concurrent.futures import ThreadPoolExecutor, as_completed
-import requests
-from PIL import Image, ImageTk, ImageDraw, ImageFont, UnidentifiedImageError
+from concurrent.futures import FIRST_COMPLETED, Future, InvalidStateError, ThreadPoolExecutor, wait
 import io
 import json
 import threading
+import time
 import webbrowser
 import logging
 import os
+from prismic import AvatarDatabase, SearchEngine, profiling
+from prismic.atlas import PageAtlas
+from prismic.badges import Badges
+from prismic.details import DetailsClient
+from prismic.metrics import Metrics
+from prismic.thumbnails import ThumbnailCache, decode_tile, encode_tile
+from ui_bus import UIBus
 
-# Setup logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# API Base URL, PRISMIC_API_BASE points the browser at benchmarks.stub_api instead
+API_BASE = os.environ.get("PRISMIC_API_BASE", "https://api.vrchat.cloud/api/1")
+
+# Columns and row
+COLUMNS = 10
+ROWS = 10
+
+# Multiplication for the number of avatars to load
+AVATARS_PER_PAGE = COLUMNS * ROWS
+
+# How often the network panel drains the metrics queue
+METRICS_INTERVAL_MS = 500
+
+# An atlas page is pushed to Tk at most this often while its images arrive
+ATLAS_REFRESH_SECONDS = 0.25
+
+# Bytes of a progressive JPEG downloaded before a preview is decoded from them
+PREVIEW_BYTES = 16 * 1024
 
 # Load config
 def load_config():
@@ -22,479 +41,890 @@ def load_config():
     if not os.path.exists(config_path):
         messagebox.showerror("Error", "Please run login.py first to authenticate")
         exit(1)
-    
+
     with open(config_path, 'r') as f:
         return json.load(f)
 
-# Config
-config = load_config()
-auth_cookie = config["auth_cookie"]
-user_id = config["user_id"]
-
-# API Base URL
-API_BASE = "https://api.vrchat.cloud/api/1"
-
-# Columns and row
-COLUMNS = 10
-ROWS = 10
+class SingleFlight:
+    """Collapse concurrent calls that share a key into one call.
+
+    The first caller for a key runs the function, every caller that arrives
+    while it is still running waits for and receives the same result.
+    Callers that joined a running call are reported to metrics as hits.
+    """
+    def __init__(self, name=None, metrics=None):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.name = name
+        self.metrics = metrics
+
+    def do(self, key, fn, *args):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if self.metrics is not None:
+            self.metrics.cache_lookup(self.name, not leader)
+        if not leader:
+            return future.result()
 
-# Multiplication for the number of avatars to load
-AVATARS_PER_PAGE = COLUMNS * ROWS
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+class PageLoad:
+    """One page load. cancel() stops what it started and drops its results.
+
+    cancelled is a future so that a thread waiting on the page's requests
+    also wakes up when the load is superseded; is_set() lets it stand in
+    for a threading.Event.
+    """
+    def __init__(self, generation):
+        self.generation = generation
+        self.cancelled = Future()
+
+    def cancel(self):
+        try:
+            self.cancelled.set_result(True)
+        except InvalidStateError:
+            pass
+
+    def is_set(self):
+        return self.cancelled.done()
+
+class AvatarBrowser:
+    """Avatar browser window.
+
+    The window is built and shown before anything slow happens: the store
+    is opened on a background thread (it may have to be built from the
+    JSON cache first) and the current avatar is fetched on another.
+
+    Worker threads never touch widgets. They post to self.bus, which the
+    Tk thread drains in short batches; images are decoded to PIL on the
+    workers and only turned into PhotoImages on the Tk thread. requests
+    and PIL are only imported by the code that uses them.
+    """
+    def __init__(self, config):
+        self.auth_cookie = config["auth_cookie"]
+        self.user_id = config["user_id"]
+
+        # Set once the background load finishes, searching waits for it
+        self.store = None
+        self.search_engine = None
+        self.thumbnails = None
+        self.badges = None
+
+        self.current_query = {"name_desc": "", "author": "", "platforms": [], "fuzzy": False, "exact_author": False}
+        self.filtered_total = 0
+        self.current_page = 0
+        self.avatar_widgets = []
+        self.tile_labels = {}  # avatar_id -> image label of its widget tile
+        self.placeholder_photos = {}
+        self.banned_avatars_count = 0  # Counter for banned/deleted avatars
+
+        # Every page load runs on one pool; starting a load cancels the one before
+        self.page_executor = ThreadPoolExecutor(max_workers=10, thread_name_prefix="page")
+        self.page_generation = 0
+        self.page_load = None
+
+        # Low quality previews of progressive JPEGs while the rest downloads
+        self.progressive_previews = config.get("progressive_previews", True)
+
+        # Atlas mode draws a page as one image, atlas_avatars maps hits back to avatars
+        self.atlas = PageAtlas(COLUMNS)
+        self.atlas_image = None
+        self.atlas_avatars = []
+
+        # Fed by worker threads, drained on the Tk thread by refresh_metrics
+        self.metrics = Metrics()
+
+        # In-flight request deduplication for details and images
+        self.details_flight = SingleFlight('details', self.metrics)
+        self.image_flight = SingleFlight('thumbnails', self.metrics)
+
+        # Lists an author's avatars once instead of fetching each tile's details
+        self.details_client = DetailsClient(
+            API_BASE, {"Cookie": f"auth={self.auth_cookie}", "User-Agent": "VRChatAPI/1.0"},
+            self.fetch_avatar_details, self.metrics
+        )
+
+        self.root = tk.Tk()
+        self.root.title("VRChat Avatar Browser Prismic database By FR_KF_FR")
+        self.root.geometry("1800x1000")
+        self.bus = UIBus(self.root)
+        self.create_ui_elements()
+
+    def create_ui_elements(self):
+        root = self.root
+
+        # Frame for loading at the bottom left
+        loading_frame = tk.Frame(root, width=200, height=50)
+        loading_frame.pack(side="bottom", anchor="w", padx=10, pady=10)
+
+        # Loading
+        self.loading_label = tk.Label(loading_frame, text="Loading Avatars...", font=("Arial", 12))
+        self.progress_var_avatars = tk.DoubleVar()  # Progress for avatar data
+        self.progress_bar_avatars = ttk.Progressbar(loading_frame, variable=self.progress_var_avatars, maximum=100, length=180)
+
+        self.progress_var_images = tk.DoubleVar()  # Progress for image fetching
+        self.progress_bar_images = ttk.Progressbar(loading_frame, variable=self.progress_var_images, maximum=100, length=180)
+
+        # Banned avatars counter
+        self.banned_count_label = tk.Label(loading_frame, text=f"Banned Avatars: {self.banned_avatars_count}", font=("Arial", 12))
+        self.banned_count_label.pack(side="left", padx=10)
+
+        # Live network and cache numbers
+        metrics_frame = tk.LabelFrame(loading_frame, text="Network", font=("Arial", 10))
+        metrics_frame.pack(side="left", padx=10)
+        self.metrics_label = tk.Label(metrics_frame, text="No requests yet", font=("Arial", 9), justify="left", anchor="w")
+        self.metrics_label.pack(padx=5)
+
+        # Frame for search and filters
+        filter_frame = tk.Frame(root)
+        filter_frame.pack(pady=10)
+
+        # Frame for Current Avatar Info (inside filter frame)
+        current_avatar_frame = tk.Frame(filter_frame)
+        current_avatar_frame.grid(row=0, column=0, rowspan=2, padx=10, pady=5, sticky="w")
+
+        self.current_avatar_img_label = tk.Label(current_avatar_frame)
+        self.current_avatar_img_label.pack(side="top", pady=5)
+
+        self.current_avatar_name_label = tk.Label(current_avatar_frame, text="Current Avatar", font=("Arial", 12, "bold"), wraplength=100)
+        self.current_avatar_name_label.pack(side="top")
+
+        # Name/Description Search
+        self.search_var = tk.StringVar()
+        search_entry = tk.Entry(filter_frame, textvariable=self.search_var, font=("Arial", 14), width=50)
+        search_label = tk.Label(filter_frame, text="Search Name/Description (name: desc: author: platform: -not OR):", font=("Arial", 12))
+
+        # Author Search
+        self.author_var = tk.StringVar()
+        author_entry = tk.Entry(filter_frame, textvariable=self.author_var, font=("Arial", 14), width=50)
+        author_label = tk.Label(filter_frame, text="Search Author:", font=("Arial", 12))
+
+        # Platform filter checkboxes
+        self.platforms_var = {"PC": tk.BooleanVar(), "Quest": tk.BooleanVar(), "iOS": tk.BooleanVar()}
+        platforms_frame = tk.LabelFrame(filter_frame, text="Filter by Platforms", font=("Arial", 12), padx=10, pady=10)
+
+        pc_checkbox = tk.Checkbutton(platforms_frame, text="PC", variable=self.platforms_var["PC"])
+        quest_checkbox = tk.Checkbutton(platforms_frame, text="Quest", variable=self.platforms_var["Quest"])
+        ios_checkbox = tk.Checkbutton(platforms_frame, text="iOS", variable=self.platforms_var["iOS"])
+
+        # Page navigation buttons
+        page_nav_frame = tk.Frame(filter_frame)
+        prev_button = tk.Button(page_nav_frame, text="Previous", command=lambda: self.change_page(-1))
+        prev_button.grid(row=0, column=0, padx=5)
+
+        self.page_label = tk.Label(page_nav_frame, text="Page 1")
+        self.page_label.grid(row=0, column=1, padx=5)
+
+        next_button = tk.Button(page_nav_frame, text="Next", command=lambda: self.change_page(1))
+        next_button.grid(row=0, column=2, padx=5)
+
+        search_label.grid(row=0, column=1, padx=5, pady=5)
+        search_entry.grid(row=1, column=1, padx=5, pady=5)
+        author_label.grid(row=0, column=2, padx=5, pady=5)
+        author_entry.grid(row=1, column=2, padx=5, pady=5)
+        platforms_frame.grid(row=0, column=3, rowspan=2, padx=5, pady=5)
+        pc_checkbox.grid(row=0, column=0, padx=10, pady=5)
+        quest_checkbox.grid(row=0, column=1, padx=10, pady=5)
+        ios_checkbox.grid(row=0, column=2, padx=10, pady=5)
+        page_nav_frame.grid(row=0, column=4, rowspan=2, padx=5, pady=5)
+
+        # Typo tolerant name search
+        self.fuzzy_var = tk.BooleanVar()
+        fuzzy_checkbox = tk.Checkbutton(filter_frame, text="Fuzzy name match", variable=self.fuzzy_var)
+        fuzzy_checkbox.grid(row=2, column=1, padx=5, sticky="w")
+
+        # Draw pages as a single image instead of a grid of widgets
+        self.atlas_var = tk.BooleanVar()
+        atlas_checkbox = tk.Checkbutton(filter_frame, text="Atlas view (faster)", variable=self.atlas_var)
+        atlas_checkbox.grid(row=2, column=2, padx=5, sticky="w")
+
+        # Search Button, enabled once the database is loaded
+        self.search_button = tk.Button(filter_frame, text="Search", command=lambda: self.filter_avatars(0), state="disabled")
+        self.search_button.grid(row=3, column=0, columnspan=5, pady=10)
+
+        # Scrollable frame
+        self.canvas = tk.Canvas(root)
+        scrollbar = ttk.Scrollbar(root, orient="vertical", command=self.canvas.yview)
+        self.scrollable_frame = ttk.Frame(self.canvas)
+
+        self.scrollable_frame.bind(
+            "<Configure>",
+            lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all"))
+        )
+
+        self.frame_window = self.canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        self.atlas.background = tuple(value // 257 for value in self.canvas.winfo_rgb(self.canvas.cget("bg")))
+        self.canvas.tag_bind("atlas", "<Button-1>", self.on_atlas_click)
+        self.atlas_menu = tk.Menu(root, tearoff=0)
+
+        self.canvas.bind_all("<MouseWheel>", self.on_mouse_wheel)
+
+    # Enable mouse scrolling
+    def on_mouse_wheel(self, event):
+        self.canvas.yview_scroll(int(-1*(event.delta/120)), "units")
+        self.canvas.update_idletasks()
+
+    # Clear widgets
+    def clear_frame(self):
+        for widget in self.avatar_widgets:
+            widget.destroy()
+        self.avatar_widgets = []
+        self.tile_labels = {}
+
+        self.canvas.delete("atlas")
+        self.canvas.itemconfigure(self.frame_window, state="normal")
+        self.atlas_image = None
+        self.atlas_avatars = []
+
+    def show_atlas(self, avatars, image):
+        """Put a composed page on the canvas as one PhotoImage, on the Tk thread."""
+        from PIL import ImageTk
+
+        with profiling.timer('ui.atlas.photo'):
+            self.atlas_image = ImageTk.PhotoImage(image)
+        self.atlas_avatars = avatars
+        self.canvas.itemconfigure(self.frame_window, state="hidden")
+        self.canvas.create_image(0, 0, image=self.atlas_image, anchor="nw", tags="atlas")
+        self.canvas.configure(scrollregion=(0, 0, image.width, image.height))
+        self.canvas.yview_moveto(0)
+
+    def update_atlas(self, avatars, image):
+        """Copy a newer version of the shown page into its PhotoImage."""
+        if self.atlas_avatars is avatars and self.atlas_image is not None:
+            with profiling.timer('ui.atlas.photo'):
+                self.atlas_image.paste(image)
+
+    def on_atlas_click(self, event):
+        hit = self.atlas.hit(self.canvas.canvasx(event.x), self.canvas.canvasy(event.y), len(self.atlas_avatars))
+        if hit is None:
+            return
+        index, part = hit
+        avatar = self.atlas_avatars[index]
+        if part == 'author':
+            self.show_author(avatar['author'])
+            return
 
-# Load avatars
-with open('cache/avatar_data.json', 'r', encoding='utf-8') as f: 
-    avatars_data = json.load(f)
-    logging.info(f"Loaded {len(avatars_data)} avatars.")
-
-# Globals
-filtered_avatars = avatars_data
-current_page = 0
-avatar_widgets = []
-banned_avatars_count = 0  # Counter for banned/deleted avatars
-
-# Tkinter setup
-root = tk.Tk()
-root.title("VRChat Avatar Browser Prismic database By FR_KF_FR")
-root.geometry("1800x1000")
-
-# Frame for loading at the bottom left
-loading_frame = tk.Frame(root, width=200, height=50)
-loading_frame.pack(side="bottom", anchor="w", padx=10, pady=10)
-
-# Loading
-loading_label = tk.Label(loading_frame, text="Loading Avatars...", font=("Arial", 12))
-progress_var_avatars = tk.DoubleVar()  # Progress for avatar data
-progress_bar_avatars = ttk.Progressbar(loading_frame, variable=progress_var_avatars, maximum=100, length=180)
-
-progress_var_images = tk.DoubleVar()  # Progress for image fetching
-progress_bar_images = ttk.Progressbar(loading_frame, variable=progress_var_images, maximum=100, length=180)
-
-# Banned avatars counter
-banned_count_label = tk.Label(loading_frame, text=f"Banned Avatars: {banned_avatars_count}", font=("Arial", 12))
-banned_count_label.pack(side="left", padx=10)
-
-# Frame for search and filters
-filter_frame = tk.Frame(root)
-filter_frame.pack(pady=10)
-
-# --- [ADDED] ---
-# Frame for Current Avatar Info (inside filter frame)
-current_avatar_frame = tk.Frame(filter_frame)
-current_avatar_frame.grid(row=0, column=0, rowspan=2, padx=10, pady=5, sticky="w")
-
-current_avatar_img_label = tk.Label(current_avatar_frame)
-current_avatar_img_label.pack(side="top", pady=5)
-
-current_avatar_name_label = tk.Label(current_avatar_frame, text="Current Avatar", font=("Arial", 12, "bold"), wraplength=100)
-current_avatar_name_label.pack(side="top")
-# --- [END ADD] ---
-
-# Name/Description Search
-search_var = tk.StringVar()
-search_entry = tk.Entry(filter_frame, textvariable=search_var, font=("Arial", 14), width=50)
-search_label = tk.Label(filter_frame, text="Search Name/Description:", font=("Arial", 12))
-
-# Author Search
-author_var = tk.StringVar()
-author_entry = tk.Entry(filter_frame, textvariable=author_var, font=("Arial", 14), width=50)
-author_label = tk.Label(filter_frame, text="Search Author:", font=("Arial", 12))
-
-# Platform filter checkboxes
-platforms_var = {"PC": tk.BooleanVar(), "Quest": tk.BooleanVar(), "iOS": tk.BooleanVar()}
-platforms_frame = tk.LabelFrame(filter_frame, text="Filter by Platforms", font=("Arial", 12), padx=10, pady=10)
-
-pc_checkbox = tk.Checkbutton(platforms_frame, text="PC", variable=platforms_var["PC"])
-quest_checkbox = tk.Checkbutton(platforms_frame, text="Quest", variable=platforms_var["Quest"])
-ios_checkbox = tk.Checkbutton(platforms_frame, text="iOS", variable=platforms_var["iOS"])
-
-# Page navigation buttons
-page_nav_frame = tk.Frame(filter_frame)
-prev_button = tk.Button(page_nav_frame, text="Previous", command=lambda: change_page(-1))
-prev_button.grid(row=0, column=0, padx=5)
-
-page_label = tk.Label(page_nav_frame, text="Page 1")
-page_label.grid(row=0, column=1, padx=5)
-
-next_button = tk.Button(page_nav_frame, text="Next", command=lambda: change_page(1))
-next_button.grid(row=0, column=2, padx=5)
-
-# --- [SHIFT EVERYTHING RIGHT BY 1 COLUMN] ---
-search_label.grid(row=0, column=1, padx=5, pady=5)
-search_entry.grid(row=1, column=1, padx=5, pady=5)
-author_label.grid(row=0, column=2, padx=5, pady=5)
-author_entry.grid(row=1, column=2, padx=5, pady=5)
-platforms_frame.grid(row=0, column=3, rowspan=2, padx=5, pady=5)
-pc_checkbox.grid(row=0, column=0, padx=10, pady=5)
-quest_checkbox.grid(row=0, column=1, padx=10, pady=5)
-ios_checkbox.grid(row=0, column=2, padx=10, pady=5)
-page_nav_frame.grid(row=0, column=4, rowspan=2, padx=5, pady=5)
-
-# Search Button
-search_button = tk.Button(filter_frame, text="Search", command=lambda: filter_avatars(0))
-search_button.grid(row=2, column=0, columnspan=5, pady=10)
-
-# Scrollable frame
-canvas = tk.Canvas(root)
-scrollbar = ttk.Scrollbar(root, orient="vertical", command=canvas.yview)
-scrollable_frame = ttk.Frame(canvas)
-
-scrollable_frame.bind(
-    "<Configure>",
-    lambda e: canvas.configure(scrollregion=canvas.bbox("all"))
-)
-
-canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-canvas.configure(yscrollcommand=scrollbar.set)
-canvas.pack(side="left", fill="both", expand=True)
-scrollbar.pack(side="right", fill="y")
-
-# Enable mouse scrolling
-def on_mouse_wheel(event):
-    canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-    canvas.update_idletasks()
-
-canvas.bind_all("<MouseWheel>", on_mouse_wheel)
-
-# Clear widgets
-def clear_frame():
-    global avatar_widgets
-    for widget in avatar_widgets:
-        widget.destroy()
-    avatar_widgets = []
-
-def fetch_current_avatar():
-    try:
-        headers = {
-            "Cookie": f"auth={auth_cookie}",
-            "User-Agent": "VRChat/2024.1.2"
-        }
-        
-        # Get the current user data
-        user_response = requests.get(f"{API_BASE}/auth/user", headers=headers)
-        user_response.raise_for_status()
-        user_data = user_response.json()
-        
-        current_avatar_id = user_data.get('currentAvatar')
-        if not current_avatar_id:
-            logging.warning("No current avatar found in user data.")
+        # The same actions as the buttons of a widget tile
+        menu = self.atlas_menu
+        menu.delete(0, "end")
+        menu.add_command(label=avatar['name'], state="disabled")
+        menu.add_command(label="Info", command=lambda: self.show_info(avatar))
+        menu.add_command(label="Open Web", command=lambda: self.open_avatar_page(avatar['avatar_id']))
+        menu.add_command(label="Select", command=lambda: self.select_avatar(avatar['avatar_id']))
+        menu.add_command(label=f"More by {avatar['author']}", command=lambda: self.show_author(avatar['author']))
+        menu.tk_popup(event.x_root, event.y_root)
+
+    def load_database(self):
+        """Open the avatar store off the Tk thread, pages are queried from it on demand."""
+        try:
+            with profiling.timer('ui.load_database'):
+                db = AvatarDatabase()
+                store = db.open_store()
+                total = store.count()
+                thumbnails = ThumbnailCache(db.cache_dir / 'thumbnails')
+                thumbnails.prune()
+                badges = Badges()
+        except Exception as e:
+            logging.error(f"Failed to load the avatar database: {e}")
+            self.bus.post(self.on_database_failed, e)
             return
+        logging.info(f"Loaded {total} avatars.")
+        self.bus.post(self.on_database_loaded, store, total, thumbnails, badges)
+
+    def show_database_loading(self):
+        self.loading_label.config(text="Loading avatar database...")
+        self.loading_label.pack(side="left", padx=10, pady=5)
+        self.progress_bar_avatars.config(mode="indeterminate")
+        self.progress_bar_avatars.pack(side="left", padx=10, pady=5)
+        self.progress_bar_avatars.start(15)
+
+    def on_database_loaded(self, store, total, thumbnails, badges):
+        self.store = store
+        self.thumbnails = thumbnails
+        self.badges = badges
+        self.details_client.store = store
+        self.search_engine = SearchEngine(store, metrics=self.metrics)
+        self.filtered_total = total
+
+        self.progress_bar_avatars.stop()
+        self.progress_bar_avatars.config(mode="determinate")
+        self.progress_bar_avatars.pack_forget()
+        self.loading_label.pack_forget()
+        self.loading_label.config(text="Loading Avatars...")
+        self.page_label.config(text=f"Page 1 / {max(1, (total + AVATARS_PER_PAGE - 1) // AVATARS_PER_PAGE)}")
+        self.search_button.config(state="normal")
+
+    def on_database_failed(self, error):
+        self.progress_bar_avatars.stop()
+        self.progress_bar_avatars.pack_forget()
+        self.loading_label.config(text="Avatar database failed to load")
+        messagebox.showerror("Error", f"Failed to load the avatar database: {error}\nRun database_ui.py first.")
+
+    def fetch_current_avatar(self):
+        """Fetch the equipped avatar in the background and show it when it arrives."""
+        threading.Thread(target=self._fetch_current_avatar, daemon=True).start()
+
+    def _fetch_current_avatar(self):
+        import requests
+        from PIL import Image, ImageDraw, ImageFont
 
-        # Get the avatar details
-        avatar_response = requests.get(f"{API_BASE}/avatars/{current_avatar_id}", headers=headers)
-        avatar_response.raise_for_status()
-        avatar_data = avatar_response.json()
+        try:
+            headers = {
+                "Cookie": f"auth={self.auth_cookie}",
+                "User-Agent": "VRChat/2024.1.2"
+            }
+
+            # Get the current user data
+            with self.metrics.request('user') as outcome:
+                user_response = requests.get(f"{API_BASE}/auth/user", headers=headers)
+                outcome['status'], outcome['bytes'] = user_response.status_code, len(user_response.content)
+            user_response.raise_for_status()
+            user_data = user_response.json()
+
+            current_avatar_id = user_data.get('currentAvatar')
+            if not current_avatar_id:
+                logging.warning("No current avatar found in user data.")
+                return
+
+            # Get the avatar details
+            with self.metrics.request('details') as outcome:
+                avatar_response = requests.get(f"{API_BASE}/avatars/{current_avatar_id}", headers=headers)
+                outcome['status'], outcome['bytes'] = avatar_response.status_code, len(avatar_response.content)
+            avatar_response.raise_for_status()
+            avatar_data = avatar_response.json()
+
+            # Load the avatar image
+            image_url = avatar_data.get('imageUrl') or avatar_data.get('thumbnailImageUrl')
+            if not image_url:
+                logging.warning("No image URL for current avatar.")
+                return
+
+            with self.metrics.request('image') as outcome:
+                img_response = requests.get(image_url, headers=headers)
+                img_data = img_response.content
+                outcome['status'], outcome['bytes'] = img_response.status_code, len(img_data)
+            img = Image.open(io.BytesIO(img_data)).convert("RGBA")
+            img = img.resize((100, 100), Image.LANCZOS)
+
+            # Update the UI
+            self.bus.post(self.show_current_avatar, img, avatar_data['name'])
+
+        except requests.exceptions.RequestException as e:
+            self.bus.post(messagebox.showerror, "Error", f"Failed to fetch current avatar: {str(e)}")
+            return None
+        except ValueError as e:
+            self.bus.post(messagebox.showerror, "Error", f"Failed to parse user data: {str(e)}")
+            return None
+        except Exception as e:
+            logging.error(f"Failed to load current avatar: {e}")
+            # Show error image
+            error_img = Image.new('RGBA', (100, 100), (255, 0, 0, 255))
+            draw = ImageDraw.Draw(error_img)
+            font = ImageFont.load_default()
+            draw.text((10, 40), "Error", font=font, fill=(0, 0, 0, 255))
+            self.bus.post(self.show_current_avatar, error_img)
 
-        # Load the avatar image
-        image_url = avatar_data.get('imageUrl') or avatar_data.get('thumbnailImageUrl')
-        if not image_url:
-            logging.warning("No image URL for current avatar.")
-            return
+    def show_current_avatar(self, img, name=None):
+        from PIL import ImageTk
 
-        img_response = requests.get(image_url, headers=headers)
-        img_data = img_response.content
-        img = Image.open(io.BytesIO(img_data)).convert("RGBA")
-        img = img.resize((100, 100), Image.LANCZOS)
         tk_img = ImageTk.PhotoImage(img)
+        self.current_avatar_img_label.config(image=tk_img)
+        self.current_avatar_img_label.image = tk_img
+        if name is not None:
+            self.current_avatar_name_label.config(text=name)
+
+    def count_banned(self, avatar_id):
+        # Called from worker threads, the counter is only touched on the Tk thread
+        self.bus.post(self.add_banned)
+
+    def add_banned(self):
+        self.banned_avatars_count += 1
+        self.banned_count_label.config(text=f"Banned Avatars: {self.banned_avatars_count}")
+
+    def fetch_avatar_details(self, avatar_id):
+        """Fetch avatar details, sharing the request with concurrent callers."""
+        return self.details_flight.do(avatar_id, self._fetch_avatar_details, avatar_id)
+
+    @profiling.timed('details.fetch')
+    def _fetch_avatar_details(self, avatar_id):
+        """Fetch avatar details from VRChat API."""
+        import requests
 
-        # Update the UI
-        current_avatar_img_label.config(image=tk_img)
-        current_avatar_img_label.image = tk_img
-        current_avatar_name_label.config(text=avatar_data['name'])
-
-    except requests.exceptions.RequestException as e:
-        messagebox.showerror("Error", f"Failed to fetch current avatar: {str(e)}")
-        return None
-    except ValueError as e:
-        messagebox.showerror("Error", f"Failed to parse user data: {str(e)}")
-        return None
-    except Exception as e:
-        logging.error(f"Failed to load current avatar: {e}")
-        # Show error image
-        error_img = Image.new('RGBA', (100, 100), (255, 0, 0, 255))
-        draw = ImageDraw.Draw(error_img)
-        font = ImageFont.load_default()
-        draw.text((10, 40), "Error", font=font, fill=(0, 0, 0, 255))
-        tk_error_img = ImageTk.PhotoImage(error_img)
-        current_avatar_img_label.config(image=tk_error_img)
-        current_avatar_img_label.image = tk_error_img
-
-def fetch_avatar_details(avatar_id):
-    """Fetch avatar details from VRChat API."""
-    global banned_avatars_count
-    try:
-        logging.debug(f"Fetching details for avatar {avatar_id}")
-        headers = {"Cookie": f"auth={auth_cookie}", "User-Agent": "VRChatAPI/1.0"}
-        r = requests.get(f"{API_BASE}/avatars/{avatar_id}", headers=headers)
-        
-        if r.status_code == 200:
-            return r.json()
-        elif r.status_code == 404:  # Banned or deleted avatar
-            banned_avatars_count += 1
-            if root and banned_count_label:
-                root.after(0, lambda: banned_count_label.config(text=f"Banned Avatars: {banned_avatars_count}"))
+        try:
+            logging.debug(f"Fetching details for avatar {avatar_id}")
+            headers = {"Cookie": f"auth={self.auth_cookie}", "User-Agent": "VRChatAPI/1.0"}
+            with self.metrics.request('details') as outcome:
+                r = requests.get(f"{API_BASE}/avatars/{avatar_id}", headers=headers)
+                outcome['status'], outcome['bytes'] = r.status_code, len(r.content)
+
+            if r.status_code == 200:
+                return r.json()
+            elif r.status_code == 404:  # Banned or deleted avatar
+                profiling.count('details.404')
+                self.count_banned(avatar_id)
+                return None
+            else:
+                logging.error(f"Failed to fetch avatar {avatar_id}: Status {r.status_code}")
+                return None
+        except requests.exceptions.RequestException as e:
+            logging.error(f"Network error fetching avatar {avatar_id}: {e}")
             return None
-        else:
-            logging.error(f"Failed to fetch avatar {avatar_id}: Status {r.status_code}")
+        except json.JSONDecodeError as e:
+            logging.error(f"Error parsing avatar data for {avatar_id}: {e}")
             return None
-    except requests.exceptions.RequestException as e:
-        logging.error(f"Network error fetching avatar {avatar_id}: {e}")
-        return None
-    except json.JSONDecodeError as e:
-        logging.error(f"Error parsing avatar data for {avatar_id}: {e}")
-        return None
-    except Exception as e:
-        logging.error(f"Unexpected error fetching avatar {avatar_id}: {e}")
-        return None
-
-def fetch_avatar_image(image_url, platforms):
-    """Fetch and process avatar image with platform labels."""
-    try:
-        logging.debug(f"Fetching image {image_url}")
-        headers = {"Cookie": f"auth={auth_cookie}", "User-Agent": "VRChatAPI/1.0"}
-        
-        # Add timeout and retry logic
-        for attempt in range(3):
-            try:
-                img_response = requests.get(image_url, headers=headers, timeout=10)
-                if img_response.status_code == 200:
-                    img_data = img_response.content
-                    break
-            except requests.exceptions.RequestException as e:
-                if attempt == 2:  # Last attempt
-                    logging.error(f"Failed to fetch image after 3 attempts: {e}")
-                    return None
-                continue
-        
-        if not img_data:
-            logging.error("No image data received")
+        except Exception as e:
+            logging.error(f"Unexpected error fetching avatar {avatar_id}: {e}")
             return None
-            
+
+    def fetch_avatar_image(self, image_url, platforms, preview=None):
+        """Fetch avatar image, sharing the download and decode with concurrent callers."""
+        key = (image_url, tuple(platforms))
+        return self.image_flight.do(key, self._fetch_avatar_image, image_url, platforms, preview)
+
+    def download_image(self, image_url, headers, preview):
+        """GET an image, returns (status, body).
+
+        For a progressive JPEG preview is called with a tile decoded from
+        the scans received after PREVIEW_BYTES.
+        """
+        import requests
+
+        if preview is None:
+            response = requests.get(image_url, headers=headers, timeout=10)
+            return response.status_code, response.content
+
+        response = requests.get(image_url, headers=headers, timeout=10, stream=True)
+        chunks = []
+        size = 0
+        previewed = response.status_code != 200
+        for chunk in response.iter_content(8192):
+            chunks.append(chunk)
+            size += len(chunk)
+            if not previewed and size >= PREVIEW_BYTES:
+                previewed = True
+                data = b''.join(chunks)
+                # SOI, and an SOF2 (progressive) frame header near the start
+                if data.startswith(b'\xff\xd8') and b'\xff\xc2' in data[:4096]:
+                    try:
+                        # An EOI after the scans so far makes libjpeg output what it has
+                        with profiling.timer('image.preview'):
+                            preview(decode_tile(data + b'\xff\xd9'))
+                    except Exception as e:
+                        logging.debug(f"No preview for {image_url}: {e}")
+        return response.status_code, b''.join(chunks)
+
+    @profiling.timed('image.fetch')
+    def _fetch_avatar_image(self, image_url, platforms, preview=None):
+        """Fetch and process avatar image with platform labels.
+
+        Returns a PIL image, set_tile_image turns it into a PhotoImage on
+        the Tk thread. preview(img) may be called first with a blurry
+        version of the image (progressive JPEGs only).
+        """
+        import requests
+
         try:
-            # Create default error image if processing fails
-            error_img = Image.new('RGBA', (120, 120), (255, 0, 0, 255))
-            draw = ImageDraw.Draw(error_img)
-            font = ImageFont.load_default()
-            draw.text((10, 40), "Error", font=font, fill=(0, 0, 0, 255))
-            error_photo = ImageTk.PhotoImage(error_img)
-            
-            # Try to process the real image
+            # Tiles seen before are on disk already resized
+            thumbnails = self.thumbnails
+            img_data = thumbnails.get(image_url) if thumbnails is not None else None
+            if thumbnails is not None:
+                self.metrics.cache_lookup('thumbnails on disk', img_data is not None)
+            cached = img_data is not None
+
+            logging.debug(f"Fetching image {image_url}")
+            headers = {"Cookie": f"auth={self.auth_cookie}", "User-Agent": "VRChatAPI/1.0"}
+            on_preview = (lambda img: preview(self.badges.apply(img, platforms))) if preview else None
+
+            # Add timeout and retry logic
+            for attempt in range(0 if cached else 3):
+                try:
+                    with self.metrics.request('image') as outcome:
+                        status, content = self.download_image(image_url, headers, on_preview)
+                        outcome['status'], outcome['bytes'] = status, len(content)
+                    if status == 200:
+                        img_data = content
+                        break
+                except requests.exceptions.RequestException as e:
+                    if attempt == 2:  # Last attempt
+                        logging.error(f"Failed to fetch image after 3 attempts: {e}")
+                        return None
+                    continue
+
+            if not img_data:
+                logging.error("No image data received")
+                return None
+            if not cached:
+                profiling.count('image.bytes', len(img_data))
+
             try:
-                img = Image.open(io.BytesIO(img_data)).convert("RGBA")
-                img = img.resize((120, 120), Image.LANCZOS)  # Use LANCZOS for better quality
-                
-                # Draw platform text
-                draw = ImageDraw.Draw(img)
-                platform_colors = {
-                    "PC": "blue",
-                    "Quest": "green",
-                    "iOS": "purple"
-                }
-                y = 2
-                for platform in platforms:
-                    text = platform
-                    color = platform_colors.get(platform, "white")
-                    bbox = draw.textbbox((0, 0), text, font=font)
-                    w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
-                    draw.rectangle([120-w-8, y, 120-2, y+h+2], fill="black")
-                    draw.text((120-w-5, y), text, font=font, fill=color)
-                    y += h + 4
-
-                return ImageTk.PhotoImage(img)
+                with profiling.timer('image.decode'):
+                    img = decode_tile(img_data)
             except Exception as e:
                 logging.error(f"Error processing image: {e}")
-                return error_photo
-                
+                return self.badges.error
+
+            if not cached and thumbnails is not None:
+                thumbnails.put(image_url, encode_tile(img))
+
+            # Platform labels are pre-rendered overlays, one per platform combination
+            with profiling.timer('image.badges'):
+                return self.badges.apply(img, platforms)
         except Exception as e:
-            logging.error(f"Unexpected error processing image: {e}")
-            return error_photo
-    except Exception as e:
-        logging.error(f"Error fetching image: {e}")
-        return None
-
-        # Draw platform text
-        draw = ImageDraw.Draw(img)
-        font = ImageFont.load_default()
-        platform_colors = {
-            "PC": "blue",
-            "Quest": "green",
-            "iOS": "purple"
+            logging.error(f"Error fetching image: {e}")
+            return None
+
+    def show_info(self, avatar):
+        info = f"Name: {avatar['name']}\nAuthor: {avatar['author']}\nDescription: {avatar['description']}"
+        messagebox.showinfo("Avatar Info", info)
+
+    def show_author(self, author):
+        """List every avatar by one author, read from the author index."""
+        if self.search_engine is None:
+            return
+        self.search_var.set("")
+        self.author_var.set(author)
+        self.current_query = {"name_desc": "", "author": author, "platforms": [], "fuzzy": False, "exact_author": True}
+        self.current_page = 0
+        self.threaded_display_avatars(self.current_page)
+
+    def open_avatar_page(self, avatar_id):
+        url = f"https://vrchat.com/home/avatar/{avatar_id}"
+        webbrowser.open(url)
+
+    def filter_avatars(self, page):
+        if self.search_engine is None:
+            return
+        # Raw text, the query parser needs OR/AND/NOT in capitals and lowercases terms itself
+        name_desc_query = self.search_var.get()
+        author_query = self.author_var.get().lower()
+        selected_platforms = [platform for platform, var in self.platforms_var.items() if var.get()]
+
+        logging.debug(f"Filtering avatars with Name/Description '{name_desc_query}' and Author '{author_query}'")
+
+        self.current_query = {
+            "name_desc": name_desc_query,
+            "author": author_query,
+            "platforms": selected_platforms,
+            "fuzzy": self.fuzzy_var.get(),
+            "exact_author": False
         }
-        y = 2
-        for platform in platforms:
-            text = platform
-            color = platform_colors.get(platform, "white")
-            bbox = draw.textbbox((0, 0), text, font=font)
-            w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
-            draw.rectangle([120-w-8, y, 120-2, y+h+2], fill="black")
-            draw.text((120-w-5, y), text, font=font, fill=color)
-            y += h + 4
-
-        return ImageTk.PhotoImage(img)
-    except (UnidentifiedImageError, Exception) as e:
-        logging.error(f"Error loading image: {e}")
-        img = Image.new('RGBA', (120, 120), color='gray')
-        return ImageTk.PhotoImage(img)
-
-def show_info(avatar):
-    info = f"Name: {avatar['name']}\nAuthor: {avatar['author']}\nDescription: {avatar['description']}"
-    messagebox.showinfo("Avatar Info", info)
-
-def open_avatar_page(avatar_id):
-    url = f"https://vrchat.com/home/avatar/{avatar_id}"
-    webbrowser.open(url)
-
-def filter_avatars(page):
-    global filtered_avatars, current_page
-    name_desc_query = search_var.get().lower()
-    author_query = author_var.get().lower()
-
-    logging.debug(f"Filtering avatars with Name/Description '{name_desc_query}' and Author '{author_query}'")
-
-    filtered_avatars = [
-        avatar for avatar in avatars_data
-        if (name_desc_query in avatar['name'].lower() or name_desc_query in avatar['description'].lower())
-        and (author_query in avatar['author'].lower())
-    ]
-
-    selected_platforms = [platform for platform, var in platforms_var.items() if var.get()]
-    if selected_platforms:
-        filtered_avatars = [
-            avatar for avatar in filtered_avatars
-            if any(platform in selected_platforms for platform in avatar['platforms'])
-        ]
-
-    logging.debug(f"{len(filtered_avatars)} avatars matched the filters.")
-
-    current_page = page
-    threaded_display_avatars(current_page)
-
-# Define the function to handle selecting the avatar
-def select_avatar(avatar_id):
-    url = f"{API_BASE}/avatars/{avatar_id}/select"
-    headers = {
-        "Cookie": f"auth={auth_cookie}",
-        "User-Agent": "VRChatAPI/1.0"
-    }
-    try:
-        # Send the PUT request to select the avatar
-        response = requests.put(url, headers=headers)
-        
-        if response.status_code == 200:
-            logging.info(f"Avatar {avatar_id} selected successfully.")
-            messagebox.showinfo("Success", f"Avatar {avatar_id} selected successfully!")
-            
-            # Refresh the current avatar display
-            fetch_current_avatar()
 
-        else:
-            logging.error(f"Failed to select avatar {avatar_id}: {response.status_code}")
-            messagebox.showerror("Error", f"Failed to select avatar {avatar_id}. Status: {response.status_code}")
-
-    except Exception as e:
-        logging.error(f"Error selecting avatar {avatar_id}: {e}")
-        messagebox.showerror("Error", f"Error selecting avatar {avatar_id}: {str(e)}")
-
-# Update the "display_avatars" function to include the Select button
-def display_avatars(page):
-    logging.debug(f"Displaying avatars for page {page + 1}")
-    clear_frame()
-
-    start = page * AVATARS_PER_PAGE
-    end = start + AVATARS_PER_PAGE
-    avatars_to_display = filtered_avatars[start:end]
-
-    row = 0
-    col = 0
-
-    futures = []
-    total_avatars = len(avatars_to_display)
-
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        details_futures = {executor.submit(fetch_avatar_details, avatar['avatar_id']): avatar for avatar in avatars_to_display}
-        
-        for future in as_completed(details_futures):
-            avatar = details_futures[future]
-            details = future.result()
-
-            if details:
-                # Get the avatar image URL
-                image_url = details.get('imageUrl') or details.get('thumbnailImageUrl')
-                if not image_url:
-                    continue
+        self.current_page = page
+        self.threaded_display_avatars(self.current_page)
 
-                # Fetch the image in parallel
-                img_future = executor.submit(fetch_avatar_image, image_url, avatar['platforms'])
-                img = img_future.result()  # Get the image when ready
+    # Define the function to handle selecting the avatar
+    def select_avatar(self, avatar_id):
+        import requests
 
-                # Create a new avatar container widget and show image immediately
-                container = tk.Frame(scrollable_frame, bd=2, relief=tk.RIDGE, width=180, height=270)
-                container.grid(row=row, column=col, padx=5, pady=5)
-                container.grid_propagate(False)
+        url = f"{API_BASE}/avatars/{avatar_id}/select"
+        headers = {
+            "Cookie": f"auth={self.auth_cookie}",
+            "User-Agent": "VRChatAPI/1.0"
+        }
+        try:
+            # Send the PUT request to select the avatar
+            with self.metrics.request('select') as outcome:
+                response = requests.put(url, headers=headers)
+                outcome['status'], outcome['bytes'] = response.status_code, len(response.content)
 
-                avatar_label = tk.Label(container, image=img)
-                avatar_label.image = img
-                avatar_label.pack(pady=5)
+            if response.status_code == 200:
+                logging.info(f"Avatar {avatar_id} selected successfully.")
+                messagebox.showinfo("Success", f"Avatar {avatar_id} selected successfully!")
 
-                name_label = tk.Label(container, text=avatar['name'], font=("Arial", 10, "bold"), wraplength=160)
-                name_label.pack()
+                # Refresh the current avatar display
+                self.fetch_current_avatar()
 
-                description_label = tk.Label(container, text=avatar['description'], font=("Arial", 8),
-                                             wraplength=160, justify="left")
-                description_label.pack(pady=3)
+            else:
+                logging.error(f"Failed to select avatar {avatar_id}: {response.status_code}")
+                messagebox.showerror("Error", f"Failed to select avatar {avatar_id}. Status: {response.status_code}")
 
-                buttons_frame = tk.Frame(container)
-                buttons_frame.pack()
+        except Exception as e:
+            logging.error(f"Error selecting avatar {avatar_id}: {e}")
+            messagebox.showerror("Error", f"Error selecting avatar {avatar_id}: {str(e)}")
 
-                info_button = tk.Button(buttons_frame, text="?", width=2, command=lambda a=avatar: show_info(a))
-                info_button.pack(side="left", padx=5)
+    # Create a new avatar container widget, on the Tk thread
+    @profiling.timed('ui.widgets')
+    def create_avatar_tile(self, avatar):
+        """A tile from what the store knows, with a placeholder until set_tile_image."""
+        from PIL import ImageTk
 
-                select_button = tk.Button(buttons_frame, text="Open Web", command=lambda id=avatar['avatar_id']: open_avatar_page(id))
-                select_button.pack(side="right", padx=5)
+        # One placeholder PhotoImage per platform combination, shared by all tiles
+        platforms = tuple(avatar['platforms'])
+        img = self.placeholder_photos.get(platforms)
+        if img is None:
+            img = self.placeholder_photos[platforms] = ImageTk.PhotoImage(self.badges.placeholder_for(platforms))
+        row, col = divmod(len(self.avatar_widgets), COLUMNS)
 
-                # Add the Select button
-                select_button = tk.Button(buttons_frame, text="Select", command=lambda id=avatar['avatar_id']: select_avatar(id))
-                select_button.pack(side="right", padx=5)
+        container = tk.Frame(self.scrollable_frame, bd=2, relief=tk.RIDGE, width=180, height=270)
+        container.grid(row=row, column=col, padx=5, pady=5)
+        container.grid_propagate(False)
 
-                avatar_widgets.append(container)
+        avatar_label = tk.Label(container, image=img)
+        avatar_label.image = img
+        avatar_label.pack(pady=5)
+        self.tile_labels[avatar['avatar_id']] = avatar_label
 
-                col += 1
-                if col >= COLUMNS:
-                    col = 0
-                    row += 1
+        name_label = tk.Label(container, text=avatar['name'], font=("Arial", 10, "bold"), wraplength=160)
+        name_label.pack()
 
-                # Update progress bars
-                progress_var_avatars.set(((len(futures) + 1) / total_avatars) * 100)
-                progress_bar_avatars.update()
+        author_label = tk.Label(container, text=f"by {avatar['author']}", font=("Arial", 8, "underline"),
+                                fg="blue", cursor="hand2", wraplength=160)
+        author_label.pack()
+        author_label.bind("<Button-1>", lambda e, a=avatar['author']: self.show_author(a))
 
-                progress_var_images.set(((len(futures) + 1) / total_avatars) * 100)
-                progress_bar_images.update()
+        description_label = tk.Label(container, text=avatar['description'], font=("Arial", 8),
+                                     wraplength=160, justify="left")
+        description_label.pack(pady=3)
 
-                # Force Tkinter to refresh the UI
-                root.after(10)
+        buttons_frame = tk.Frame(container)
+        buttons_frame.pack()
 
-    # Hide loading bars when done
-    loading_label.place_forget()
-    progress_bar_avatars.place_forget()
-    progress_bar_images.place_forget()
+        info_button = tk.Button(buttons_frame, text="?", width=2, command=lambda a=avatar: self.show_info(a))
+        info_button.pack(side="left", padx=5)
 
-    page_label.config(text=f"Page {current_page + 1} / {max(1, (len(filtered_avatars) + AVATARS_PER_PAGE - 1) // AVATARS_PER_PAGE)}")
+        select_button = tk.Button(buttons_frame, text="Open Web", command=lambda id=avatar['avatar_id']: self.open_avatar_page(id))
+        select_button.pack(side="right", padx=5)
 
-def threaded_display_avatars(page):
-    loading_label.pack(side="left", padx=10, pady=5)
-    progress_bar_avatars.pack(side="left", padx=10, pady=5)
-    progress_bar_images.pack(side="left", padx=10, pady=5)
+        # Add the Select button
+        select_button = tk.Button(buttons_frame, text="Select", command=lambda id=avatar['avatar_id']: self.select_avatar(id))
+        select_button.pack(side="right", padx=5)
 
-    # Start thread for displaying avatars
-    threading.Thread(target=lambda: display_avatars(page), daemon=True).start()
+        self.avatar_widgets.append(container)
 
-def change_page(direction):
-    global current_page
-    new_page = current_page + direction
-    if 0 <= new_page < len(filtered_avatars) // AVATARS_PER_PAGE + 1:
-        current_page = new_page
-        threaded_display_avatars(current_page)
+    def set_tile_image(self, avatar_id, img):
+        from PIL import ImageTk
 
-# Load current avatar
-fetch_current_avatar()
+        label = self.tile_labels.get(avatar_id)
+        if label is None:
+            return
+        photo = ImageTk.PhotoImage(img)
+        label.config(image=photo)
+        label.image = photo
+
+    def start_page(self):
+        self.clear_frame()
+        self.progress_var_avatars.set(0)
+        self.progress_var_images.set(0)
+
+    def for_page(self, load, fn, *args):
+        """Run fn on the Tk thread, unless load has been superseded since it was posted."""
+        if load is self.page_load and not load.is_set():
+            fn(*args)
+
+    def set_filtered_total(self, total):
+        self.filtered_total = total
+
+    def finish_page(self):
+        # Hide loading bars when done
+        self.loading_label.pack_forget()
+        self.progress_bar_avatars.pack_forget()
+        self.progress_bar_images.pack_forget()
+
+        self.page_label.config(text=f"Page {self.current_page + 1} / {max(1, (self.filtered_total + AVATARS_PER_PAGE - 1) // AVATARS_PER_PAGE)}")
+
+    # Update the "display_avatars" function to include the Select button
+    @profiling.timed('ui.page')
+    def display_avatars(self, page, atlas, load, query):
+        """Search one page on a worker thread and show it progressively.
+
+        The whole page appears at once as placeholder tiles built from what
+        the store knows; images replace the placeholders as they arrive,
+        preceded by a preview for progressive JPEGs. In atlas mode the page
+        is one composed image that the images are pasted into, pushed to
+        the canvas at most every ATLAS_REFRESH_SECONDS.
+
+        Everything is posted through for_page, so once load is cancelled by
+        a newer page nothing of this one reaches the UI. Requests not yet
+        started are cancelled, the ones in flight are left to finish.
+        """
+        logging.debug(f"Displaying avatars for page {page + 1} (load {load.generation})")
+
+        def post(fn, *args):
+            self.bus.post(self.for_page, load, fn, *args)
+
+        def post_latest(key, fn, *args):
+            self.bus.post_latest(key, self.for_page, load, fn, *args)
+
+        post(self.start_page)
+
+        if query["exact_author"]:
+            avatars_to_display, total = self.search_engine.author_avatars(
+                query["author"], offset=page * AVATARS_PER_PAGE, limit=AVATARS_PER_PAGE
+            )
+        else:
+            avatars_to_display, total = self.search_engine.search(
+                query["name_desc"], query["author"], query["platforms"],
+                offset=page * AVATARS_PER_PAGE, limit=AVATARS_PER_PAGE, fuzzy=query["fuzzy"]
+            )
+        logging.debug(f"{total} avatars matched the filters.")
+        post(self.set_filtered_total, total)
+        if load.is_set():
+            return
 
-root.mainloop()
+        total_avatars = max(1, len(avatars_to_display))
+        details_done = 0
+        images_done = 0
+        badges = self.badges
+        executor = self.page_executor
+
+        def show_tile(avatar, img):
+            # Called from worker threads, previews included
+            if load.is_set():
+                return
+            if not atlas:
+                post(self.set_tile_image, avatar['avatar_id'], img)
+                return
+            with atlas_lock:
+                self.atlas.paste_tile(page_image, positions[avatar['avatar_id']], img)
+                if time.monotonic() - last_refresh[0] >= ATLAS_REFRESH_SECONDS:
+                    last_refresh[0] = time.monotonic()
+                    post(self.update_atlas, avatars_to_display, page_image.copy())
+
+        def fetch_image(image_url, platforms, preview):
+            # Queued behind other pages, the load may be gone before this starts
+            if load.is_set():
+                return None
+            return self.fetch_avatar_image(image_url, platforms, preview)
+
+        # Details and image downloads share the pool, an image starts as soon as its details arrive
+        details_futures = self.details_client.submit(avatars_to_display, executor, cancel=load)
+
+        # The skeleton, while the first requests are under way
+        if atlas:
+            positions = {avatar['avatar_id']: index for index, avatar in enumerate(avatars_to_display)}
+            with profiling.timer('ui.atlas.compose'):
+                page_image = self.atlas.compose(
+                    avatars_to_display, [badges.placeholder_for(avatar['platforms']) for avatar in avatars_to_display]
+                )
+            post(self.show_atlas, avatars_to_display, page_image.copy())
+            atlas_lock = threading.Lock()
+            last_refresh = [time.monotonic()]
+        else:
+            for avatar in avatars_to_display:
+                post(self.create_avatar_tile, avatar)
+
+        pending = {details_futures[avatar['avatar_id']]: ('details', avatar, None) for avatar in avatars_to_display}
+        while pending and not load.is_set():
+            done, _ = wait(list(pending) + [load.cancelled], return_when=FIRST_COMPLETED)
+            for future in done:
+                if future not in pending:
+                    continue
+                kind, avatar, details = pending.pop(future)
+                if future.cancelled():
+                    continue
+
+                if kind == 'details':
+                    details_done += 1
+                    post_latest('progress_avatars', self.progress_var_avatars.set, details_done / total_avatars * 100)
+                    details = future.result()
+
+                    # Get the avatar image URL
+                    image_url = details and (details.get('imageUrl') or details.get('thumbnailImageUrl'))
+                    if not image_url:
+                        show_tile(avatar, badges.unavailable)
+                        continue
+
+                    # Fetch the image in parallel
+                    preview = (lambda img, avatar=avatar: show_tile(avatar, img)) if self.progressive_previews else None
+                    pending[executor.submit(fetch_image, image_url, avatar['platforms'], preview)] = ('image', avatar, details)
+                else:
+                    images_done += 1
+                    post_latest('progress_images', self.progress_var_images.set, images_done / total_avatars * 100)
+                    img = future.result()
+                    if img is None and load.is_set():
+                        continue
+                    if img is None and details.get('stored'):
+                        # The stored URL went stale, ask the API again next time
+                        self.details_client.forget(avatar['avatar_id'])
+                    show_tile(avatar, img if img is not None else badges.error)
+
+        if load.is_set():
+            for future in pending:
+                future.cancel()
+            profiling.count('ui.page.cancelled')
+            logging.debug(f"Page load {load.generation} superseded, {len(pending)} requests dropped")
+            return
+
+        if atlas:
+            post(self.update_atlas, avatars_to_display, page_image)
+        post(self.finish_page)
+
+    def threaded_display_avatars(self, page):
+        self.loading_label.pack(side="left", padx=10, pady=5)
+        self.progress_bar_avatars.pack(side="left", padx=10, pady=5)
+        self.progress_bar_images.pack(side="left", padx=10, pady=5)
+
+        # A newer page supersedes whatever is still loading
+        if self.page_load is not None:
+            self.page_load.cancel()
+        self.page_generation += 1
+        load = self.page_load = PageLoad(self.page_generation)
+
+        # Start thread for displaying avatars
+        atlas = self.atlas_var.get()
+        query = dict(self.current_query)
+        threading.Thread(target=lambda: self.display_avatars(page, atlas, load, query), daemon=True).start()
+
+    def change_page(self, direction):
+        if self.search_engine is None:
+            return
+        new_page = self.current_page + direction
+        if 0 <= new_page < self.filtered_total // AVATARS_PER_PAGE + 1:
+            self.current_page = new_page
+            self.threaded_display_avatars(self.current_page)
+
+    def refresh_metrics(self):
+        """Fold the queued metric events into the network panel, on the Tk thread."""
+        snapshot = self.metrics.drain()
+        if snapshot['requests'] or snapshot['in_flight'] or snapshot['hit_rates']:
+            hit_rates = "  ".join(f"{name} {rate * 100:.0f}% of {total}"
+                                  for name, (rate, total) in sorted(snapshot['hit_rates'].items()))
+            self.metrics_label.config(text=(
+                f"{snapshot['requests_per_second']:.1f} req/s   in flight {snapshot['in_flight']}   "
+                f"latency p50 {snapshot['p50_ms']:.0f} / p95 {snapshot['p95_ms']:.0f} / p99 {snapshot['p99_ms']:.0f} ms\n"
+                f"{snapshot['requests']} requests   {snapshot['bytes'] / 1e6:.1f} MB   "
+                f"4xx {snapshot['client_errors']}   5xx {snapshot['server_errors']}   failed {snapshot['failures']}\n"
+                f"cache hits: {hit_rates or '-'}"
+            ))
+        self.root.after(METRICS_INTERVAL_MS, self.refresh_metrics)
+
+    def run(self):
+        # Everything slow starts in the background so the window paints right away
+        self.show_database_loading()
+        threading.Thread(target=self.load_database, daemon=True).start()
+
+        # Load current avatar
+        self.fetch_current_avatar()
+        self.bus.start()
+        self.root.after(METRICS_INTERVAL_MS, self.refresh_metrics)
+        self.root.mainloop()
+
+def main():
+    # Setup logging
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    AvatarBrowser(load_config()).run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Synthetic PAS files in the exact layout AvatarDatabase.parse_prismic_obj reads.
+
+    python -m benchmarks.pas_generator /tmp/pas 1000000
+
+writes pasavtrdb.txt (every avatar), pasavtrdb_qst.txt (the first half)
+and pasavtrdb_ios.txt (the second quarter), sharing avatar ids the way
+the real platform files do.
+
+Layout: "PAS", platform and format version bytes, int24 avatar and author
+counts, a 2 byte date, int24 file avatar and author counts, the flag size
+byte, a 16 byte key XOR'd with the static bytes, 16 bytes per avatar id
+XOR'd with that key, little endian int32 flags and author indexes, then
+the reversed author names joined by \\r, \\n and the reversed
+name\\tdescription pairs joined by \\r.
+"""
+import os
+import random
+import sys
+from array import array
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+from prismic.database import STATIC_BYTES
+
+PLATFORM_FILES = ('pasavtrdb.txt', 'pasavtrdb_qst.txt', 'pasavtrdb_ios.txt')
+
+WORDS = [
+    'cat', 'fox', 'wolf', 'neon', 'cyber', 'anime', 'girl', 'boy', 'robot', 'dragon', 'kitsune',
+    'demon', 'angel', 'protogen', 'maid', 'knight', 'witch', 'ghost', 'shark', 'bunny', 'vampire',
+    'mecha', 'punk', 'pastel', 'goth', 'cute', 'dark', 'fluffy', 'pixel', 'avali', 'nardoragon',
+    'quest', 'pc', 'fullbody', 'dps', 'gogo', 'loco', 'public', 'free', 'base', 'edit', 'ネコ', 'ドラゴン'
+]
+SYLLABLES = ['ka', 'ri', 'mo', 'zen', 'lu', 'xo', 'vi', 'shi', 'ra', 'no', 'ty', 'el', 'ko', 'fu', 'ne']
+
+def encode_date(year: int, month: int, day: int) -> bytes:
+    value = (((year - 2016) << 9) | (month << 5) | day) << 3
+    return value.to_bytes(2, 'big')
+
+def build_pas(avatar_ids: bytes, names: Sequence[str], descriptions: Sequence[str], author_index: array,
+              authors: Sequence[str], date: Tuple[int, int, int] = (2024, 5, 17), seed: int = 0,
+              platform: int = 0) -> bytes:
+    """Encode one platform file.
+
+    avatar_ids holds the raw 16 byte ids back to back, author_index the
+    int32 position of each avatar's author in authors.
+    """
+    count = len(names)
+    key = random.Random(seed).randbytes(16)
+    dynamic_bytes = bytes(k ^ s for k, s in zip(key, STATIC_BYTES))
+
+    out = bytearray(b'PAS')
+    out += bytes([platform, 1])
+    out += count.to_bytes(3, 'big') + len(authors).to_bytes(3, 'big')
+    out += encode_date(*date)
+    out += count.to_bytes(3, 'big') + len(authors).to_bytes(3, 'big')
+    out += bytes([4])
+    out += key
+
+    # XOR every id with the key in one big integer operation
+    size = count * 16
+    out += (int.from_bytes(avatar_ids, 'big') ^ int.from_bytes(dynamic_bytes * count, 'big')).to_bytes(size, 'big')
+
+    out += bytes(4 * count)  # flags, unused by the parser
+    if sys.byteorder != 'little':
+        author_index = array('i', author_index)
+        author_index.byteswap()
+    out += author_index.tobytes()
+
+    out += '\r'.join(author[::-1] for author in authors).encode('utf-8')
+    out += b'\n'
+    out += '\r'.join(f"{name[::-1]}\t{description[::-1]}" for name, description in zip(names, descriptions)).encode('utf-8')
+    return bytes(out)
+
+class SyntheticDatabase:
+    """A reproducible avatar population split over the three platform files."""
+    def __init__(self, avatars: int, seed: int = 0):
+        rng = random.Random(seed)
+        self.avatars = avatars
+        self.seed = seed
+        author_count = max(1, avatars // 10)
+        self.authors = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).title() + str(i)
+                        for i in range(author_count)]
+        self.avatar_ids = rng.randbytes(16 * avatars)
+        self.author_index = array('i', (rng.randrange(author_count) for _ in range(avatars)))
+        self.names = [f"{' '.join(rng.choices(WORDS, k=rng.randint(1, 3))).title()} {i}" for i in range(avatars)]
+        self.descriptions = [' '.join(rng.choices(WORDS, k=rng.randint(0, 8))) for _ in range(avatars)]
+
+    def slice(self, start: int, stop: int, seed: int, platform: int) -> bytes:
+        return build_pas(
+            self.avatar_ids[start * 16:stop * 16], self.names[start:stop], self.descriptions[start:stop],
+            self.author_index[start:stop], self.authors, seed=self.seed + seed, platform=platform
+        )
+
+    def files(self) -> List[Tuple[str, bytes]]:
+        """(file name, content) for the PC, Quest and iOS files."""
+        n = self.avatars
+        return [
+            (PLATFORM_FILES[0], self.slice(0, n, 1, 0)),
+            (PLATFORM_FILES[1], self.slice(0, n // 2, 2, 1)),
+            (PLATFORM_FILES[2], self.slice(n // 4, n // 2, 3, 2))
+        ]
+
+    def write(self, directory) -> List[Path]:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for name, content in self.files():
+            path = directory / name
+            with open(path, 'wb') as f:
+                f.write(content)
+            paths.append(path)
+        return paths
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("usage: python -m benchmarks.pas_generator DIRECTORY AVATARS [SEED]")
+        sys.exit(2)
+    written = SyntheticDatabase(int(sys.argv[2]), int(sys.argv[3]) if len(sys.argv) > 3 else 0).write(sys.argv[1])
+    for path in written:
+        print(f"{path}  {os.path.getsize(path)} bytes")
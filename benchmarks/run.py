@@ -0,0 +1,237 @@
+"""Benchmark the database pipeline end to end on synthetic data.
+
+    python -m benchmarks.run --avatars 10000 100000 --latency 0.02 --json results.json
+
+For every scale this generates the three PAS files, serves them and a
+stub VRChat API from a local server, and times download + decode, decode
+alone, cache write and load, the SQLite store rebuild, searches (cold and
+cached) and rendering pages of tiles (details, image download and
+decode, as the browser does it but without Tk), once with a request per
+tile, through the batched DetailsClient and from image URLs stored by an
+earlier session, counting API round trips.
+"""
+import argparse
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from benchmarks.pas_generator import PLATFORM_FILES, SyntheticDatabase
+from benchmarks.stub_api import StubVRChat
+from prismic.database import AvatarDatabase
+from prismic.details import DetailsClient
+from prismic.search import SearchEngine
+
+QUERIES = [
+    ('cat', '', [], False),
+    ('neon fox', '', [], False),
+    ('dragon -cute', '', [], False),
+    ('name:wolf platform:quest', '', [], False),
+    ('', 'ka', ['Quest'], False),
+    ('"fluffy punk"', '', [], False),
+    ('dragn', '', [], True),
+    ('protogen OR avali', '', ['PC'], False)
+]
+
+PAGE_SIZE = 100
+
+class Results:
+    def __init__(self):
+        self.rows = []
+
+    def add(self, scale: int, stage: str, items: int, seconds: float, unit: str, **extra):
+        row = {'avatars': scale, 'stage': stage, 'items': items, 'seconds': round(seconds, 4),
+               'rate': round(items / seconds, 1) if seconds else None, 'unit': unit, **extra}
+        self.rows.append(row)
+        details = ''.join(f"  {key}={value}" for key, value in extra.items())
+        print(f"{scale:>9}  {stage:<16} {seconds * 1000:>10.1f} ms  {row['rate'] or 0:>12.1f} {unit}/s{details}")
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+def percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))]
+
+def bench_search(results: Results, scale: int, db: AvatarDatabase, rounds: int):
+    store = db.open_store()
+    try:
+        for label, warm in (('search cold', False), ('search cached', True)):
+            engine = SearchEngine(store)
+            if warm:
+                # Fill the cache first, the cached numbers should not include a cold pass
+                for name_desc, author, platforms, fuzzy in QUERIES:
+                    engine.search(name_desc, author, platforms, 0, PAGE_SIZE, fuzzy)
+            latencies = []
+            for _ in range(rounds):
+                if not warm:
+                    engine = SearchEngine(store)
+                for name_desc, author, platforms, fuzzy in QUERIES:
+                    _, elapsed = timed(lambda: engine.search(name_desc, author, platforms, 0, PAGE_SIZE, fuzzy))
+                    latencies.append(elapsed)
+            results.add(scale, label, len(latencies), sum(latencies), 'queries',
+                        p50_ms=round(percentile(latencies, 0.5) * 1000, 2),
+                        p95_ms=round(percentile(latencies, 0.95) * 1000, 2))
+        return SearchEngine(store).search('', limit=PAGE_SIZE * 3)[0]
+    finally:
+        store.close()
+
+def render_page(avatars: List[Dict], api_base: str, workers: int = 10,
+                batched: Optional[DetailsClient] = None) -> Dict[str, int]:
+    """Fetch details and image for every tile and decode it, like display_avatars."""
+    import requests
+    from PIL import Image
+
+    local = threading.local()
+    outcomes = {}
+    lock = threading.Lock()
+
+    def session():
+        if getattr(local, 'session', None) is None:
+            local.session = requests.Session()
+        return local.session
+
+    def record(status):
+        with lock:
+            outcomes[status] = outcomes.get(status, 0) + 1
+
+    def fetch_one(avatar_id):
+        response = session().get(f"{api_base}/avatars/{avatar_id}", timeout=10)
+        record(response.status_code)
+        return response.json() if response.status_code == 200 else None
+
+    def tile(details):
+        if details:
+            image = session().get(details['imageUrl'], timeout=10).content
+            Image.open(io.BytesIO(image)).convert("RGBA").resize((120, 120), Image.LANCZOS)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        if batched is None:
+            details = [executor.submit(fetch_one, avatar['avatar_id']) for avatar in avatars]
+        else:
+            batched.fetch_one = fetch_one
+            details = list(batched.submit(avatars, executor).values())
+        images = [executor.submit(tile, future.result()) for future in details]
+        for future in images:
+            future.result()
+    return outcomes
+
+def bench_scale(results: Results, scale: int, args, workdir: Path):
+    pas_dir = workdir / f"pas_{scale}"
+    cache_dir = workdir / f"cache_{scale}"
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    synthetic, elapsed = timed(SyntheticDatabase, scale, args.seed)
+    files, generate_elapsed = timed(synthetic.files)
+    results.add(scale, 'generate', scale, elapsed + generate_elapsed, 'avatars')
+    pas_dir.mkdir(parents=True, exist_ok=True)
+    for name, content in files:
+        (pas_dir / name).write_bytes(content)
+
+    server = StubVRChat(latency=args.latency, jitter=args.latency / 2, not_found_rate=args.not_found_rate,
+                        rate_limit_rate=args.rate_limit_rate, pas_dir=str(pas_dir),
+                        listable_rate=args.listable_rate).start()
+    try:
+        db = AvatarDatabase(cache_dir)
+        db.urls = [f"{server.base_url}/pas/{name}" for name in PLATFORM_FILES]
+
+        main_data, elapsed = timed(db.process_database)
+        results.add(scale, 'download+decode', len(main_data), elapsed, 'avatars')
+
+        decoded = 0
+        start = time.perf_counter()
+        for (name, content), platform in zip(files, ('PC', 'Quest', 'iOS')):
+            decoded += len(db.parse_prismic_obj(bytearray(content), platform))
+        results.add(scale, 'decode', decoded, time.perf_counter() - start, 'avatars')
+        del files
+
+        _, elapsed = timed(db.save_cache, main_data)
+        results.add(scale, 'cache write', len(main_data), elapsed, 'avatars',
+                    mb=round(db.cache_path.stat().st_size / 1e6, 1))
+
+        loaded, elapsed = timed(AvatarDatabase(cache_dir).load_cache)
+        results.add(scale, 'cache load', len(loaded), elapsed, 'avatars')
+        del loaded
+
+        _, elapsed = timed(db.update_store, None, main_data)
+        results.add(scale, 'store rebuild', len(main_data), elapsed, 'avatars',
+                    mb=round(db.db_path.stat().st_size / 1e6, 1))
+
+        # The stub lists every author's avatars unless --listable-rate says otherwise,
+        # pages of whole authors are what an author search shows
+        server.avatars = {avatar['avatar_id']: avatar for avatar in main_data}
+        by_author = {}
+        for avatar in main_data:
+            by_author.setdefault(avatar['author'], []).append(avatar)
+        author_avatars = [avatar for avatars in list(by_author.values())[:PAGE_SIZE] for avatar in avatars]
+        del main_data, by_author
+        page_avatars = bench_search(results, scale, db, args.rounds)
+
+        # One client per kind of page, like one browser session. The batched
+        # client saves image URLs to the store, a new session then starts from them
+        store = db.open_store()
+        batched = DetailsClient(server.api_base, {}, None)
+        batched.store = store
+        restarted = DetailsClient(server.api_base, {}, None)
+        restarted.store = store
+        for label, source, batched in (
+            ('page render', page_avatars, None),
+            ('page batched', page_avatars, batched),
+            ('page stored', page_avatars, restarted),
+            ('author render', author_avatars, None),
+            ('author batched', author_avatars, DetailsClient(server.api_base, {}, None))
+        ):
+            for page in range(args.pages):
+                avatars = source[(page % 3) * PAGE_SIZE:(page % 3 + 1) * PAGE_SIZE]
+                before = server.requests.get('avatar', 0) + server.requests.get('avatar_list', 0)
+                outcomes, elapsed = timed(render_page, avatars, server.api_base, 10, batched)
+                round_trips = server.requests.get('avatar', 0) + server.requests.get('avatar_list', 0) - before
+                results.add(scale, f'{label} {page + 1}', len(avatars), elapsed, 'tiles', round_trips=round_trips,
+                            statuses=','.join(f"{status}:{n}" for status, n in sorted(outcomes.items())))
+        store.close()
+    finally:
+        server.stop()
+        if not args.keep:
+            shutil.rmtree(pas_dir, ignore_errors=True)
+            shutil.rmtree(cache_dir, ignore_errors=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark decode, cache, store, search and page rendering")
+    parser.add_argument("--avatars", type=int, nargs="+", default=[10000, 100000],
+                        help="scales to run, e.g. 10000 1000000 5000000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.02, help="stub API latency in seconds")
+    parser.add_argument("--not-found-rate", type=float, default=0.05)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--listable-rate", type=float, default=1.0,
+                        help="share of authors the stub lists, the real API lists few besides your own")
+    parser.add_argument("--rounds", type=int, default=3, help="passes over the search queries")
+    parser.add_argument("--pages", type=int, default=2, help="pages of tiles to render")
+    parser.add_argument("--workdir", help="where files are written, a temporary directory by default")
+    parser.add_argument("--keep", action="store_true", help="keep generated files and caches")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    workdir = Path(args.workdir) if args.workdir else Path(tempfile.mkdtemp(prefix="prismic-bench-"))
+    results = Results()
+    print(f"{'avatars':>9}  {'stage':<16} {'time':>13}  {'throughput':>15}")
+    try:
+        for scale in args.avatars:
+            bench_scale(results, scale, args, workdir)
+    finally:
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'results': results.rows}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""Local stand-in for the VRChat API, image CDN and PAS gist.
+
+    python -m benchmarks.stub_api --port 8766 --latency 0.05 --not-found-rate 0.05 --pas-dir /tmp/pas
+
+    GET  /api/1/avatars/{id}         avatar details, imageUrl points back here
+    GET  /api/1/avatars?userId=usr_  the author's avatars, n (max 100) and offset page them
+    GET  /api/1/auth/user            a user wearing the first known avatar
+    PUT  /api/1/avatars/{id}/select
+    GET  /images/{id}.png            a 256x256 PNG, thumbnails at /images/{id}_thumb.png
+    GET  /pas/{file}                 files from --pas-dir
+
+Which avatars answer 404 is a function of the id, so a banned avatar stays
+banned across runs and never shows up in a list. 429s are random and
+carry Retry-After. Only avatars passed in `avatars` can be listed, and
+like the real API the list endpoint can be made to return nothing for
+most authors (--listable-rate) or to refuse outright (--list-status 403).
+"""
+import argparse
+import hashlib
+import json
+import random
+import struct
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+def png(width: int, height: int, rgb) -> bytes:
+    """A solid color PNG, written by hand so the stub does not need Pillow."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+    row = b'\x00' + bytes(rgb) * width
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(row * height, 6))
+            + chunk(b'IEND', b''))
+
+def author_id(author: str) -> str:
+    return f"usr_{hashlib.md5(author.encode()).hexdigest()}"
+
+def id_fraction(avatar_id: str) -> float:
+    """Stable value in [0, 1) for an id."""
+    return int.from_bytes(hashlib.blake2b(avatar_id.encode(), digest_size=4).digest(), 'big') / 2 ** 32
+
+class StubVRChat(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency: float = 0.0, jitter: float = 0.0,
+                 not_found_rate: float = 0.0, rate_limit_rate: float = 0.0, pas_dir: Optional[str] = None,
+                 avatars: Optional[Dict[str, Dict]] = None, image_size: int = 256,
+                 listable_rate: float = 1.0, list_status: int = 200):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.not_found_rate = not_found_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.pas_dir = Path(pas_dir) if pas_dir else None
+        self.avatars = avatars or {}
+        self.image_size = image_size
+        self.listable_rate = listable_rate
+        self.list_status = list_status
+        self.images = {}
+        self.by_author = {}
+        self.by_author_source = None
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_base(self) -> str:
+        return f"{self.base_url}/api/1"
+
+    def count(self, key: str):
+        with self.lock:
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def image(self, avatar_id: str, thumbnail: bool) -> bytes:
+        # A palette of 16 colors keeps the cache small and the bytes realistic per size
+        color = int(id_fraction(avatar_id) * 16)
+        size = self.image_size // 2 if thumbnail else self.image_size
+        key = (color, size)
+        if key not in self.images:
+            rgb = ((color * 53) % 256, (color * 97) % 256, (color * 151) % 256)
+            self.images[key] = png(size, size, rgb)
+        return self.images[key]
+
+    def details(self, avatar_id: str) -> Dict:
+        known = self.avatars.get(avatar_id, {})
+        return {
+            'id': avatar_id,
+            'name': known.get('name', f"Avatar {avatar_id[5:13]}"),
+            'description': known.get('description', ''),
+            'authorId': author_id(known.get('author', '')),
+            'authorName': known.get('author', 'Unknown'),
+            'imageUrl': f"{self.base_url}/images/{avatar_id}.png",
+            'thumbnailImageUrl': f"{self.base_url}/images/{avatar_id}_thumb.png",
+            'releaseStatus': 'public',
+            'version': 1
+        }
+
+    def author_avatars(self, user_id: str) -> List[str]:
+        # Rebuilt when the benchmark swaps in another avatars dict
+        with self.lock:
+            if self.by_author_source is not self.avatars:
+                self.by_author = {}
+                for avatar_id, avatar in sorted(self.avatars.items()):
+                    if id_fraction(avatar_id) >= self.not_found_rate:
+                        self.by_author.setdefault(author_id(avatar.get('author', '')), []).append(avatar_id)
+                self.by_author_source = self.avatars
+            return self.by_author.get(user_id, [])
+
+    def handle_error(self, request, client_address):
+        # Clients hanging up early are normal here, their tracebacks would bury the benchmark output
+        if isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError, ConnectionAbortedError)):
+            return
+        super().handle_error(request, client_address)
+
+    def start(self) -> 'StubVRChat':
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: StubVRChat
+
+    def log_message(self, format, *args):
+        pass
+
+    def delay(self):
+        if self.server.latency or self.server.jitter:
+            time.sleep(max(0.0, self.server.latency + random.uniform(-self.server.jitter, self.server.jitter)))
+
+    def send(self, status: int, body: bytes = b'', content_type: str = 'application/json', headers: Dict = None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def send_json(self, status: int, data, headers: Dict = None):
+        self.send(status, json.dumps(data).encode('utf-8'), headers=headers)
+
+    def api_avatar(self, avatar_id: str, select: bool = False):
+        self.server.count('avatar')
+        if random.random() < self.server.rate_limit_rate:
+            self.server.count('429')
+            self.send_json(429, {'error': {'message': 'Too many requests', 'status_code': 429}}, {'Retry-After': '1'})
+        elif id_fraction(avatar_id) < self.server.not_found_rate:
+            self.server.count('404')
+            self.send_json(404, {'error': {'message': f'Avatar {avatar_id} not found', 'status_code': 404}})
+        elif select:
+            self.send_json(200, {'id': 'usr_stub', 'currentAvatar': avatar_id})
+        else:
+            self.send_json(200, self.server.details(avatar_id))
+
+    def api_avatar_list(self, query: Dict[str, List[str]]):
+        self.server.count('avatar_list')
+        if random.random() < self.server.rate_limit_rate:
+            self.server.count('429')
+            self.send_json(429, {'error': {'message': 'Too many requests', 'status_code': 429}}, {'Retry-After': '1'})
+            return
+        if self.server.list_status != 200:
+            self.send_json(self.server.list_status, {'error': {'message': 'Not allowed', 'status_code': self.server.list_status}})
+            return
+        try:
+            n = min(100, int(query.get('n', ['60'])[0]))
+            offset = int(query.get('offset', ['0'])[0])
+        except ValueError:
+            self.send_json(400, {'error': {'message': 'Invalid paging', 'status_code': 400}})
+            return
+        user_id = query.get('userId', [''])[0]
+        if id_fraction(user_id) >= self.server.listable_rate:
+            # Somebody else's avatars, the API lists nothing
+            self.send_json(200, [])
+            return
+        ids = self.server.author_avatars(user_id)[offset:offset + n]
+        self.send_json(200, [self.server.details(avatar_id) for avatar_id in ids])
+
+    def do_GET(self):
+        self.delay()
+        path, _, query = self.path.partition('?')
+        if path == '/api/1/avatars':
+            self.api_avatar_list(parse_qs(query))
+        elif path.startswith('/api/1/avatars/'):
+            self.api_avatar(path[len('/api/1/avatars/'):])
+        elif path == '/api/1/auth/user':
+            self.server.count('user')
+            current = next(iter(self.server.avatars), 'avtr_00000000-0000-0000-0000-000000000000')
+            self.send_json(200, {'id': 'usr_stub', 'displayName': 'Stub', 'currentAvatar': current})
+        elif path.startswith('/images/') and path.endswith('.png'):
+            self.server.count('image')
+            name = path[len('/images/'):-len('.png')]
+            thumbnail = name.endswith('_thumb')
+            self.send(200, self.server.image(name[:-len('_thumb')] if thumbnail else name, thumbnail), 'image/png')
+        elif path.startswith('/pas/') and self.server.pas_dir:
+            self.server.count('pas')
+            file = self.server.pas_dir / Path(path[len('/pas/'):]).name
+            if file.is_file():
+                self.send(200, file.read_bytes(), 'text/plain')
+            else:
+                self.send(404)
+        else:
+            self.send(404)
+
+    do_HEAD = do_GET
+
+    def do_PUT(self):
+        self.delay()
+        path = self.path.split('?', 1)[0]
+        if path.startswith('/api/1/avatars/') and path.endswith('/select'):
+            self.api_avatar(path[len('/api/1/avatars/'):-len('/select')], select=True)
+        else:
+            self.send(404)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub VRChat API for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="+/- seconds of random latency")
+    parser.add_argument("--not-found-rate", type=float, default=0.0, help="share of avatars answering 404")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of requests answering 429")
+    parser.add_argument("--pas-dir", help="directory served under /pas/")
+    parser.add_argument("--listable-rate", type=float, default=1.0, help="share of authors the list endpoint returns")
+    parser.add_argument("--list-status", type=int, default=200, help="status of every list request, e.g. 403")
+    args = parser.parse_args()
+
+    server = StubVRChat((args.host, args.port), args.latency, args.jitter, args.not_found_rate,
+                        args.rate_limit_rate, args.pas_dir, listable_rate=args.listable_rate,
+                        list_status=args.list_status)
+    print(f"Stub API on {server.api_base}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -1,20 +1,17 @@
 import tkinter as tk
 from tkinter import ttk
 import threading
-import requests
-import json
-from datetime import datetime
-from typing import Dict, List, Optional
-import struct
-import os
-from pathlib import Path
-import time
+from prismic.database import AvatarDatabase
+from ui_bus import UIBus
 
 class DatabaseUI:
     def __init__(self):
         self.root = tk.Tk()
         self.root.title("VRChat Avatar Database Downloader")
         self.root.geometry("600x400")
+
+        # The download runs on a worker thread, every widget change goes through the bus
+        self.bus = UIBus(self.root)
         
         # Create main frame
         self.main_frame = ttk.Frame(self.root, padding="10")
@@ -48,10 +45,12 @@ class DatabaseUI:
         self.create_result_label("Avatars:", "avatars")
         self.create_result_label("Authors:", "authors")
         self.create_result_label("Last Update:", "last_update")
+        self.create_result_label("Changes:", "changes")
         
         # Start download automatically
         threading.Thread(target=self.download_data, daemon=True).start()
-        
+
+        self.bus.start()
         self.root.mainloop()
 
     def create_ui_elements(self):
@@ -79,19 +78,17 @@ class DatabaseUI:
         value_label.grid(row=len(self.results_labels), column=1, padx=5, pady=2, sticky=tk.W)
         self.results_labels[key] = value_label
 
+    # Called from the download thread, only the newest value per widget is drawn
     def update_progress(self, step: int, value: int):
         if 0 <= step < len(self.progress_bars):
-            self.progress_bars[step]['value'] = value
-            self.root.update_idletasks()
+            self.bus.post_latest(('progress', step), self.progress_bars[step].config, {'value': value})
 
     def update_status(self, text: str):
-        self.status_label['text'] = text
-        self.root.update_idletasks()
+        self.bus.post_latest('status', self.status_label.config, {'text': text})
 
     def update_result(self, key: str, value: str):
         if key in self.results_labels:
-            self.results_labels[key]['text'] = value
-            self.root.update_idletasks()
+            self.bus.post_latest(('result', key), self.results_labels[key].config, {'text': value})
 
     def start_download(self):
         self.start_button['state'] = 'disabled'
@@ -108,233 +105,29 @@ class DatabaseUI:
         try:
             # Process all databases
             self.update_status("Processing databases...")
-            main_data = self.db.process_database()
-            
-            # Save to cache
-            cache_path = self.db.cache_dir / 'avatar_data.json'
-            with open(cache_path, 'w', encoding='utf-8') as f:
-                json.dump(main_data, f, ensure_ascii=False, indent=2)
-            
-            # Update progress bars
-            for i in range(4):
-                self.update_progress(i, 100)
-            
+            delta = self.db.update(progress_callback=self.update_progress)
+
+            if delta is None:
+                self.update_progress(3, 100)
+                self.update_status("Database already up to date")
+            else:
+                # Update progress bar
+                self.update_progress(3, 100)
+                self.update_status("Download complete!")
+                self.update_result("changes", f"+{delta['added']} / -{delta['removed']} / ~{delta['updated']}")
+
             # Update results
-            self.update_status("Download complete!")
-            self.update_result("avatars", str(len(main_data)))
-            self.update_result("authors", str(len(set(avatar['author'] for avatar in main_data))))
-            self.update_result("last_update", datetime.now().strftime('%Y-%m-%d'))
+            self.update_result("avatars", str(self.db.meta.get('avatars', '')))
+            self.update_result("authors", str(self.db.meta.get('authors', '')))
+            self.update_result("last_update", self.db.meta.get('last_update', ''))
             
             # Close the window after 2 seconds
-            self.root.after(2000, self.root.destroy)
+            self.bus.post(self.root.after, 2000, self.root.destroy)
             
         except Exception as e:
             self.update_status(f"Error: {str(e)}")
             # Close the window after 5 seconds if there's an error
-            self.root.after(5000, self.root.destroy)
-
-class Reader:
-    def __init__(self, data: bytes):
-        self.data = data
-        self.position = 0
-
-    def read_byte(self) -> int:
-        if self.position >= len(self.data):
-            raise ValueError("Attempted to read beyond end of data")
-        value = self.data[self.position]
-        self.position += 1
-        return value
-
-    def read_bytes(self, amount: int) -> bytes:
-        if self.position + amount > len(self.data):
-            raise ValueError("Attempted to read beyond end of data")
-        bytes_ = self.data[self.position:self.position + amount]
-        self.position += amount
-        return bytes_
-
-    def read_int_array(self, n: int) -> List[int]:
-        total_bytes = n * 4
-        if self.position + total_bytes > len(self.data):
-            raise ValueError("Attempted to read beyond end of data")
-        
-        result = []
-        for _ in range(n):
-            value = struct.unpack('<i', self.data[self.position:self.position+4])[0]
-            result.append(value)
-            self.position += 4
-        return result
-
-    def read_int24(self) -> int:
-        if self.position + 3 > len(self.data):
-            raise ValueError("Attempted to read beyond end of data")
-        
-        bytes_ = self.read_bytes(3)
-        return (bytes_[0] << 16) | (bytes_[1] << 8) | bytes_[2]
-
-    def remaining(self) -> int:
-        return len(self.data) - self.position
-
-class AvatarDatabase:
-    def __init__(self):
-        self.urls = [
-            "https://gist.githubusercontent.com/Mwr247/a80c1f9060fc4fd46a8f00d589c47c5a/raw/pasavtrdb.txt",
-            "https://gist.githubusercontent.com/Mwr247/a80c1f9060fc4fd46a8f00d589c47c5a/raw/pasavtrdb_qst.txt",
-            "https://gist.githubusercontent.com/Mwr247/a80c1f9060fc4fd46a8f00d589c47c5a/raw/pasavtrdb_ios.txt"
-        ]
-        self.static_bytes = [208, 29, 107, 36, 251, 69, 122, 14, 67, 204, 171, 246, 106, 38, 183, 224]
-        self.cache_dir = Path("cache")
-        self.cache_dir.mkdir(exist_ok=True)
-
-    def decode_avatar_id(self, crypt: bytes, iv: bytes) -> str:
-        # XOR decryption of 16 bytes
-        decoded = [crypt[i] ^ iv[i] for i in range(16)]
-
-        # Convert to hex
-        hex_bytes = [f"{x:02x}" for x in decoded]
-
-        # Format as proper UUID (8-4-4-4-12)
-        uuid = (
-            f"{''.join(hex_bytes[0:4])}-"
-            f"{''.join(hex_bytes[4:6])}-"
-            f"{''.join(hex_bytes[6:8])}-"
-            f"{''.join(hex_bytes[8:10])}-"
-            f"{''.join(hex_bytes[10:16])}"
-        )
-
-        return f"avtr_{uuid}"
-
-    def get_prismic_obj(self, url: str, platform: str) -> List[Dict]:
-        response = requests.get(url)
-        content = Reader(response.content)
-
-        if not content.data:
-            raise ValueError("Data has length zero")
-        
-        header = content.read_bytes(3).decode()
-        if header != "PAS":
-            raise ValueError("PAS Header not found")
-
-        content.read_bytes(2)  # Skip platform and format version
-        avatar_count = content.read_int24()
-        author_count = content.read_int24()
-
-        date_arr = content.read_bytes(2)
-        date_num = ((date_arr[0] << 8) + date_arr[1]) >> 3
-        year = ((date_num >> 9) + 16)
-        month = ((date_num >> 5) & 15)
-        day = (date_num & 31)
-        last_update = f"20{year:02d}-{month:02d}-{day:02d}"
-
-        file_avatars = content.read_int24()
-        file_authors = content.read_int24()
-
-        flag_size = content.read_byte()
-        random_bytes = content.read_bytes(16)
-        dynamic_bytes = [e ^ self.static_bytes[i] for i, e in enumerate(random_bytes)]
-
-        data_size = file_avatars * 16
-        avatar_ids = content.read_bytes(data_size)
-        flag_data_size = file_avatars * flag_size
-        flags = content.read_int_array(file_avatars)
-        author_ids = content.read_int_array(file_avatars)
-
-        strings = content.read_bytes(content.remaining()).decode('utf-8').split('\n')
-        if len(strings) < 2:
-            raise ValueError("Malformed string block")
-
-        author_names = strings[0].split('\r')
-        avatar_names = strings[1].split('\r')
-
-        decoded_entries = []
-        for i in range(file_avatars):
-            avatar_id = self.decode_avatar_id(
-                avatar_ids[i * 16:(i * 16) + 16],
-                dynamic_bytes
-            )
-            name_desc = avatar_names[i].split('\t')
-            obj = {
-                'avatar_id': avatar_id,
-                'name': name_desc[0][::-1],
-                'author': author_names[author_ids[i] & 524287][::-1],
-                'description': name_desc[1][::-1] if len(name_desc) > 1 else '',
-                'platforms': [platform]
-            }
-            decoded_entries.append(obj)
-
-        print(f"Decoded {len(decoded_entries)} {platform} entries")
-        return decoded_entries
-
-    def process_database(self):
-        all_avatars = {}
-        
-        for platform, url in zip(['PC', 'Quest', 'iOS'], self.urls):
-            print(f"\nProcessing {platform} database...")
-            try:
-                avatars = self.get_prismic_obj(url, platform)
-                for avatar in avatars:
-                    avatar_id = avatar['avatar_id']
-                    if avatar_id not in all_avatars:
-                        all_avatars[avatar_id] = avatar
-                    else:
-                        # If already exists, just add the platform if it's not already listed
-                        if platform not in all_avatars[avatar_id]['platforms']:
-                            all_avatars[avatar_id]['platforms'].append(platform)
-            except Exception as e:
-                print(f"Error processing {platform} database: {e}")
-
-        final_list = list(all_avatars.values())
-        return final_list
-
-    def get_aux_prismic_obj(self, url: str) -> List[str]:
-        response = requests.get(url)
-        content = Reader(response.content)
-
-        if not content.data:
-            raise ValueError("Data has length zero")
-        
-        header = content.read_bytes(3).decode()
-        if header != "PAS":
-            raise ValueError("PAS Header not found")
-
-        # Skip unnecessary bytes
-        content.read_bytes(2 + 3 + 3 + 2)
-        file_avatars = content.read_int24()
-        content.read_bytes(3 + 1)
-
-        ids = []
-        dynamic_bytes = content.read_bytes(16)
-        dynamic_bytes = [e ^ self.static_bytes[i] for i, e in enumerate(dynamic_bytes)]
-        avatar_ids = content.read_bytes(file_avatars * 16)
-
-        for i in range(file_avatars):
-            avatar_id = self.decode_avatar_id(
-                avatar_ids[i*16:(i*16)+16],
-                dynamic_bytes
-            )
-            ids.append(avatar_id)
-
-        return ids
-
-    def mark_avatars(self, main_data: Dict, ids: List[str], platform: str):
-        nfa = []
-        duplicates = 0
-        for avatar_id in ids:
-            entry = main_data['idMap'].get(avatar_id)
-            if not entry:
-                nfa.append(avatar_id)
-                continue
-            
-            # Only add platform if it's not already there
-            if platform not in entry['platforms']:
-                entry['platforms'].append(platform)
-            else:
-                duplicates += 1
-
-        print(f"Marked {len(ids) - len(nfa)} {platform} avatars.")
-        if nfa:
-            print(f"Found {len(nfa)} missing from the main list")
-        if duplicates > 0:
-            print(f"Skipped {duplicates} duplicate {platform} entries")
+            self.bus.post(self.root.after, 5000, self.root.destroy)
 
 if __name__ == "__main__":
     app = DatabaseUI()
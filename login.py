@@ -142,7 +142,7 @@ def login_window():
                             messagebox.showinfo("Success", "Login successful!")
                             root.destroy()
                             import avatar_browser
-                            avatar_browser.root.mainloop()
+                            avatar_browser.main()
                         else:
                             messagebox.showerror("Error", "Invalid 2FA code")
                     
@@ -164,7 +164,7 @@ def login_window():
                     root.destroy()
 
                     import avatar_browser
-                    avatar_browser.root.mainloop()
+                    avatar_browser.main()
                     
             else:
                 messagebox.showerror("Error", f"Login failed: {auth_response.status_code}")
@@ -197,7 +197,7 @@ def login_window():
                 messagebox.showinfo("Success", "Already logged in!")
                 root.destroy()
                 import avatar_browser
-                avatar_browser.root.mainloop()
+                avatar_browser.main()
                 return
             elif verify_response.status_code == 401:
                 # If unauthorized, clear the saved credentials
@@ -0,0 +1,11 @@
+"""Prismic avatar database: PAS decoding, the SQLite store and search.
+
+Nothing in here needs a display, the Tk windows live in database_ui.py
+and avatar_browser.py at the repository root.
+"""
+from prismic.database import AvatarDatabase, Reader
+from prismic.query import parse_query
+from prismic.search import SearchEngine
+from prismic.store import AvatarStore
+
+__all__ = ['AvatarDatabase', 'AvatarStore', 'Reader', 'SearchEngine', 'parse_query']
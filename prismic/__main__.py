@@ -0,0 +1,5 @@
+import sys
+
+from prismic.cli import main
+
+sys.exit(main())
@@ -0,0 +1,109 @@
+"""A whole page of tiles composited into one image.
+
+The grid of Tk frames costs a PhotoImage and eight widgets per tile. In
+atlas mode a worker thread pastes every thumbnail (platform badges
+already drawn) with its name and author into one Pillow image, the Tk
+thread turns that into a single PhotoImage on the canvas, and clicks are
+mapped back to a tile with hit():
+
+    atlas = PageAtlas(columns=10)
+    image = atlas.compose(avatars, tiles)    # worker thread, Pillow only
+    atlas.paste_tile(image, index, tile)     # a tile that arrived later
+    hit = atlas.hit(x, y, len(avatars))      # canvas coordinates -> (index, 'image' | 'name' | 'author')
+"""
+from typing import Dict, Optional, Sequence, Tuple
+
+from prismic.thumbnails import TILE_SIZE
+
+CELL_SIZE = (140, 164)
+PADDING = 6
+
+# Offsets of the two text lines below the thumbnail, inside a cell
+NAME_Y = TILE_SIZE[1] + 6
+AUTHOR_Y = NAME_Y + 18
+
+def load_font(size: int):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        # Pillow before 10.1 only has the fixed size bitmap font
+        return ImageFont.load_default()
+
+def ellipsize(font, text: str, width: int) -> str:
+    if font.getlength(text) <= width:
+        return text
+    # Binary search on the prefix length, measuring text is the slow part
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if font.getlength(text[:middle] + "...") <= width:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + "..."
+
+class PageAtlas:
+    def __init__(self, columns: int, background: Tuple[int, int, int] = (240, 240, 240)):
+        self.columns = columns
+        self.background = background
+        self.name_font = None
+        self.author_font = None
+
+    def cell_origin(self, index: int) -> Tuple[int, int]:
+        row, col = divmod(index, self.columns)
+        return PADDING + col * (CELL_SIZE[0] + PADDING), PADDING + row * (CELL_SIZE[1] + PADDING)
+
+    def image_origin(self, index: int) -> Tuple[int, int]:
+        x, y = self.cell_origin(index)
+        return x + (CELL_SIZE[0] - TILE_SIZE[0]) // 2, y
+
+    def size(self, count: int) -> Tuple[int, int]:
+        rows = max(1, (count + self.columns - 1) // self.columns)
+        columns = min(max(1, count), self.columns)
+        return PADDING + columns * (CELL_SIZE[0] + PADDING), PADDING + rows * (CELL_SIZE[1] + PADDING)
+
+    def compose(self, avatars: Sequence[Dict], tiles: Sequence[Optional[object]]):
+        """Paste tiles[i] (a TILE_SIZE RGBA image or None) with the name and author of avatars[i]."""
+        from PIL import Image, ImageDraw
+
+        if self.name_font is None:
+            self.name_font = load_font(12)
+            self.author_font = load_font(11)
+
+        atlas = Image.new('RGB', self.size(len(avatars)), self.background)
+        draw = ImageDraw.Draw(atlas)
+        text_width = CELL_SIZE[0] - 4
+        for index, (avatar, tile) in enumerate(zip(avatars, tiles)):
+            x, y = self.cell_origin(index)
+            image_x, _ = self.image_origin(index)
+            if tile is not None:
+                atlas.paste(tile, (image_x, y), tile)
+            else:
+                draw.rectangle([image_x, y, image_x + TILE_SIZE[0] - 1, y + TILE_SIZE[1] - 1], outline=(160, 160, 160))
+
+            draw.text((x + 2, y + NAME_Y), ellipsize(self.name_font, avatar['name'], text_width),
+                      font=self.name_font, fill=(0, 0, 0))
+            draw.text((x + 2, y + AUTHOR_Y), ellipsize(self.author_font, f"by {avatar['author']}", text_width),
+                      font=self.author_font, fill=(0, 0, 238))
+        return atlas
+
+    def paste_tile(self, atlas, index: int, tile):
+        """Replace the thumbnail of tile index in a composed atlas, in place."""
+        x, y = self.image_origin(index)
+        atlas.paste(self.background, (x, y, x + TILE_SIZE[0], y + TILE_SIZE[1]))
+        atlas.paste(tile, (x, y), tile)
+
+    def hit(self, x: float, y: float, count: int) -> Optional[Tuple[int, str]]:
+        """The tile index and part of the tile at (x, y), None between tiles."""
+        col, cell_x = divmod(int(x) - PADDING, CELL_SIZE[0] + PADDING)
+        row, cell_y = divmod(int(y) - PADDING, CELL_SIZE[1] + PADDING)
+        if col < 0 or row < 0 or col >= self.columns or cell_x >= CELL_SIZE[0] or cell_y >= CELL_SIZE[1]:
+            return None
+        index = row * self.columns + col
+        if index >= count:
+            return None
+        if cell_y < NAME_Y:
+            return index, 'image'
+        return index, 'name' if cell_y < AUTHOR_Y else 'author'
@@ -0,0 +1,62 @@
+"""Platform badges and stand-in tiles, rendered once.
+
+Every combination of the PC/Quest/iOS bits gets a transparent overlay
+the size of a tile with its badges drawn in the top right corner, so
+labelling a tile is one alpha_composite instead of measuring and drawing
+text for each platform.
+
+    badges = Badges()
+    tile = badges.apply(decode_tile(data), avatar['platforms'])
+"""
+from typing import Iterable
+
+from prismic.store import PLATFORM_BITS, platforms_to_mask
+from prismic.thumbnails import TILE_SIZE
+
+PLATFORM_COLORS = {
+    "PC": "blue",
+    "Quest": "green",
+    "iOS": "purple"
+}
+
+class Badges:
+    def __init__(self):
+        from PIL import Image, ImageDraw, ImageFont
+
+        font = ImageFont.load_default()
+        width = TILE_SIZE[0]
+        self.overlays = []
+        for mask in range(1 << len(PLATFORM_BITS)):
+            overlay = Image.new('RGBA', TILE_SIZE, (0, 0, 0, 0))
+            draw = ImageDraw.Draw(overlay)
+            y = 2
+            for platform, bit in PLATFORM_BITS.items():
+                if not mask & bit:
+                    continue
+                bbox = draw.textbbox((0, 0), platform, font=font)
+                w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+                draw.rectangle([width - w - 8, y, width - 2, y + h + 2], fill="black")
+                draw.text((width - w - 5, y), platform, font=font, fill=PLATFORM_COLORS[platform])
+                y += h + 4
+            self.overlays.append(overlay)
+
+        # Shown when an image downloads but cannot be decoded
+        self.error = Image.new('RGBA', TILE_SIZE, (255, 0, 0, 255))
+        ImageDraw.Draw(self.error).text((10, 40), "Error", font=font, fill=(0, 0, 0, 255))
+
+        # For avatars the API has no details for, banned or deleted
+        self.unavailable = Image.new('RGBA', TILE_SIZE, (90, 90, 90, 255))
+        ImageDraw.Draw(self.unavailable).text((10, 52), "Unavailable", font=font, fill=(220, 220, 220, 255))
+
+        # Stands in for an image that has not arrived yet
+        self.placeholder = Image.new('RGBA', TILE_SIZE, (200, 200, 200, 255))
+        ImageDraw.Draw(self.placeholder).rectangle([0, 0, TILE_SIZE[0] - 1, TILE_SIZE[1] - 1], outline=(160, 160, 160))
+
+    def placeholder_for(self, platforms: Iterable[str]):
+        return self.apply(self.placeholder, platforms)
+
+    def apply(self, tile, platforms: Iterable[str]):
+        """tile (TILE_SIZE, RGBA) with the badges of platforms, as a new image."""
+        from PIL import Image
+
+        return Image.alpha_composite(tile, self.overlays[platforms_to_mask(platforms)])
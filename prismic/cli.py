@@ -0,0 +1,184 @@
+"""Headless command line for the avatar database.
+
+    python -m prismic update
+    python -m prismic search "cat -ears" --platform quest --json
+    python -m prismic search --by-author SomeAuthor
+    python -m prismic serve --host 0.0.0.0 --port 8080
+    python -m prismic warm --top-authors 50 --rate 5
+    python -m prismic --profile --profile-stage parse update
+"""
+import argparse
+import json
+import sys
+from typing import List, Optional
+
+from prismic import profiling, server, warm as warming
+from prismic.database import AvatarDatabase
+from prismic.search import SearchEngine
+from prismic.store import PLATFORM_BITS
+from prismic.thumbnails import ThumbnailCache
+
+def platform_name(value: str) -> str:
+    for platform in PLATFORM_BITS:
+        if platform.lower() == value.lower():
+            return platform
+    raise argparse.ArgumentTypeError(f"unknown platform {value!r}, expected one of {', '.join(PLATFORM_BITS)}")
+
+def update(args) -> int:
+    db = AvatarDatabase(args.cache_dir)
+    try:
+        delta = db.update()
+    except RuntimeError as e:
+        print(e)
+        return 1
+    if delta is None:
+        print("Database already up to date")
+    else:
+        print(f"Changes: +{delta['added']} / -{delta['removed']} / ~{delta['updated']}")
+    print(f"Avatars: {db.meta.get('avatars', '')}  Authors: {db.meta.get('authors', '')}  "
+          f"Last update: {db.meta.get('last_update', '')}")
+    return 0
+
+def search(args) -> int:
+    db = AvatarDatabase(args.cache_dir)
+    store = db.open_store()
+    if store.generation == 0:
+        print("The avatar store is empty, run 'python -m prismic update' first", file=sys.stderr)
+        return 1
+
+    try:
+        engine = SearchEngine(store)
+        if args.by_author:
+            avatars, total = engine.author_avatars(args.by_author, offset=args.offset, limit=args.limit)
+        else:
+            avatars, total = engine.search(
+                ' '.join(args.query), args.author, args.platform or [],
+                offset=args.offset, limit=args.limit, fuzzy=args.fuzzy
+            )
+    finally:
+        store.close()
+
+    if args.json:
+        json.dump({'total': total, 'offset': args.offset, 'avatars': avatars}, sys.stdout, ensure_ascii=False)
+        sys.stdout.write('\n')
+        return 0
+
+    for avatar in avatars:
+        print(f"{avatar['avatar_id']}  {avatar['name']}  by {avatar['author']}  [{', '.join(avatar['platforms'])}]")
+    print(f"{len(avatars)} of {total} avatars")
+    return 0
+
+def serve(args) -> int:
+    db = AvatarDatabase(args.cache_dir)
+    # Build the store or its indexes once here, the server only reads it
+    store = db.open_store()
+    empty = store.generation == 0
+    store.close()
+    if empty:
+        print("The avatar store is empty, run 'python -m prismic update' first", file=sys.stderr)
+        return 1
+
+    server.run(db.db_path, args.host, args.port, args.workers)
+    return 0
+
+def warm(args) -> int:
+    try:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Could not read {args.config} ({e}), run login.py first", file=sys.stderr)
+        return 1
+
+    db = AvatarDatabase(args.cache_dir)
+    store = db.open_store()
+    if store.generation == 0:
+        print("The avatar store is empty, run 'python -m prismic update' first", file=sys.stderr)
+        store.close()
+        return 1
+
+    try:
+        if args.top_authors:
+            job = {'top_authors': args.top_authors, 'max_avatars': args.max_avatars}
+            avatars = []
+            for author in store.top_authors(args.top_authors):
+                avatars += store.by_author(author['name'], 0, args.max_avatars - len(avatars))[0]
+                if len(avatars) >= args.max_avatars:
+                    break
+        elif args.by_author:
+            job = {'by_author': args.by_author, 'max_avatars': args.max_avatars}
+            avatars = store.by_author(args.by_author, 0, args.max_avatars)[0]
+        else:
+            query = ' '.join(args.query)
+            job = {'query': query, 'author': args.author, 'platforms': args.platform or [],
+                   'fuzzy': args.fuzzy, 'max_avatars': args.max_avatars}
+            avatars = SearchEngine(store).search(query, args.author, args.platform or [],
+                                                 limit=args.max_avatars, fuzzy=args.fuzzy)[0]
+        print(f"Warming {len(avatars)} avatars at up to {args.rate:g} requests/s")
+
+        warmer = warming.Warmer(
+            store, ThumbnailCache(db.cache_dir / 'thumbnails'),
+            {"Cookie": f"auth={config['auth_cookie']}", "User-Agent": "VRChatAPI/1.0"},
+            args.api_base, args.rate, args.workers
+        )
+        checkpoint = warming.Checkpoint(args.checkpoint or db.cache_dir / 'warm_checkpoint.json', job)
+        stats = warmer.run(avatars, checkpoint)
+    finally:
+        store.close()
+
+    print(f"Done in {stats['seconds']:.1f}s: {stats['tiles']} tiles fetched, {stats['warm']} already warm, "
+          f"{stats['missing']} missing, {stats['failed']} failed")
+    return 0
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="prismic", description="Prismic avatar database without the UI")
+    parser.add_argument("--cache-dir", default="cache", help="directory holding the cache and store (default: cache)")
+    parser.add_argument("--profile", action="store_true", help="print stage timings and counters to stderr at exit")
+    parser.add_argument("--profile-trace", metavar="PATH", help="also write a Chrome trace JSON file")
+    parser.add_argument("--profile-stage", metavar="NAME", help="profile every pass through this stage, e.g. parse")
+    parser.add_argument("--profile-mode", choices=("cprofile", "tracemalloc"), help="profiler for --profile-stage")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    update_parser = commands.add_parser("update", help="download the PAS files and refresh the store")
+    update_parser.set_defaults(func=update)
+
+    search_parser = commands.add_parser("search", help="search the store, same syntax as the browser search box")
+    search_parser.add_argument("query", nargs="*", help="name/description query")
+    search_parser.add_argument("--author", default="", help="author name substring")
+    search_parser.add_argument("--by-author", metavar="NAME", help="list every avatar of this exact author")
+    search_parser.add_argument("--platform", action="append", type=platform_name,
+                               help="only avatars on this platform, can be repeated")
+    search_parser.add_argument("--fuzzy", action="store_true", help="typo tolerant name match")
+    search_parser.add_argument("--offset", type=int, default=0)
+    search_parser.add_argument("--limit", type=int, default=20)
+    search_parser.add_argument("--json", action="store_true", help="print results as one JSON object")
+    search_parser.set_defaults(func=search)
+
+    serve_parser = commands.add_parser("serve", help="answer searches over HTTP")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="address to listen on, 0.0.0.0 for the whole LAN")
+    serve_parser.add_argument("--port", type=int, default=8080)
+    serve_parser.add_argument("--workers", type=int, default=8, help="query threads, each with its own connection")
+    serve_parser.set_defaults(func=serve)
+
+    warm_parser = commands.add_parser("warm", help="fill the details and thumbnail caches for a search or top authors")
+    warm_parser.add_argument("query", nargs="*", help="name/description query to warm")
+    warm_parser.add_argument("--author", default="", help="author name substring")
+    warm_parser.add_argument("--by-author", metavar="NAME", help="warm every avatar of this exact author")
+    warm_parser.add_argument("--top-authors", type=int, metavar="N", help="warm the N authors with the most avatars")
+    warm_parser.add_argument("--platform", action="append", type=platform_name,
+                             help="only avatars on this platform, can be repeated")
+    warm_parser.add_argument("--fuzzy", action="store_true", help="typo tolerant name match")
+    warm_parser.add_argument("--max-avatars", type=int, default=1000, help="stop after this many avatars")
+    warm_parser.add_argument("--rate", type=float, default=5.0, help="requests per second, 0 for no limit")
+    warm_parser.add_argument("--workers", type=int, default=4)
+    warm_parser.add_argument("--checkpoint", metavar="PATH",
+                             help="progress file to resume from (default: <cache-dir>/warm_checkpoint.json)")
+    warm_parser.add_argument("--config", default="config.json", help="login.py config with the auth cookie")
+    warm_parser.add_argument("--api-base", default=warming.API_BASE, help="API root, PRISMIC_API_BASE by default")
+    warm_parser.set_defaults(func=warm)
+    return parser
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.profile or args.profile_trace or args.profile_stage:
+        profiling.profiler.configure(True, args.profile_trace, args.profile_stage, args.profile_mode)
+    return args.func(args)
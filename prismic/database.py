@@ -0,0 +1,541 @@
+import json
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Union
+
+from prismic import profiling
+from prismic.store import AvatarStore
+
+class Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.position = 0
+
+    def read_byte(self) -> int:
+        if self.position >= len(self.data):
+            raise ValueError("Attempted to read beyond end of data")
+        value = self.data[self.position]
+        self.position += 1
+        return value
+
+    def read_bytes(self, amount: int) -> bytes:
+        if self.position + amount > len(self.data):
+            raise ValueError("Attempted to read beyond end of data")
+        bytes_ = self.data[self.position:self.position + amount]
+        self.position += amount
+        return bytes_
+
+    def read_int_array(self, n: int) -> List[int]:
+        total_bytes = n * 4
+        if self.position + total_bytes > len(self.data):
+            raise ValueError("Attempted to read beyond end of data")
+        
+        result = list(struct.unpack_from(f'<{n}i', self.data, self.position))
+        self.position += total_bytes
+        return result
+
+    def read_int24(self) -> int:
+        if self.position + 3 > len(self.data):
+            raise ValueError("Attempted to read beyond end of data")
+        
+        bytes_ = self.read_bytes(3)
+        return (bytes_[0] << 16) | (bytes_[1] << 8) | bytes_[2]
+
+    def remaining(self) -> int:
+        return len(self.data) - self.position
+
+# Bytes needed before read_header can run: magic, version, counts, date,
+# file counts, flag size and the 16 byte key
+PAS_HEADER_SIZE = 36
+
+# XOR'd with the per file key stored in the header to get the id key
+STATIC_BYTES = [208, 29, 107, 36, 251, 69, 122, 14, 67, 204, 171, 246, 106, 38, 183, 224]
+
+class AvatarDatabase:
+    def __init__(self, cache_dir: Union[str, Path] = "cache"):
+        self.urls = [
+            "https://gist.githubusercontent.com/Mwr247/a80c1f9060fc4fd46a8f00d589c47c5a/raw/pasavtrdb.txt",
+            "https://gist.githubusercontent.com/Mwr247/a80c1f9060fc4fd46a8f00d589c47c5a/raw/pasavtrdb_qst.txt",
+            "https://gist.githubusercontent.com/Mwr247/a80c1f9060fc4fd46a8f00d589c47c5a/raw/pasavtrdb_ios.txt"
+        ]
+        self.static_bytes = STATIC_BYTES
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(exist_ok=True)
+        self.cache_path = self.cache_dir / 'avatar_data.json'
+        self.log_path = self.cache_dir / 'avatar_data.log'
+        self.db_path = self.cache_dir / 'avatar_data.db'
+        self.meta_path = self.cache_dir / 'pas_meta.json'
+        self.meta = self.load_meta()
+        self.pending_meta = {}
+        self.failed_platforms = []
+        self.cached = None
+
+    def load_meta(self) -> Dict:
+        # Validators are only trusted while the cache they describe exists
+        if not self.cache_path.exists() or not self.meta_path.exists():
+            return {'files': {}}
+        try:
+            with open(self.meta_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Ignoring unreadable {self.meta_path}: {e}")
+            return {'files': {}}
+
+    def save_meta(self, main_data: Optional[List[Dict]] = None):
+        """Record the validators of the files that were just processed.
+
+        Call this only after the cache itself has been written, otherwise a
+        failed write would be skipped as "unchanged" on the next run.
+        """
+        self.meta.setdefault('files', {}).update(self.pending_meta)
+        self.pending_meta = {}
+        if main_data is not None:
+            self.meta['avatars'] = len(main_data)
+            self.meta['authors'] = len(set(avatar['author'] for avatar in main_data))
+        dates = [entry['last_update'] for entry in self.meta['files'].values() if entry.get('last_update')]
+        if dates:
+            self.meta['last_update'] = max(dates)
+        with open(self.meta_path, 'w', encoding='utf-8') as f:
+            json.dump(self.meta, f, indent=2)
+
+    @profiling.timed('cache.load')
+    def load_cache(self) -> List[Dict]:
+        """Load the cache snapshot and replay the change log on top of it."""
+        with open(self.cache_path, 'r', encoding='utf-8') as f:
+            avatars = {avatar['avatar_id']: avatar for avatar in json.load(f)}
+
+        if self.log_path.exists():
+            with open(self.log_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn last line from an interrupted append
+                        break
+                    if record['op'] == 'add':
+                        avatars[record['avatar']['avatar_id']] = record['avatar']
+                    elif record['op'] == 'remove':
+                        avatars.pop(record['avatar_id'], None)
+                    elif record['op'] == 'update' and record['avatar_id'] in avatars:
+                        avatars[record['avatar_id']].update(record['fields'])
+
+        return list(avatars.values())
+
+    def cached_data(self) -> List[Dict]:
+        if self.cached is None:
+            self.cached = self.load_cache()
+        return self.cached
+
+    @profiling.timed('cache.write')
+    def save_cache(self, main_data: List[Dict]):
+        """Write a full snapshot and drop the change log it replaces."""
+        tmp_path = self.cache_path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(main_data, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.cache_path)
+        if self.log_path.exists():
+            self.log_path.unlink()
+        self.cached = main_data
+
+    @profiling.timed('cache.delta')
+    def compute_delta(self, old_data: List[Dict], new_data: List[Dict], failed: Iterable[str] = ()) -> Dict:
+        """Added avatars, removed ids and changed fields between two avatar lists.
+
+        Avatars listed on a platform in failed, one that could not be
+        fetched, are never removed just because new_data lacks them.
+        """
+        failed = set(failed)
+        old_by_id = {avatar['avatar_id']: avatar for avatar in old_data}
+        added = []
+        updated = []
+        for avatar in new_data:
+            old = old_by_id.pop(avatar['avatar_id'], None)
+            if old is None:
+                added.append(avatar)
+            elif old != avatar:
+                fields = {key: value for key, value in avatar.items() if old.get(key) != value}
+                updated.append({'avatar_id': avatar['avatar_id'], 'fields': fields})
+        removed = [avatar_id for avatar_id, old in old_by_id.items() if not failed.intersection(old['platforms'])]
+        return {'added': added, 'removed': removed, 'updated': updated}
+
+    @profiling.timed('cache.update')
+    def update_cache(self, main_data: List[Dict]) -> Dict:
+        """Bring the cache in line with main_data, writing only what changed.
+
+        Changes are appended to the log as add/remove/update records. Once
+        the log grows past half the snapshot size it is folded back into a
+        fresh snapshot. The SQLite store gets the same changes as upserts.
+        Returns how many avatars were added, removed and updated.
+        """
+        if not self.cache_path.exists():
+            self.save_cache(main_data)
+            self.update_store(None, main_data)
+            return {'added': len(main_data), 'removed': 0, 'updated': 0}
+
+        cached = self.cached_data()
+        delta = self.compute_delta(cached, main_data, self.failed_platforms)
+        if self.failed_platforms:
+            # Keep what the delta did not remove in the snapshot as well
+            new_ids = {avatar['avatar_id'] for avatar in main_data}
+            removed = set(delta['removed'])
+            main_data = main_data + [avatar for avatar in cached
+                                     if avatar['avatar_id'] not in new_ids and avatar['avatar_id'] not in removed]
+        self.update_store(delta, main_data)
+        if any(delta.values()):
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                for avatar in delta['added']:
+                    f.write(json.dumps({'op': 'add', 'avatar': avatar}, ensure_ascii=False) + '\n')
+                for avatar_id in delta['removed']:
+                    f.write(json.dumps({'op': 'remove', 'avatar_id': avatar_id}) + '\n')
+                for change in delta['updated']:
+                    f.write(json.dumps({'op': 'update', **change}, ensure_ascii=False) + '\n')
+            self.cached = main_data
+
+            if self.log_path.stat().st_size > self.cache_path.stat().st_size // 2:
+                print("Compacting cache change log")
+                self.save_cache(main_data)
+
+        summary = {key: len(value) for key, value in delta.items()}
+        print(f"Cache delta: {summary['added']} added, {summary['removed']} removed, {summary['updated']} updated")
+        return summary
+
+    @profiling.timed('store.update')
+    def update_store(self, delta: Optional[Dict], main_data: List[Dict]):
+        store = AvatarStore(self.db_path)
+        try:
+            if delta is None or store.generation == 0:
+                store.rebuild(main_data)
+            elif any(delta.values()):
+                store.apply_delta(delta)
+            if not store.has_fuzzy_index:
+                store.build_fuzzy_index()
+        finally:
+            store.close()
+
+    def open_store(self) -> AvatarStore:
+        """Open the SQLite store, building it from the JSON cache if it was never built."""
+        store = AvatarStore(self.db_path)
+        if store.generation == 0 and self.cache_path.exists():
+            print("Building SQLite store from the JSON cache")
+            store.rebuild(self.cached_data())
+        elif store.generation and not store.has_fuzzy_index:
+            print("Building fuzzy name index")
+            store.build_fuzzy_index()
+        return store
+
+    @profiling.timed('update')
+    def update(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> Optional[Dict]:
+        """Refresh the cache and store from upstream.
+
+        Returns the number of avatars added, removed and updated, or None
+        when every file was unchanged and nothing was rewritten. Raises
+        RuntimeError when the files that did change all failed.
+        """
+        main_data = self.process_database(progress_callback=progress_callback)
+        if main_data is None and self.failed_platforms:
+            raise RuntimeError(f"Could not update the {', '.join(self.failed_platforms)} database")
+        if main_data is None:
+            # Nothing changed upstream, the cache on disk is still current
+            self.save_meta()
+            return None
+
+        # Save only the differences to the cache
+        delta = self.update_cache(main_data)
+        self.save_meta(main_data)
+        return delta
+
+    def decode_avatar_id(self, crypt: bytes, iv: bytes) -> str:
+        # XOR decryption of 16 bytes
+        decoded = [crypt[i] ^ iv[i] for i in range(16)]
+
+        # Convert to hex
+        hex_bytes = [f"{x:02x}" for x in decoded]
+
+        # Format as proper UUID (8-4-4-4-12)
+        uuid = (
+            f"{''.join(hex_bytes[0:4])}-"
+            f"{''.join(hex_bytes[4:6])}-"
+            f"{''.join(hex_bytes[6:8])}-"
+            f"{''.join(hex_bytes[8:10])}-"
+            f"{''.join(hex_bytes[10:16])}"
+        )
+
+        return f"avtr_{uuid}"
+
+    def read_header(self, content: Reader) -> Dict:
+        header = bytes(content.read_bytes(3)).decode()
+        if header != "PAS":
+            raise ValueError("PAS Header not found")
+
+        content.read_bytes(2)  # Skip platform and format version
+        avatar_count = content.read_int24()
+        author_count = content.read_int24()
+
+        date_arr = content.read_bytes(2)
+        date_num = ((date_arr[0] << 8) + date_arr[1]) >> 3
+        year = ((date_num >> 9) + 16)
+        month = ((date_num >> 5) & 15)
+        day = (date_num & 31)
+        last_update = f"20{year:02d}-{month:02d}-{day:02d}"
+
+        file_avatars = content.read_int24()
+        file_authors = content.read_int24()
+
+        flag_size = content.read_byte()
+        random_bytes = content.read_bytes(16)
+        dynamic_bytes = [e ^ self.static_bytes[i] for i, e in enumerate(random_bytes)]
+
+        return {
+            'avatar_count': avatar_count,
+            'author_count': author_count,
+            'last_update': last_update,
+            'file_avatars': file_avatars,
+            'file_authors': file_authors,
+            'flag_size': flag_size,
+            'dynamic_bytes': dynamic_bytes
+        }
+
+    @profiling.timed('download')
+    def download_pas(self, url: str, progress: Optional[Callable[[int], None]] = None,
+                     known: Optional[Dict] = None) -> Optional[bytearray]:
+        """Stream a PAS file into a single growable buffer.
+
+        The header is checked as soon as its bytes arrive so a bad file fails
+        before the rest is downloaded. Progress covers 0-50 and is measured in
+        bytes read off the wire, which is what Content-Length counts even when
+        the body is gzip encoded.
+
+        `known` holds the validators saved by the previous run. Returns None
+        when the file has not changed since then, either because the server
+        answered 304 or because the header date and counts are the same.
+        """
+        headers = {}
+        if known:
+            if known.get('etag'):
+                headers['If-None-Match'] = known['etag']
+            if known.get('last_modified'):
+                headers['If-Modified-Since'] = known['last_modified']
+
+        # Imported here so reading the cache or store never pays for it
+        import requests
+
+        with requests.get(url, headers=headers, stream=True, timeout=30) as response:
+            if response.status_code == 304:
+                print(f"Not modified: {url}")
+                profiling.count('download.not_modified')
+                return None
+            response.raise_for_status()
+            total = int(response.headers.get('Content-Length') or 0)
+            file_meta = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified')
+            }
+
+            buffer = bytearray()
+            header_checked = False
+            last_value = -1
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                buffer += chunk
+
+                if not header_checked and len(buffer) >= PAS_HEADER_SIZE:
+                    header = self.read_header(Reader(bytes(buffer[:PAS_HEADER_SIZE])))
+                    header_checked = True
+                    for key in ('last_update', 'avatar_count', 'author_count'):
+                        file_meta[key] = header[key]
+
+                    if known and all(known.get(key) == file_meta[key]
+                                     for key in ('last_update', 'avatar_count', 'author_count')):
+                        # Same file under new validators, keep them for the next 304
+                        print(f"Header unchanged since {header['last_update']}: {url}")
+                        self.pending_meta[url] = file_meta
+                        return None
+
+                if progress and total:
+                    value = min(50, response.raw.tell() * 50 // total)
+                    if value != last_value:
+                        progress(value)
+                        last_value = value
+
+        if progress:
+            progress(50)
+        profiling.count('download.bytes', len(buffer))
+        self.pending_meta[url] = file_meta
+        return buffer
+
+    def get_prismic_obj(self, url: str, platform: str, progress: Optional[Callable[[int], None]] = None,
+                        known: Optional[Dict] = None) -> Optional[List[Dict]]:
+        data = self.download_pas(url, progress, known)
+        if data is None:
+            if progress:
+                progress(100)
+            return None
+        return self.parse_prismic_obj(data, platform, progress)
+
+    @profiling.timed('parse')
+    def parse_prismic_obj(self, data: bytearray, platform: str, progress: Optional[Callable[[int], None]] = None) -> List[Dict]:
+        # Slices of a memoryview share the download buffer instead of copying it
+        content = Reader(memoryview(data))
+
+        if not content.data:
+            raise ValueError("Data has length zero")
+
+        header = self.read_header(content)
+        file_avatars = header['file_avatars']
+        dynamic_bytes = header['dynamic_bytes']
+
+        data_size = file_avatars * 16
+        avatar_ids = content.read_bytes(data_size)
+        flags = content.read_int_array(file_avatars)
+        author_ids = content.read_int_array(file_avatars)
+
+        strings = str(content.read_bytes(content.remaining()), 'utf-8').split('\n')
+        if len(strings) < 2:
+            raise ValueError("Malformed string block")
+
+        author_names = strings[0].split('\r')
+        avatar_names = strings[1].split('\r')
+        del strings
+
+        decoded_entries = []
+        progress_step = max(1, file_avatars // 50)
+        with profiling.timer('parse.decode'):
+            for i in range(file_avatars):
+                if progress and i % progress_step == 0:
+                    progress(50 + (i * 50) // file_avatars)
+                avatar_id = self.decode_avatar_id(
+                    avatar_ids[i * 16:(i * 16) + 16],
+                    dynamic_bytes
+                )
+                name_desc = avatar_names[i].split('\t')
+                obj = {
+                    'avatar_id': avatar_id,
+                    'name': name_desc[0][::-1],
+                    'author': author_names[author_ids[i] & 524287][::-1],
+                    'description': name_desc[1][::-1] if len(name_desc) > 1 else '',
+                    'platforms': [platform]
+                }
+                decoded_entries.append(obj)
+        profiling.count('parse.avatars', file_avatars)
+
+        if progress:
+            progress(100)
+        print(f"Decoded {len(decoded_entries)} {platform} entries")
+        return decoded_entries
+
+    @profiling.timed('process')
+    def process_database(self, progress_callback: Optional[Callable[[int, int], None]] = None) -> Optional[List[Dict]]:
+        """Download, decode and merge the three platform files.
+
+        Returns None when none of the files changed since the last saved
+        cache, in which case nothing needs to be parsed or rewritten.
+        Platforms that are unchanged or failed to download or parse keep
+        their entries from the cache, a failure never empties a platform.
+        """
+        platforms = ['PC', 'Quest', 'iOS']
+        results = {}
+        known_files = self.meta.get('files', {})
+        self.failed_platforms = []
+
+        # Download and parse every platform file at the same time
+        with ThreadPoolExecutor(max_workers=len(self.urls)) as executor:
+            futures = {}
+            for step, (platform, url) in enumerate(zip(platforms, self.urls)):
+                print(f"\nProcessing {platform} database...")
+                progress = None
+                if progress_callback:
+                    progress = lambda value, step=step: progress_callback(step, value)
+                futures[executor.submit(self.get_prismic_obj, url, platform, progress, known_files.get(url))] = (platform, url)
+
+            for future in as_completed(futures):
+                platform, url = futures[future]
+                try:
+                    results[platform] = future.result()
+                except Exception as e:
+                    print(f"Error processing {platform} database: {e}")
+                    self.failed_platforms.append(platform)
+                    # Download it again next time, whatever validators it came with
+                    known_files.pop(url, None)
+                    self.pending_meta.pop(url, None)
+
+        if all(results.get(platform) is None for platform in platforms):
+            # Nothing new was fetched, the cache on disk is as good as it gets
+            return None
+
+        kept = [platform for platform in platforms if results.get(platform) is None]
+        if kept and self.cache_path.exists():
+            # Rebuild the untouched and failed platforms from the cache instead of downloading them
+            cached = self.cached_data()
+            for platform in kept:
+                results[platform] = [
+                    dict(avatar, platforms=[platform]) for avatar in cached if platform in avatar['platforms']
+                ]
+
+        # Merge in a fixed platform order once every download has finished
+        all_avatars = {}
+        for platform in platforms:
+            for avatar in results.get(platform) or []:
+                avatar_id = avatar['avatar_id']
+                if avatar_id not in all_avatars:
+                    all_avatars[avatar_id] = avatar
+                else:
+                    # If already exists, just add the platform if it's not already listed
+                    if platform not in all_avatars[avatar_id]['platforms']:
+                        all_avatars[avatar_id]['platforms'].append(platform)
+
+        final_list = list(all_avatars.values())
+        return final_list
+
+    def get_aux_prismic_obj(self, url: str) -> List[str]:
+        import requests
+
+        response = requests.get(url)
+        content = Reader(response.content)
+
+        if not content.data:
+            raise ValueError("Data has length zero")
+        
+        header = content.read_bytes(3).decode()
+        if header != "PAS":
+            raise ValueError("PAS Header not found")
+
+        # Skip unnecessary bytes
+        content.read_bytes(2 + 3 + 3 + 2)
+        file_avatars = content.read_int24()
+        content.read_bytes(3 + 1)
+
+        ids = []
+        dynamic_bytes = content.read_bytes(16)
+        dynamic_bytes = [e ^ self.static_bytes[i] for i, e in enumerate(dynamic_bytes)]
+        avatar_ids = content.read_bytes(file_avatars * 16)
+
+        for i in range(file_avatars):
+            avatar_id = self.decode_avatar_id(
+                avatar_ids[i*16:(i*16)+16],
+                dynamic_bytes
+            )
+            ids.append(avatar_id)
+
+        return ids
+
+    def mark_avatars(self, main_data: Dict, ids: List[str], platform: str):
+        nfa = []
+        duplicates = 0
+        for avatar_id in ids:
+            entry = main_data['idMap'].get(avatar_id)
+            if not entry:
+                nfa.append(avatar_id)
+                continue
+            
+            # Only add platform if it's not already there
+            if platform not in entry['platforms']:
+                entry['platforms'].append(platform)
+            else:
+                duplicates += 1
+
+        print(f"Marked {len(ids) - len(nfa)} {platform} avatars.")
+        if nfa:
+            print(f"Found {len(nfa)} missing from the main list")
+        if duplicates > 0:
+            print(f"Skipped {duplicates} duplicate {platform} entries")
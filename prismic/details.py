@@ -0,0 +1,300 @@
+"""Avatar details for a page of tiles in as few round trips as the API allows.
+
+The avatar list endpoint returns the public avatars of one author, image
+URLs included, up to 100 per request:
+
+    GET /avatars?userId=usr_...&releaseStatus=public&n=100&offset=0
+
+The API only really lists the requesting user's own avatars (and featured
+ones); for most other authors it answers with an empty list or refuses.
+Authors whose list came back empty or failed are remembered and fetched
+singly from then on, and after a 401 or 403 nothing is listed any more.
+
+DetailsClient.submit groups a page by author and lists each author with
+several avatars on the page once instead of fetching them one by one.
+The user id comes from the authorId of earlier details, so an author seen
+for the first time costs one single fetch before the list. Avatars a list
+does not return and authors with a single avatar on the page go through
+fetch_one. The list only holds public avatars, so one missing from it may
+still be private or unlisted rather than banned; only fetch_one can tell.
+Everything listed is kept in a bounded cache, so paging through an author's avatars mostly needs no
+requests at all.
+
+With a store attached, the image URLs of every details seen are also
+saved to the avatar_images table. A known avatar then resolves straight
+from the store; URLs older than IMAGE_URL_MAX_AGE are still used, and
+refreshed on a small background pool that the page never waits for.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, InvalidStateError, ThreadPoolExecutor
+from contextlib import nullcontext
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from prismic import profiling
+
+LIST_PAGE_SIZE = 100
+
+# List pages read per author, avatars of prolific authors past them are fetched singly
+MAX_LIST_PAGES = 3
+
+# Avatars by one author on a page before a list beats single fetches
+MIN_LISTED = 2
+
+CACHE_SIZE = 5000
+
+# Stored image URLs older than this are refreshed in the background
+IMAGE_URL_MAX_AGE = 7 * 24 * 3600
+
+def resolve(future: Future, details: Optional[Dict] = None, error: Optional[BaseException] = None):
+    """Settle a details future, unless the page waiting on it cancelled it meanwhile."""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(details)
+    except InvalidStateError:
+        pass
+
+class DetailsClient:
+    def __init__(self, api_base: str, headers: Dict[str, str], fetch_one: Callable[[str], Optional[Dict]],
+                 metrics=None, cache_size: int = CACHE_SIZE):
+        self.api_base = api_base
+        self.headers = headers
+        self.fetch_one = fetch_one
+        self.metrics = metrics
+        self.store = None
+        self.limiter = None
+        self.refresher = None
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.user_ids = {}
+        self.unlisted = set()
+        self.listing_refused = False
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def session(self):
+        import requests
+
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+            session.headers.update(self.headers)
+        return session
+
+    def cached(self, avatar_id: str) -> Optional[Dict]:
+        with self.lock:
+            details = self.cache.get(avatar_id)
+            if details is not None:
+                self.cache.move_to_end(avatar_id)
+        return details
+
+    def remember(self, author: str, details_list: Iterable[Optional[Dict]]):
+        rows = []
+        fetched_at = time.time()
+        with self.lock:
+            for details in details_list:
+                if not details or 'id' not in details:
+                    continue
+                self.cache[details['id']] = details
+                self.cache.move_to_end(details['id'])
+                if author and details.get('authorId'):
+                    self.user_ids[author] = details['authorId']
+                rows.append((details['id'], details.get('imageUrl'), details.get('thumbnailImageUrl'), fetched_at))
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        if rows and self.store is not None:
+            try:
+                self.store.save_image_urls(rows)
+            except Exception as e:
+                logging.error(f"Error saving image URLs: {e}")
+
+    def forget(self, avatar_id: str):
+        """Drop what is known about an avatar, after its image URL stopped working."""
+        with self.lock:
+            self.cache.pop(avatar_id, None)
+        if self.store is not None:
+            self.store.forget_image_urls([avatar_id])
+
+    def user_id(self, author: str) -> Optional[str]:
+        with self.lock:
+            return self.user_ids.get(author)
+
+    def listable(self, author: str) -> bool:
+        """False once listing is refused, or this author's list came back empty or failed."""
+        with self.lock:
+            return not self.listing_refused and self.user_ids.get(author) not in self.unlisted
+
+    @profiling.timed('details.list')
+    def list_author(self, user_id: str, wanted: Set[str]) -> Dict[str, Dict]:
+        """Read an author's avatar list until every wanted id turned up or the list ends.
+
+        Returns the avatars read by id.
+        """
+        import requests
+
+        with self.lock:
+            if self.listing_refused or user_id in self.unlisted:
+                return {}
+
+        found = {}
+        failed = False
+        for page in range(MAX_LIST_PAGES):
+            params = {'userId': user_id, 'releaseStatus': 'public', 'n': LIST_PAGE_SIZE,
+                      'offset': page * LIST_PAGE_SIZE}
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                with (self.metrics.request('details list') if self.metrics else nullcontext({})) as outcome:
+                    r = self.session().get(f"{self.api_base}/avatars", params=params, timeout=10)
+                    outcome['status'], outcome['bytes'] = r.status_code, len(r.content)
+                if r.status_code in (401, 403):
+                    logging.warning(f"Listing avatars refused: Status {r.status_code}, fetching details singly")
+                    with self.lock:
+                        self.listing_refused = True
+                    break
+                if r.status_code != 200:
+                    logging.warning(f"Listing avatars of {user_id} failed: Status {r.status_code}")
+                    failed = True
+                    break
+                items = r.json()
+            except (requests.exceptions.RequestException, ValueError) as e:
+                logging.error(f"Error listing avatars of {user_id}: {e}")
+                failed = True
+                break
+
+            for item in items:
+                found[item['id']] = item
+            if len(items) < LIST_PAGE_SIZE:
+                break
+            if wanted.issubset(found):
+                break
+        if failed or not found:
+            # Not listed for us, or not at all; do not pay for the list on every page
+            with self.lock:
+                self.unlisted.add(user_id)
+            profiling.count('details.unlisted_authors')
+        profiling.count('details.listed', len(found))
+        return found
+
+    def run_one(self, author: str, avatar_id: str, future: Future, cancel=None):
+        if cancel is not None and cancel.is_set():
+            future.cancel()
+        if future.cancelled():
+            return
+        try:
+            details = self.fetch_one(avatar_id)
+        except Exception as e:
+            resolve(future, error=e)
+            return
+        self.remember(author, [details])
+        resolve(future, details)
+
+    def run_group(self, author: str, ids: List[str], futures: Dict[str, Future], executor: Executor, cancel=None):
+        if cancel is not None and cancel.is_set():
+            for avatar_id in ids:
+                futures[avatar_id].cancel()
+        ids = [avatar_id for avatar_id in ids if not futures[avatar_id].cancelled()]
+        if not ids:
+            return
+        try:
+            user_id = self.user_id(author)
+            if user_id is None:
+                # The first avatar's details name the author's user id
+                self.run_one(author, ids[0], futures[ids[0]], cancel)
+                ids = ids[1:]
+                user_id = self.user_id(author)
+
+            listed = self.list_author(user_id, set(ids)) if user_id else {}
+            self.remember(author, listed.values())
+        except Exception as e:
+            logging.error(f"Error listing avatars by {author}: {e}")
+            listed = {}
+
+        for avatar_id in ids:
+            if avatar_id in listed:
+                resolve(futures[avatar_id], listed[avatar_id])
+            else:
+                # Banned, private or unlisted, or past the pages read
+                executor.submit(self.run_one, author, avatar_id, futures[avatar_id], cancel)
+
+    def dispatch(self, avatars: Iterable[Dict], futures: Dict[str, Future], executor: Executor, cancel=None):
+        groups = {}
+        for avatar in avatars:
+            groups.setdefault(avatar['author'], []).append(avatar['avatar_id'])
+
+        for author, ids in groups.items():
+            # An unknown author costs one extra round trip before the list
+            if self.listable(author) and len(ids) >= MIN_LISTED + (self.user_id(author) is None):
+                executor.submit(self.run_group, author, ids, futures, executor, cancel)
+            else:
+                for avatar_id in ids:
+                    executor.submit(self.run_one, author, avatar_id, futures[avatar_id], cancel)
+
+    def refresh(self, avatars: List[Dict]):
+        """Fetch details again in the background, only to update the store."""
+        if self.refresher is None:
+            self.refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="details-refresh")
+        profiling.count('details.refresh', len(avatars))
+        futures = {}
+        for avatar in avatars:
+            future = futures[avatar['avatar_id']] = Future()
+            future.add_done_callback(lambda future, avatar_id=avatar['avatar_id']: self.refreshed(avatar_id, future))
+        self.dispatch(avatars, futures, self.refresher)
+
+    def refreshed(self, avatar_id: str, future: Future):
+        if future.cancelled() or future.exception() is not None or future.result() is not None:
+            return
+        # Banned, deleted or failing: drop the stale URL instead of refreshing it on every page
+        profiling.count('details.refresh_gone')
+        self.forget(avatar_id)
+
+    def submit(self, avatars: Iterable[Dict], executor: Executor, cancel=None) -> Dict[str, Future]:
+        """Start fetching details for avatars, returns a future per avatar id.
+
+        Futures resolve to the details dict, or None when fetch_one found
+        nothing, in whatever order the requests finish. Details read from
+        the store only carry the image URLs and 'stored': True. Once
+        cancel.is_set() (a threading.Event or anything alike), requests
+        not started yet are skipped and their futures cancelled. Callers
+        may also cancel the futures themselves, a cancelled future is never
+        fetched or resolved.
+        """
+        avatars = list(avatars)
+        stored = {}
+        if self.store is not None:
+            try:
+                stored = self.store.image_urls([avatar['avatar_id'] for avatar in avatars])
+            except Exception as e:
+                logging.error(f"Error reading stored image URLs: {e}")
+
+        futures = {}
+        missing = []
+        stale = []
+        now = time.time()
+        for avatar in avatars:
+            avatar_id = avatar['avatar_id']
+            future = futures[avatar_id] = Future()
+            details = self.cached(avatar_id)
+            if details is None and avatar_id in stored:
+                known = stored[avatar_id]
+                details = {'id': avatar_id, 'imageUrl': known['imageUrl'],
+                           'thumbnailImageUrl': known['thumbnailImageUrl'], 'stored': True}
+                if now - known['fetched_at'] > IMAGE_URL_MAX_AGE:
+                    stale.append(avatar)
+
+            if self.metrics is not None:
+                self.metrics.cache_lookup('known details', details is not None)
+            if details is not None:
+                future.set_result(details)
+            else:
+                missing.append(avatar)
+
+        self.dispatch(missing, futures, executor, cancel)
+        if stale:
+            self.refresh(stale)
+        return futures
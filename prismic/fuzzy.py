@@ -0,0 +1,71 @@
+import re
+from typing import List, Set
+
+# Typo tolerance, tokens shorter than LONG_TOKEN get one edit instead of two
+MAX_DISTANCE = 2
+LONG_TOKEN = 5
+
+# Only deletes of the first PREFIX_LENGTH characters are indexed (SymSpell's
+# prefix trick), candidates are verified against the full token afterwards
+PREFIX_LENGTH = 7
+
+MIN_TOKEN_LENGTH = 3
+
+TOKEN_RE = re.compile(r"\w+")
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase name tokens worth indexing, in order and without repeats."""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if (len(token) >= MIN_TOKEN_LENGTH or token.isdigit()) and token not in tokens:
+            tokens.append(token)
+    return tokens
+
+def max_distance(token: str) -> int:
+    # Numbers are never typo corrected, "12" should not find "13"
+    if token.isdigit():
+        return 0
+    return 1 if len(token) < LONG_TOKEN else MAX_DISTANCE
+
+def deletes(token: str, distance: int) -> Set[str]:
+    """Every string reachable from the token prefix by up to distance deletions."""
+    prefix = token[:PREFIX_LENGTH]
+    variants = {prefix}
+    frontier = {prefix}
+    for _ in range(distance):
+        next_frontier = set()
+        for word in frontier:
+            if len(word) <= 1:
+                continue
+            for i in range(len(word)):
+                next_frontier.add(word[:i] + word[i + 1:])
+        next_frontier -= variants
+        variants |= next_frontier
+        frontier = next_frontier
+    return variants
+
+def index_deletes(token: str) -> Set[str]:
+    return deletes(token, 0 if token.isdigit() else MAX_DISTANCE)
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 once it is exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    before_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        before_previous, previous = previous, current
+
+    return previous[-1] if previous[-1] <= limit else limit + 1
@@ -0,0 +1,111 @@
+"""Live network and cache counters for the UI.
+
+Worker threads only put events on a queue. The thread that displays the
+numbers (the Tk thread, from root.after) calls drain(), which folds the
+queued events into the aggregates and returns a snapshot, so the
+aggregates themselves are never shared between threads.
+
+    with metrics.request('details') as outcome:
+        response = requests.get(url)
+        outcome['status'] = response.status_code
+        outcome['bytes'] = len(response.content)
+    metrics.cache_lookup('queries', hit=True)
+"""
+import queue
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Requests per second are counted over this many trailing seconds
+RATE_WINDOW = 5.0
+
+# Latency percentiles cover this many of the latest requests
+LATENCY_SAMPLES = 500
+
+def percentile(ordered, share: float) -> float:
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))] if ordered else 0.0
+
+class Metrics:
+    def __init__(self):
+        self.events = queue.SimpleQueue()
+
+        # Aggregates, only touched by the draining thread
+        self.in_flight = 0
+        self.requests = 0
+        self.bytes = 0
+        self.client_errors = 0
+        self.server_errors = 0
+        self.failures = 0
+        self.finished = deque()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+        self.caches = {}
+
+    def request_started(self, kind: str):
+        self.events.put(('start', kind))
+
+    def request_finished(self, kind: str, status: Optional[int], latency: float, size: int = 0):
+        """status None means the request failed without a response."""
+        self.events.put(('finish', kind, status, latency, size, time.monotonic()))
+
+    def cache_lookup(self, name: str, hit: bool):
+        self.events.put(('cache', name, hit))
+
+    @contextmanager
+    def request(self, kind: str):
+        """Time a request; set 'status' and 'bytes' on the yielded dict."""
+        outcome = {'status': None, 'bytes': 0}
+        self.request_started(kind)
+        start = time.perf_counter()
+        try:
+            yield outcome
+        finally:
+            self.request_finished(kind, outcome['status'], time.perf_counter() - start, outcome['bytes'])
+
+    def drain(self) -> Dict:
+        """Apply every queued event and return a snapshot of the aggregates."""
+        while True:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                break
+            kind = event[0]
+            if kind == 'start':
+                self.in_flight += 1
+            elif kind == 'finish':
+                _, _, status, latency, size, finished_at = event
+                self.in_flight -= 1
+                self.requests += 1
+                self.bytes += size
+                self.finished.append(finished_at)
+                self.latencies.append(latency)
+                if status is None:
+                    self.failures += 1
+                elif 400 <= status < 500:
+                    self.client_errors += 1
+                elif status >= 500:
+                    self.server_errors += 1
+            else:
+                _, name, hit = event
+                counts = self.caches.setdefault(name, [0, 0])
+                counts[0 if hit else 1] += 1
+
+        now = time.monotonic()
+        while self.finished and self.finished[0] < now - RATE_WINDOW:
+            self.finished.popleft()
+
+        ordered = sorted(self.latencies)
+        return {
+            'requests_per_second': len(self.finished) / RATE_WINDOW,
+            'p50_ms': percentile(ordered, 0.50) * 1000,
+            'p95_ms': percentile(ordered, 0.95) * 1000,
+            'p99_ms': percentile(ordered, 0.99) * 1000,
+            'requests': self.requests,
+            'bytes': self.bytes,
+            'in_flight': self.in_flight,
+            'client_errors': self.client_errors,
+            'server_errors': self.server_errors,
+            'failures': self.failures,
+            'hit_rates': {name: (hits / (hits + misses), hits + misses)
+                          for name, (hits, misses) in self.caches.items()}
+        }
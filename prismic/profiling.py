@@ -0,0 +1,215 @@
+"""Named timers and counters around the slow stages.
+
+Off by default, a disabled timer costs one attribute check. Switch it on
+with environment variables (every entry point) or the matching CLI flags
+of python -m prismic:
+
+    PRISMIC_PROFILE=1                 print a summary table to stderr at exit
+    PRISMIC_PROFILE_TRACE=trace.json  also write a Chrome trace (chrome://tracing, Perfetto)
+    PRISMIC_PROFILE_STAGE=parse       run a profiler around every pass through that stage
+    PRISMIC_PROFILE_MODE=cprofile     ... cProfile (default) or tracemalloc
+
+    with profiling.timer("parse"):
+        ...
+    profiling.count("avatars.decoded", len(entries))
+"""
+import atexit
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from typing import Dict, Optional
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NULL_TIMER = _NullTimer()
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.trace_path = None
+        self.stage = None
+        self.stage_mode = 'cprofile'
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.timings = {}  # name -> [calls, total seconds, max seconds]
+        self.counters = {}
+        self.events = []
+        self.stage_profiles = []
+        self.stage_allocations = []
+        # Held while a cProfile of the stage runs, only one profiler can be active per process
+        self.stage_lock = threading.Lock()
+        self.registered = False
+
+    def configure(self, enabled: bool = True, trace_path: Optional[str] = None,
+                  stage: Optional[str] = None, stage_mode: Optional[str] = None):
+        self.enabled = enabled or bool(trace_path) or bool(stage)
+        self.trace_path = trace_path or self.trace_path
+        self.stage = stage or self.stage
+        self.stage_mode = stage_mode or self.stage_mode
+        if self.stage_mode not in ('cprofile', 'tracemalloc'):
+            raise ValueError(f"Unknown profile mode {self.stage_mode!r}, expected cprofile or tracemalloc")
+        if self.enabled and not self.registered:
+            atexit.register(self.report)
+            self.registered = True
+
+    def add(self, name: str, start: float, elapsed: float):
+        with self.lock:
+            entry = self.timings.get(name)
+            if entry is None:
+                self.timings[name] = [1, elapsed, elapsed]
+            else:
+                entry[0] += 1
+                entry[1] += elapsed
+                if elapsed > entry[2]:
+                    entry[2] = elapsed
+            if self.trace_path:
+                self.events.append({
+                    'name': name, 'ph': 'X', 'pid': os.getpid(), 'tid': threading.get_ident(),
+                    'ts': (start - self.origin) * 1e6, 'dur': elapsed * 1e6
+                })
+
+    def count(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def summary(self) -> str:
+        with self.lock:
+            timings = sorted(self.timings.items(), key=lambda item: item[1][1], reverse=True)
+            counters = sorted(self.counters.items())
+
+        width = max([len(name) for name, _ in timings + counters] + [5])
+        lines = [f"{'stage':<{width}}  {'calls':>8}  {'total ms':>10}  {'mean ms':>9}  {'max ms':>9}"]
+        for name, (calls, total, longest) in timings:
+            lines.append(f"{name:<{width}}  {calls:>8}  {total * 1000:>10.1f}  {total * 1000 / calls:>9.2f}  {longest * 1000:>9.2f}")
+        if counters:
+            lines.append('')
+            lines.append(f"{'counter':<{width}}  {'value':>8}")
+            for name, value in counters:
+                lines.append(f"{name:<{width}}  {value:>8}")
+        return '\n'.join(lines)
+
+    def write_trace(self, path: str):
+        with self.lock:
+            events = list(self.events)
+            counters = dict(self.counters)
+        now = (time.perf_counter() - self.origin) * 1e6
+        events += [{'name': name, 'ph': 'C', 'pid': os.getpid(), 'ts': now, 'args': {'value': value}}
+                   for name, value in counters.items()]
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def stage_report(self) -> str:
+        out = io.StringIO()
+        if self.stage_profiles:
+            stats = pstats.Stats(*self.stage_profiles, stream=out)
+            stats.sort_stats('cumulative').print_stats(25)
+        for elapsed_label, top in self.stage_allocations:
+            out.write(f"{elapsed_label}\n")
+            for stat in top:
+                out.write(f"  {stat}\n")
+        return out.getvalue()
+
+    def report(self):
+        if not self.enabled:
+            return
+        print(f"\nProfile summary\n{self.summary()}", file=sys.stderr)
+        if self.stage:
+            print(f"\n{self.stage_mode} of stage {self.stage!r}\n{self.stage_report()}", file=sys.stderr)
+        if self.trace_path:
+            self.write_trace(self.trace_path)
+            print(f"Wrote Chrome trace to {self.trace_path}", file=sys.stderr)
+
+profiler = Profiler()
+
+class Timer:
+    def __init__(self, name: str):
+        self.name = name
+        self.stage_profile = None
+        self.snapshot = None
+
+    def __enter__(self):
+        if profiler.stage == self.name:
+            if profiler.stage_mode == 'cprofile':
+                # Passes running in parallel to the one being profiled are only timed
+                if profiler.stage_lock.acquire(blocking=False):
+                    try:
+                        self.stage_profile = cProfile.Profile()
+                        self.stage_profile.enable()
+                    except ValueError as e:
+                        # Another profiler (a debugger, an outer cProfile run) is active
+                        print(f"Cannot profile stage {self.name!r}: {e}", file=sys.stderr)
+                        self.stage_profile = None
+                        profiler.stage_lock.release()
+            else:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start(10)
+                self.snapshot = tracemalloc.take_snapshot()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.stage_profile is not None:
+            try:
+                self.stage_profile.disable()
+                with profiler.lock:
+                    profiler.stage_profiles.append(self.stage_profile)
+            except ValueError as e:
+                print(f"Cannot profile stage {self.name!r}: {e}", file=sys.stderr)
+            finally:
+                self.stage_profile = None
+                profiler.stage_lock.release()
+        elif self.snapshot is not None:
+            top = tracemalloc.take_snapshot().compare_to(self.snapshot, 'lineno')[:10]
+            current, peak = tracemalloc.get_traced_memory()
+            with profiler.lock:
+                profiler.stage_allocations.append(
+                    (f"pass {len(profiler.stage_allocations) + 1}: {elapsed * 1000:.1f} ms, "
+                     f"traced {current / 1e6:.1f} MB, peak {peak / 1e6:.1f} MB", top)
+                )
+        profiler.add(self.name, self.start, elapsed)
+        return False
+
+def timer(name: str):
+    """Context manager timing one pass through a named stage."""
+    return Timer(name) if profiler.enabled else NULL_TIMER
+
+def timed(name: str):
+    """Decorator form of timer()."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not profiler.enabled:
+                return fn(*args, **kwargs)
+            with Timer(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def count(name: str, amount: int = 1):
+    if profiler.enabled:
+        profiler.count(name, amount)
+
+def enabled() -> bool:
+    return profiler.enabled
+
+def configure_from_env(environ: Dict[str, str] = os.environ):
+    flag = environ.get('PRISMIC_PROFILE', '').lower()
+    trace_path = environ.get('PRISMIC_PROFILE_TRACE')
+    stage = environ.get('PRISMIC_PROFILE_STAGE')
+    if flag in ('1', 'true', 'yes', 'on') or trace_path or stage:
+        profiler.configure(True, trace_path, stage, environ.get('PRISMIC_PROFILE_MODE'))
+
+configure_from_env()
@@ -0,0 +1,249 @@
+import re
+from typing import Iterator, List, Optional, Set, Tuple
+
+# Field prefixes understood in the search box, mapped to store fields
+FIELDS = {
+    'name': 'name',
+    'desc': 'description',
+    'description': 'description',
+    'author': 'author',
+    'by': 'author',
+    'platform': 'platform'
+}
+
+# Candidate sets up to this size are finished by checking each row directly
+# instead of reading the posting lists of the remaining predicates
+PROBE_LIMIT = 20000
+
+FIELD_RE = re.compile(r'(\w+):')
+WORD_RE = re.compile(r'[^\s()|"]+')
+
+class Term:
+    def __init__(self, field: str, value: str):
+        self.field = field
+        self.value = value
+
+    def __repr__(self):
+        return f"Term({self.field!r}, {self.value!r})"
+
+class Not:
+    def __init__(self, child):
+        self.child = child
+
+    def __repr__(self):
+        return f"Not({self.child!r})"
+
+class And:
+    def __init__(self, children: List):
+        self.children = children
+
+    def __repr__(self):
+        return f"And({self.children!r})"
+
+class Or:
+    def __init__(self, children: List):
+        self.children = children
+
+    def __repr__(self):
+        return f"Or({self.children!r})"
+
+def lex(text: str) -> List[Tuple[str, Optional[Term]]]:
+    tokens = []
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char.isspace():
+            i += 1
+            continue
+        if char in '()':
+            tokens.append((char, None))
+            i += 1
+            continue
+        if char == '|':
+            tokens.append(('OR', None))
+            i += 1
+            continue
+        if char == '-' and i + 1 < len(text) and not text[i + 1].isspace():
+            tokens.append(('NOT', None))
+            i += 1
+            continue
+
+        field = 'any'
+        match = FIELD_RE.match(text, i)
+        if match and match.group(1).lower() in FIELDS:
+            field = FIELDS[match.group(1).lower()]
+            i = match.end()
+            # "name: cat" means name:cat
+            while i < len(text) and text[i].isspace():
+                i += 1
+
+        if i < len(text) and text[i] == '"':
+            end = text.find('"', i + 1)
+            if end < 0:
+                end = len(text)
+            value = text[i + 1:end]
+            i = end + 1
+        else:
+            match = WORD_RE.match(text, i)
+            if not match:
+                # A field prefix followed by nothing usable
+                i += 1
+                continue
+            value = match.group(0)
+            i = match.end()
+            if field == 'any' and value in ('OR', 'AND', 'NOT'):
+                if value != 'AND':
+                    tokens.append((value, None))
+                continue
+
+        value = value.strip().lower()
+        if value and value != '-':
+            tokens.append(('TERM', Term(field, value)))
+    return tokens
+
+class Parser:
+    """Recursive descent over the lexed tokens.
+
+    OR binds loosest, terms next to each other are ANDed and NOT or a
+    leading "-" applies to the next term or group. Unbalanced parentheses
+    and dangling operators are ignored rather than reported, this parses
+    whatever was typed in a search box.
+    """
+    def __init__(self, tokens: List[Tuple[str, Optional[Term]]]):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def parse(self):
+        node = self.parse_or()
+        # Stray closing parentheses end parse_or early, keep going after them
+        while self.peek() is not None:
+            self.position += 1
+            rest = self.parse_or()
+            if rest is not None:
+                node = rest if node is None else And([node, rest])
+        return node
+
+    def parse_or(self):
+        children = []
+        node = self.parse_and()
+        if node is not None:
+            children.append(node)
+        while self.peek() == 'OR':
+            self.position += 1
+            node = self.parse_and()
+            if node is not None:
+                children.append(node)
+        if not children:
+            return None
+        return children[0] if len(children) == 1 else Or(children)
+
+    def parse_and(self):
+        children = []
+        while self.peek() not in (None, ')', 'OR'):
+            node = self.parse_unary()
+            # Flatten nested groups so the planner can order all their terms
+            if isinstance(node, And):
+                children.extend(node.children)
+            elif node is not None:
+                children.append(node)
+        if not children:
+            return None
+        return children[0] if len(children) == 1 else And(children)
+
+    def parse_unary(self):
+        kind = self.peek()
+        self.position += 1
+        if kind == 'NOT':
+            if self.peek() in (None, ')', 'OR'):
+                return None
+            child = self.parse_unary()
+            return Not(child) if child is not None else None
+        if kind == '(':
+            node = self.parse_or()
+            if self.peek() == ')':
+                self.position += 1
+            return node
+        return self.tokens[self.position - 1][1]
+
+def parse_query(text: str):
+    """Parse search box text into a Term/Not/And/Or tree, or None when empty."""
+    return Parser(lex(text)).parse()
+
+def positive_terms(node) -> Iterator[Term]:
+    """Terms a row has to match, skipping anything under a NOT."""
+    if isinstance(node, Term):
+        yield node
+    elif isinstance(node, (And, Or)):
+        for child in node.children:
+            yield from positive_terms(child)
+
+class QueryExecutor:
+    """Evaluate a parsed query against an AvatarStore.
+
+    Each AND starts from its most selective positive child, read from the
+    store index. While the candidate set is large the next children's
+    posting lists are intersected in; once it is small the rest of the
+    AND is checked row by row in a single probe query.
+    """
+    def __init__(self, store):
+        self.store = store
+        self.total = store.count()
+
+    def estimate(self, node) -> int:
+        if isinstance(node, Term):
+            return self.store.estimate_term(node.field, node.value)
+        if isinstance(node, Not):
+            return self.total
+        if isinstance(node, And):
+            positives = [self.estimate(child) for child in node.children if not isinstance(child, Not)]
+            return min(positives) if positives else self.total
+        return min(self.total, sum(self.estimate(child) for child in node.children))
+
+    def condition(self, node) -> Tuple[str, list]:
+        """Compile a subtree to a SQL expression over the avatars a / authors au join."""
+        if isinstance(node, Term):
+            return self.store.term_condition(node.field, node.value)
+        if isinstance(node, Not):
+            sql, params = self.condition(node.child)
+            return f"NOT ({sql})", params
+        joiner = " AND " if isinstance(node, And) else " OR "
+        parts = [self.condition(child) for child in node.children]
+        return joiner.join(f"({sql})" for sql, _ in parts), [param for _, params in parts for param in params]
+
+    def evaluate(self, node) -> Set[int]:
+        if isinstance(node, Term):
+            return self.store.term_rowids(node.field, node.value)
+        if isinstance(node, Not):
+            return self.store.all_rowids() - self.evaluate(node.child)
+        if isinstance(node, Or):
+            result = set()
+            for child in node.children:
+                result |= self.evaluate(child)
+            return result
+
+        positives = sorted(
+            (child for child in node.children if not isinstance(child, Not)), key=self.estimate
+        )
+        negatives = [child.child for child in node.children if isinstance(child, Not)]
+
+        if positives:
+            result = self.evaluate(positives[0])
+            remaining = positives[1:]
+        else:
+            result = self.store.all_rowids()
+            remaining = []
+        remaining += [Not(child) for child in negatives]
+
+        while remaining and result:
+            if len(result) <= PROBE_LIMIT:
+                sql, params = self.condition(And(remaining))
+                return set(self.store.probe(result, sql, params))
+            child = remaining.pop(0)
+            if isinstance(child, Not):
+                result -= self.evaluate(child.child)
+            else:
+                result &= self.evaluate(child)
+        return result
@@ -0,0 +1,262 @@
+import heapq
+import re
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Tuple
+
+from prismic import profiling
+from prismic.query import And, Or, QueryExecutor, Term, parse_query, positive_terms
+from prismic.store import AvatarStore
+from prismic.fuzzy import deletes, edit_distance, max_distance, tokenize
+
+# Points for where a query hits, the best hit per field counts
+NAME_SCORES = {'exact': 1000, 'prefix': 500, 'word': 250, 'substring': 100}
+AUTHOR_SCORES = {'exact': 300, 'prefix': 150, 'word': 75, 'substring': 30}
+DESCRIPTION_SCORES = {'exact': 60, 'prefix': 40, 'word': 20, 'substring': 10}
+
+# Points per query token in fuzzy mode, by edit distance of the best name token
+FUZZY_SCORES = {0: 100, 1: 40, 2: 15}
+
+# Rankings are computed at least this deep so the first few pages of a
+# search come from the cache
+RANKING_DEPTH = 1000
+
+class TextMatcher:
+    """Classify how a lowercase query hits a piece of text."""
+    def __init__(self, query: str):
+        self.query = query.lower()
+        self.word_re = re.compile(r'(?<!\w)' + re.escape(self.query))
+
+    def score(self, text: str, scores: Dict[str, int]) -> int:
+        text = text.lower()
+        position = text.find(self.query)
+        if position < 0:
+            return 0
+        if position == 0:
+            return scores['exact'] if len(text) == len(self.query) else scores['prefix']
+        if self.word_re.search(text, position - 1):
+            return scores['word']
+        return scores['substring']
+
+def fuzzy_split(node) -> Tuple[List[str], List]:
+    """Split a parsed query into the bare words fuzzy mode matches loosely and the nodes it matches exactly.
+
+    Only words ANDed at the top level are loose; a query that is an OR
+    has none, and is then run as typed.
+    """
+    if node is None:
+        return [], []
+    children = node.children if isinstance(node, And) else [node]
+    words = [child.value for child in children if isinstance(child, Term) and child.field == 'any']
+    rest = [child for child in children if not (isinstance(child, Term) and child.field == 'any')]
+    return words, rest
+
+class SearchEngine:
+    """Relevance ranked search over an AvatarStore.
+
+    Matches are streamed from the store and scored one by one while a heap
+    keeps only the best offset + limit of them, so a page never sorts the
+    whole result set.
+
+    Ranked row ids are kept in an LRU cache keyed by the parsed query.
+    Paging, toggling a filter back or repeating a search is then a slice
+    plus one row fetch. The cache is dropped when the store generation
+    changes, which happens whenever the downloader writes to it.
+    """
+    def __init__(self, store: AvatarStore, cache_size: int = 64, metrics=None):
+        self.store = store
+        self.cache_size = cache_size
+        self.metrics = metrics
+        self.cache = OrderedDict()
+        self.cache_generation = None
+        self.cache_lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @profiling.timed('search')
+    def search(self, name_desc: str = '', author: str = '', platforms: Iterable[str] = (),
+               offset: int = 0, limit: int = 100, fuzzy: bool = False) -> Tuple[List[Dict], int]:
+        # The raw text keeps its case, OR/AND/NOT are operators in capitals only
+        author = author.lower().strip()
+        platforms = tuple(sorted(platforms))
+        fuzzy = fuzzy and bool(tokenize(name_desc))
+        # Keyed by the parsed query, so case, spacing and quoting that parse the same share an entry
+        key = ('search', repr(parse_query(name_desc)), author, platforms, fuzzy)
+        return self.cached_page(key, offset, limit, lambda k: self.search_ids(name_desc, author, platforms, k, fuzzy))
+
+    @profiling.timed('search.author')
+    def author_avatars(self, author: str, offset: int = 0, limit: int = 100) -> Tuple[List[Dict], int]:
+        """All avatars of one author in file order, no ranking or scan needed."""
+        key = ('author', author)
+        return self.cached_page(key, offset, limit, lambda k: self.store.by_author_ids(author, 0, k))
+
+    def cached_page(self, key, offset: int, limit: int, compute) -> Tuple[List[Dict], int]:
+        """Serve a page from the cached ranking for key, computing more of it if needed.
+
+        compute(k) returns the first k ranked row ids and the total match
+        count. Rankings are cached as far as they were computed; a page past
+        that end recomputes with twice the depth.
+        """
+        needed = offset + limit
+        generation = self.store.generation
+        with self.cache_lock:
+            if generation != self.cache_generation:
+                self.cache.clear()
+                self.cache_generation = generation
+            entry = self.cache.get(key)
+            if entry is not None and (len(entry[0]) >= needed or len(entry[0]) == entry[1]):
+                self.cache.move_to_end(key)
+                self.cache_hits += 1
+                profiling.count('search.cache_hit')
+                hit = True
+            else:
+                self.cache_misses += 1
+                profiling.count('search.cache_miss')
+                hit = False
+        if self.metrics is not None:
+            self.metrics.cache_lookup('queries', hit)
+
+        if not hit:
+            depth = max(needed, RANKING_DEPTH)
+            if entry is not None:
+                depth = max(depth, len(entry[0]) * 2)
+            with profiling.timer('search.rank'):
+                ids, total = compute(depth)
+            entry = (array('q', ids), total)
+            with self.cache_lock:
+                self.cache[key] = entry
+                self.cache.move_to_end(key)
+                while len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+
+        ids, total = entry
+        with profiling.timer('search.rows'):
+            return self.store.get_rows(list(ids[offset:needed])), total
+
+    def search_ids(self, name_desc: str, author: str, platforms: Iterable[str], k: int,
+                   fuzzy: bool = False) -> Tuple[List[int], int]:
+        """Best k row ids for a search and the total number of matches."""
+        node = parse_query(name_desc)
+        if fuzzy:
+            words, rest = fuzzy_split(node)
+            if words:
+                return self.fuzzy_ids(' '.join(words), author, platforms, k, rest)
+            # Nothing to match loosely (only ORs, fields or negations), run the query as typed
+
+        if node is None or (isinstance(node, Term) and node.field == 'any'):
+            return self.simple_ids(node.value if node else '', author, platforms, k)
+
+        filters = [node]
+        if author:
+            filters.append(Term('author', author))
+        if platforms:
+            filters.append(Or([Term('platform', platform) for platform in platforms]))
+        return self.query_ids(And(filters) if len(filters) > 1 else node, k)
+
+    def simple_ids(self, name_desc: str, author: str, platforms: Iterable[str], k: int) -> Tuple[List[int], int]:
+        """One substring over name/description plus the author box, no query syntax."""
+        if not name_desc and not author:
+            # Nothing to rank by, keep file order and let SQLite page it
+            return self.store.search_ids(name_desc, author, platforms, 0, k)
+
+        name_desc_matcher = TextMatcher(name_desc)
+        author_matcher = TextMatcher(author)
+        name_score = name_desc_matcher.score
+        author_score = author_matcher.score
+        total = 0
+
+        def scored():
+            nonlocal total
+            for row_id, name, description, author_name in self.store.iter_matches(name_desc, author, platforms):
+                total += 1
+                score = 0
+                if name_desc:
+                    score = name_score(name, NAME_SCORES) + name_score(description, DESCRIPTION_SCORES)
+                if author:
+                    score += author_score(author_name, AUTHOR_SCORES)
+                # Ties go to the shorter name, then to file order
+                yield score, -len(name), -row_id
+
+        top = heapq.nlargest(k, scored())
+        return [-row_id for _, _, row_id in top], total
+
+    def query_ids(self, node, k: int) -> Tuple[List[int], int]:
+        """Run a parsed query, then rank the matches by their positive text terms."""
+        ids = QueryExecutor(self.store).evaluate(node)
+        total = len(ids)
+
+        matchers = [(term.field, TextMatcher(term.value)) for term in positive_terms(node) if term.field != 'platform']
+        if not matchers:
+            return heapq.nsmallest(k, ids), total
+
+        def scored():
+            for row_id, name, description, author_name in self.store.iter_rows(ids):
+                score = 0
+                for field, matcher in matchers:
+                    if field in ('any', 'name'):
+                        score += matcher.score(name, NAME_SCORES)
+                    if field in ('any', 'description'):
+                        score += matcher.score(description, DESCRIPTION_SCORES)
+                    if field == 'author':
+                        score += matcher.score(author_name, AUTHOR_SCORES)
+                yield score, -len(name), -row_id
+
+        top = heapq.nlargest(k, scored())
+        return [-row_id for _, _, row_id in top], total
+
+    def fuzzy_tokens(self, query_token: str) -> Dict[int, int]:
+        """Map indexed token ids to their edit distance from query_token."""
+        limit = max_distance(query_token)
+        matches = {}
+        for token_id, token in self.store.tokens_for_variants(deletes(query_token, limit)):
+            distance = edit_distance(query_token, token, limit)
+            if distance <= limit:
+                matches[token_id] = distance
+        return matches
+
+    def fuzzy_ids(self, name_desc: str, author: str, platforms: Iterable[str], k: int,
+                  rest: List = ()) -> Tuple[List[int], int]:
+        """Match every query token against avatar names allowing a few typos.
+
+        Candidate tokens come from the symmetric delete index, so the edit
+        distance is only computed for the handful of tokens that share a
+        delete variant with the query, never for every row. rest are the
+        parsed query nodes that are not loose words, matched exactly.
+        """
+        token_matches = [self.fuzzy_tokens(query_token) for query_token in tokenize(name_desc)]
+        if not all(token_matches):
+            return [], 0
+
+        # Rarest token first, later tokens only probe the rows still in play
+        # when that is fewer lookups than reading their whole posting list
+        sized = sorted((self.store.posting_size(list(matches)), i, matches) for i, matches in enumerate(token_matches))
+
+        row_scores = None
+        for posting_size, _, matches in sized:
+            token_scores = {}
+            probe = row_scores if row_scores is not None and len(row_scores) < posting_size else None
+            for token_id, row_id in self.store.token_postings(list(matches), probe):
+                score = FUZZY_SCORES[matches[token_id]]
+                if score > token_scores.get(row_id, 0):
+                    token_scores[row_id] = score
+
+            # Every query token has to match somewhere in the name
+            if row_scores is None:
+                row_scores = token_scores
+            else:
+                row_scores = {row_id: score + token_scores[row_id]
+                              for row_id, score in row_scores.items() if row_id in token_scores}
+            if not row_scores:
+                return [], 0
+
+        if author or platforms:
+            allowed = self.store.filter_ids(row_scores, author=author, platforms=platforms)
+            row_scores = {row_id: row_scores[row_id] for row_id in allowed}
+        if rest and row_scores:
+            sql, params = QueryExecutor(self.store).condition(And(list(rest)))
+            allowed = self.store.probe(row_scores, sql, params)
+            row_scores = {row_id: row_scores[row_id] for row_id in allowed}
+
+        top = heapq.nlargest(k, row_scores.items(), key=lambda item: (item[1], -item[0]))
+        return [row_id for row_id, _ in top], len(row_scores)
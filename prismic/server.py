@@ -0,0 +1,227 @@
+"""Read only HTTP API over the avatar store for other machines on the LAN.
+
+    GET /search?q=cat&author=&platform=quest&fuzzy=1&offset=0&limit=50
+    GET /search?by_author=SomeAuthor
+    GET /avatar/avtr_...
+    GET /authors?q=some&offset=0&limit=50
+
+Responses are JSON, gzip encoded when the client accepts it. Connections
+are handled on one asyncio loop while queries run on a thread pool, each
+worker thread with its own SQLite connection so readers never wait on
+each other (the store is in WAL mode, a running `prismic update` does not
+block them either).
+"""
+import asyncio
+import gzip
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from prismic import profiling
+from prismic.search import SearchEngine
+from prismic.store import PLATFORM_BITS, AvatarStore
+
+MAX_LIMIT = 500
+DEFAULT_LIMIT = 50
+
+# Bodies smaller than this are sent as is, gzip would barely shrink them
+GZIP_MIN_SIZE = 1024
+
+MAX_HEADER_BYTES = 16 * 1024
+KEEP_ALIVE_TIMEOUT = 30
+
+class HTTPError(Exception):
+    def __init__(self, status: HTTPStatus, message: str = ''):
+        super().__init__(message or status.phrase)
+        self.status = status
+
+def int_param(params: Dict[str, List[str]], name: str, default: int, maximum: Optional[int] = None) -> int:
+    try:
+        value = int(params.get(name, [default])[0])
+    except ValueError:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must be an integer")
+    if value < 0:
+        raise HTTPError(HTTPStatus.BAD_REQUEST, f"{name} must not be negative")
+    return min(value, maximum) if maximum is not None else value
+
+def platform_params(params: Dict[str, List[str]]) -> List[str]:
+    """Platforms from repeated or comma separated platform=, case insensitive."""
+    names = {platform.lower(): platform for platform in PLATFORM_BITS}
+    platforms = []
+    for value in params.get('platform', []):
+        for name in value.split(','):
+            if not name:
+                continue
+            if name.lower() not in names:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"unknown platform {name!r}")
+            platforms.append(names[name.lower()])
+    return platforms
+
+def page(items: List[Dict], total: int, offset: int, limit: int, key: str) -> Dict:
+    next_offset = offset + limit if offset + limit < total else None
+    return {'total': total, 'offset': offset, 'limit': limit, 'next_offset': next_offset, key: items}
+
+class AvatarServer:
+    def __init__(self, db_path: Union[str, Path], workers: int = 8):
+        self.db_path = Path(db_path)
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prismic-query")
+        self.local = threading.local()
+        self.stores = []
+        self.stores_lock = threading.Lock()
+        # Set once serve() listens, address holds the bound (host, port) for port 0
+        self.listening = threading.Event()
+        self.address = None
+        self.loop = None
+        self.listener = None
+
+    def engine(self) -> SearchEngine:
+        """The calling worker thread's own store connection and search engine."""
+        engine = getattr(self.local, 'engine', None)
+        if engine is None:
+            store = AvatarStore(self.db_path)
+            with self.stores_lock:
+                self.stores.append(store)
+            engine = self.local.engine = SearchEngine(store)
+        return engine
+
+    @profiling.timed('server.request')
+    def route(self, path: str, params: Dict[str, List[str]]) -> Dict:
+        """Answer one request, runs on a worker thread."""
+        engine = self.engine()
+        offset = int_param(params, 'offset', 0)
+        limit = int_param(params, 'limit', DEFAULT_LIMIT, MAX_LIMIT)
+
+        if path == '/search':
+            by_author = params.get('by_author', [''])[0]
+            if by_author:
+                avatars, total = engine.author_avatars(by_author, offset=offset, limit=limit)
+            else:
+                avatars, total = engine.search(
+                    params.get('q', [''])[0], params.get('author', [''])[0], platform_params(params),
+                    offset=offset, limit=limit, fuzzy=params.get('fuzzy', ['0'])[0] in ('1', 'true', 'yes')
+                )
+            return page(avatars, total, offset, limit, 'avatars')
+
+        if path == '/authors':
+            authors, total = engine.store.search_authors(params.get('q', [''])[0], offset=offset, limit=limit)
+            return page(authors, total, offset, limit, 'authors')
+
+        if path.startswith('/avatar/'):
+            avatar = engine.store.get_avatar(unquote(path[len('/avatar/'):]))
+            if avatar is None:
+                raise HTTPError(HTTPStatus.NOT_FOUND, "avatar not found")
+            return avatar
+
+        raise HTTPError(HTTPStatus.NOT_FOUND)
+
+    def respond(self, target: str, accepts_gzip: bool) -> Tuple[HTTPStatus, bytes, bool]:
+        """Route and encode a request target, returns (status, body, gzipped)."""
+        url = urlsplit(target)
+        try:
+            status, result = HTTPStatus.OK, self.route(url.path.rstrip('/') or '/', parse_qs(url.query))
+        except HTTPError as e:
+            status, result = e.status, {'error': str(e)}
+        except Exception as e:
+            logging.exception(f"Error answering {target}")
+            status, result = HTTPStatus.INTERNAL_SERVER_ERROR, {'error': str(e)}
+
+        body = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        if accepts_gzip and len(body) >= GZIP_MIN_SIZE:
+            return status, gzip.compress(body, compresslevel=5), True
+        return status, body, False
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return
+                except asyncio.LimitOverrunError:
+                    await self.send(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, b'', False, False)
+                    return
+
+                lines = head.decode('latin-1').split('\r\n')
+                parts = lines[0].split()
+                if len(parts) != 3:
+                    await self.send(writer, HTTPStatus.BAD_REQUEST, b'', False, False)
+                    return
+                method, target, version = parts
+                headers = {}
+                for line in lines[1:]:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                connection = headers.get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+
+                if method not in ('GET', 'HEAD'):
+                    await self.send(writer, HTTPStatus.METHOD_NOT_ALLOWED, b'', False, False)
+                    return
+
+                accepts_gzip = 'gzip' in headers.get('accept-encoding', '')
+                status, body, gzipped = await loop.run_in_executor(self.executor, self.respond, target, accepts_gzip)
+                await self.send(writer, status, body if method == 'GET' else b'', gzipped, keep_alive, len(body))
+                if not keep_alive:
+                    return
+        finally:
+            writer.close()
+
+    async def send(self, writer: asyncio.StreamWriter, status: HTTPStatus, body: bytes, gzipped: bool,
+                   keep_alive: bool, length: Optional[int] = None):
+        headers = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            "Content-Type: application/json; charset=utf-8",
+            f"Content-Length: {len(body) if length is None else length}",
+            "Vary: Accept-Encoding",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}"
+        ]
+        if gzipped:
+            headers.append("Content-Encoding: gzip")
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode('latin-1') + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8080):
+        server = await asyncio.start_server(self.handle, host, port, limit=MAX_HEADER_BYTES)
+        addresses = ', '.join(str(sock.getsockname()) for sock in server.sockets)
+        print(f"Serving the avatar store on {addresses}")
+        self.address = server.sockets[0].getsockname()[:2]
+        self.loop = asyncio.get_running_loop()
+        self.listener = server
+        self.listening.set()
+        async with server:
+            try:
+                await server.serve_forever()
+            except asyncio.CancelledError:
+                # stop() closed the listener
+                pass
+
+    def stop(self):
+        """Make serve() return, callable from any thread."""
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self.listener.close)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        with self.stores_lock:
+            for store in self.stores:
+                store.close()
+            self.stores = []
+
+def run(db_path: Union[str, Path], host: str = '127.0.0.1', port: int = 8080, workers: int = 8):
+    server = AvatarServer(db_path, workers)
+    try:
+        asyncio.run(server.serve(host, port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
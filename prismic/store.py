@@ -0,0 +1,624 @@
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from prismic import profiling
+from prismic.fuzzy import index_deletes, tokenize
+
+# Platform bitmask stored in avatars.platforms
+PLATFORM_BITS = {'PC': 1, 'Quest': 2, 'iOS': 4}
+
+# Trigram FTS needs at least this many characters to match anything
+FTS_MIN_QUERY = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS authors (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS avatars (
+    id INTEGER PRIMARY KEY,
+    avatar_id TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    description TEXT NOT NULL,
+    author_id INTEGER NOT NULL REFERENCES authors(id),
+    platforms INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS avatars_author ON avatars(author_id);
+
+-- Symmetric delete index over name tokens for typo tolerant search
+CREATE TABLE IF NOT EXISTS name_tokens (
+    id INTEGER PRIMARY KEY,
+    token TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS token_deletes (
+    variant TEXT NOT NULL,
+    token_id INTEGER NOT NULL,
+    PRIMARY KEY (variant, token_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS token_avatars (
+    token_id INTEGER NOT NULL,
+    avatar_rowid INTEGER NOT NULL,
+    PRIMARY KEY (token_id, avatar_rowid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS token_avatars_avatar ON token_avatars(avatar_rowid);
+
+-- Image URLs from the API, keyed by avatar id so rebuilds keep them
+CREATE TABLE IF NOT EXISTS avatar_images (
+    avatar_id TEXT PRIMARY KEY,
+    image_url TEXT,
+    thumbnail_url TEXT,
+    fetched_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+# Contentless so the text is not stored twice, the avatars table holds it
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS avatars_fts USING fts5(
+    name, description, author, content='', tokenize='trigram'
+);
+"""
+
+# Author names are searched on their own first, the avatars_author index
+# then acts as the author -> avatar rows posting list
+AUTHOR_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS authors_fts USING fts5(
+    name, content='authors', content_rowid='id', tokenize='trigram'
+);
+CREATE TRIGGER IF NOT EXISTS authors_fts_insert AFTER INSERT ON authors BEGIN
+    INSERT INTO authors_fts (rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS authors_fts_delete AFTER DELETE ON authors BEGIN
+    INSERT INTO authors_fts (authors_fts, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+"""
+
+AVATAR_COLUMNS = """
+    a.id, a.avatar_id, a.name, a.description, au.name AS author, a.platforms
+    FROM avatars a JOIN authors au ON au.id = a.author_id
+"""
+
+def platforms_to_mask(platforms: Iterable[str]) -> int:
+    mask = 0
+    for platform in platforms:
+        mask |= PLATFORM_BITS.get(platform, 0)
+    return mask
+
+def mask_to_platforms(mask: int) -> List[str]:
+    return [platform for platform, bit in PLATFORM_BITS.items() if mask & bit]
+
+def platform_mask(name: str) -> int:
+    """Bit for a platform name typed in a query, matched case insensitively."""
+    for platform, bit in PLATFORM_BITS.items():
+        if platform.lower() == name.lower():
+            return bit
+    return 0
+
+def fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+def like_pattern(text: str) -> str:
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+def fold(text: Optional[str]) -> Optional[str]:
+    return text.lower() if text is not None else None
+
+def contains(column: str, text: str) -> Tuple[str, list]:
+    """Case insensitive substring test on a column, for every script like the FTS index.
+
+    SQLite's LIKE only folds ASCII letters, so anything else goes through
+    the fold() function registered on the connection, which costs a Python
+    call per row.
+    """
+    if text.isascii():
+        return f"{column} LIKE ? ESCAPE '\\'", [like_pattern(text)]
+    return f"instr(fold({column}), ?) > 0", [text.lower()]
+
+class AvatarStore:
+    """SQLite copy of the avatar cache with a trigram full text index.
+
+    Rows come back as the same dicts the JSON cache uses, so callers can
+    switch between the two without caring where the data lives.
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.create_function('fold', 1, fold, deterministic=True)
+        self.lock = threading.Lock()
+
+        with self.conn:
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.executescript(SCHEMA)
+            try:
+                self.conn.executescript(FTS_SCHEMA)
+                new_author_index = self.conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name = 'authors_fts'"
+                ).fetchone() is None
+                self.conn.executescript(AUTHOR_FTS_SCHEMA)
+                if new_author_index:
+                    # Stores built before the author index existed
+                    self.conn.execute("INSERT INTO authors_fts (authors_fts) VALUES ('rebuild')")
+                # Per trigram document counts, used to estimate how selective a term is
+                self.conn.execute(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS temp.avatars_fts_vocab USING fts5vocab(main, avatars_fts, 'row')"
+                )
+                self.has_fts = True
+            except sqlite3.OperationalError as e:
+                # SQLite built without FTS5 or older than 3.34 (no trigram tokenizer)
+                print(f"Full text search unavailable, falling back to LIKE: {e}")
+                self.has_fts = False
+
+    def close(self):
+        self.conn.close()
+
+    @property
+    def generation(self) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def count(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM avatars").fetchone()[0]
+
+    def row_to_avatar(self, row: sqlite3.Row) -> Dict:
+        return {
+            'avatar_id': row['avatar_id'],
+            'name': row['name'],
+            'author': row['author'],
+            'description': row['description'],
+            'platforms': mask_to_platforms(row['platforms'])
+        }
+
+    def get_avatar(self, avatar_id: str) -> Optional[Dict]:
+        with self.lock:
+            row = self.conn.execute(f"SELECT {AVATAR_COLUMNS} WHERE a.avatar_id = ?", (avatar_id,)).fetchone()
+        return self.row_to_avatar(row) if row else None
+
+    def image_urls(self, avatar_ids: List[str]) -> Dict[str, Dict]:
+        """Stored image URLs by avatar id, for the ids that have any."""
+        if not avatar_ids:
+            return {}
+        placeholders = ",".join("?" * len(avatar_ids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT avatar_id, image_url, thumbnail_url, fetched_at FROM avatar_images "
+                f"WHERE avatar_id IN ({placeholders})", avatar_ids
+            ).fetchall()
+        return {row['avatar_id']: {'imageUrl': row['image_url'], 'thumbnailImageUrl': row['thumbnail_url'],
+                                   'fetched_at': row['fetched_at']} for row in rows}
+
+    def save_image_urls(self, rows: Iterable[Tuple[str, Optional[str], Optional[str], float]]):
+        """Store (avatar_id, image_url, thumbnail_url, fetched_at) rows."""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO avatar_images (avatar_id, image_url, thumbnail_url, fetched_at) "
+                "VALUES (?, ?, ?, ?)", rows
+            )
+
+    def forget_image_urls(self, avatar_ids: Iterable[str]):
+        with self.lock, self.conn:
+            self.conn.executemany("DELETE FROM avatar_images WHERE avatar_id = ?",
+                                  ((avatar_id,) for avatar_id in avatar_ids))
+
+    def _bump_generation(self):
+        self.conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('generation', 1) "
+            "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+        )
+
+    def _author_id(self, name: str, author_ids: Dict[str, int]) -> int:
+        author_id = author_ids.get(name)
+        if author_id is None:
+            self.conn.execute("INSERT OR IGNORE INTO authors (name) VALUES (?)", (name,))
+            author_id = self.conn.execute("SELECT id FROM authors WHERE name = ?", (name,)).fetchone()[0]
+            author_ids[name] = author_id
+        return author_id
+
+    def _fts_insert(self, rowid: int, avatar: Dict):
+        if self.has_fts:
+            self.conn.execute(
+                "INSERT INTO avatars_fts (rowid, name, description, author) VALUES (?, ?, ?, ?)",
+                (rowid, avatar['name'], avatar['description'], avatar['author'])
+            )
+
+    def _fts_delete(self, row: sqlite3.Row):
+        # Contentless tables need the original values to remove a row
+        if self.has_fts:
+            self.conn.execute(
+                "INSERT INTO avatars_fts (avatars_fts, rowid, name, description, author) "
+                "VALUES ('delete', ?, ?, ?, ?)",
+                (row['id'], row['name'], row['description'], row['author'])
+            )
+
+    def _token_id(self, token: str, token_ids: Dict[str, int]) -> int:
+        token_id = token_ids.get(token)
+        if token_id is None:
+            row = self.conn.execute("SELECT id FROM name_tokens WHERE token = ?", (token,)).fetchone()
+            if row:
+                token_id = row[0]
+            else:
+                token_id = self.conn.execute("INSERT INTO name_tokens (token) VALUES (?)", (token,)).lastrowid
+                self.conn.executemany(
+                    "INSERT OR IGNORE INTO token_deletes (variant, token_id) VALUES (?, ?)",
+                    ((variant, token_id) for variant in index_deletes(token))
+                )
+            token_ids[token] = token_id
+        return token_id
+
+    def _index_name(self, rowid: int, name: str, token_ids: Dict[str, int]):
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO token_avatars (token_id, avatar_rowid) VALUES (?, ?)",
+            ((self._token_id(token, token_ids), rowid) for token in tokenize(name))
+        )
+
+    def _delete_row(self, row: sqlite3.Row):
+        self._fts_delete(row)
+        self.conn.execute("DELETE FROM token_avatars WHERE avatar_rowid = ?", (row['id'],))
+        self.conn.execute("DELETE FROM avatars WHERE id = ?", (row['id'],))
+
+    @profiling.timed('store.fuzzy_index')
+    def build_fuzzy_index(self):
+        """Rebuild the name token index from the avatars table in one pass."""
+        with self.lock, self.conn:
+            self._build_fuzzy_index()
+
+    def _build_fuzzy_index(self):
+        self.conn.execute("DELETE FROM token_avatars")
+        self.conn.execute("DELETE FROM token_deletes")
+        self.conn.execute("DELETE FROM name_tokens")
+
+        token_ids = {}
+        postings = []
+        for rowid, name in self.conn.execute("SELECT id, name FROM avatars").fetchall():
+            for token in tokenize(name):
+                token_id = token_ids.get(token)
+                if token_id is None:
+                    token_id = token_ids[token] = len(token_ids) + 1
+                postings.append((token_id, rowid))
+
+        self.conn.executemany(
+            "INSERT INTO name_tokens (id, token) VALUES (?, ?)",
+            ((token_id, token) for token, token_id in token_ids.items())
+        )
+        self.conn.executemany("INSERT INTO token_avatars (token_id, avatar_rowid) VALUES (?, ?)", postings)
+        del postings
+        self.conn.executemany(
+            "INSERT INTO token_deletes (variant, token_id) VALUES (?, ?)",
+            ((variant, token_id) for token, token_id in token_ids.items() for variant in index_deletes(token))
+        )
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('fuzzy_index', 1)")
+
+    @property
+    def has_fuzzy_index(self) -> bool:
+        return self.conn.execute("SELECT 1 FROM meta WHERE key = 'fuzzy_index'").fetchone() is not None
+
+    @profiling.timed('store.rebuild')
+    def rebuild(self, avatars: List[Dict]):
+        """Replace the whole store with avatars, keeping their order."""
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM avatars")
+            self.conn.execute("DELETE FROM authors")
+            if self.has_fts:
+                self.conn.execute("INSERT INTO avatars_fts (avatars_fts) VALUES ('delete-all')")
+
+            author_ids = {}
+            for avatar in avatars:
+                if avatar['author'] not in author_ids:
+                    author_ids[avatar['author']] = len(author_ids) + 1
+            self.conn.executemany(
+                "INSERT INTO authors (id, name) VALUES (?, ?)",
+                ((author_id, name) for name, author_id in author_ids.items())
+            )
+            self.conn.executemany(
+                "INSERT INTO avatars (avatar_id, name, description, author_id, platforms) VALUES (?, ?, ?, ?, ?)",
+                ((avatar['avatar_id'], avatar['name'], avatar['description'],
+                  author_ids[avatar['author']], platforms_to_mask(avatar['platforms'])) for avatar in avatars)
+            )
+            if self.has_fts:
+                self.conn.execute(
+                    "INSERT INTO avatars_fts (rowid, name, description, author) "
+                    "SELECT a.id, a.name, a.description, au.name FROM avatars a JOIN authors au ON au.id = a.author_id"
+                )
+            self._build_fuzzy_index()
+            self._bump_generation()
+
+    @profiling.timed('store.apply_delta')
+    def apply_delta(self, delta: Dict):
+        """Apply the added/removed/updated lists from AvatarDatabase.compute_delta."""
+        with self.lock, self.conn:
+            author_ids = {}
+            token_ids = {}
+
+            for avatar_id in delta['removed']:
+                row = self.conn.execute(f"SELECT {AVATAR_COLUMNS} WHERE a.avatar_id = ?", (avatar_id,)).fetchone()
+                if row:
+                    self._delete_row(row)
+
+            for change in delta['updated']:
+                row = self.conn.execute(f"SELECT {AVATAR_COLUMNS} WHERE a.avatar_id = ?", (change['avatar_id'],)).fetchone()
+                if not row:
+                    continue
+                avatar = dict(self.row_to_avatar(row), **change['fields'])
+                self.conn.execute(
+                    "UPDATE avatars SET name = ?, description = ?, author_id = ?, platforms = ? WHERE id = ?",
+                    (avatar['name'], avatar['description'], self._author_id(avatar['author'], author_ids),
+                     platforms_to_mask(avatar['platforms']), row['id'])
+                )
+                if {'name', 'description', 'author'} & change['fields'].keys():
+                    self._fts_delete(row)
+                    self._fts_insert(row['id'], avatar)
+                if 'name' in change['fields']:
+                    self.conn.execute("DELETE FROM token_avatars WHERE avatar_rowid = ?", (row['id'],))
+                    self._index_name(row['id'], avatar['name'], token_ids)
+
+            for avatar in delta['added']:
+                row = self.conn.execute(f"SELECT {AVATAR_COLUMNS} WHERE a.avatar_id = ?", (avatar['avatar_id'],)).fetchone()
+                if row:
+                    self._delete_row(row)
+                cursor = self.conn.execute(
+                    "INSERT INTO avatars (avatar_id, name, description, author_id, platforms) VALUES (?, ?, ?, ?, ?)",
+                    (avatar['avatar_id'], avatar['name'], avatar['description'],
+                     self._author_id(avatar['author'], author_ids), platforms_to_mask(avatar['platforms']))
+                )
+                self._fts_insert(cursor.lastrowid, avatar)
+                self._index_name(cursor.lastrowid, avatar['name'], token_ids)
+
+            if delta['removed']:
+                self.conn.executemany("DELETE FROM avatar_images WHERE avatar_id = ?",
+                                      ((avatar_id,) for avatar_id in delta['removed']))
+            if delta['removed'] or delta['updated']:
+                self.conn.execute("DELETE FROM authors WHERE id NOT IN (SELECT author_id FROM avatars)")
+            self._bump_generation()
+
+    def _build_filter(self, name_desc: str, author: str, platforms: Iterable[str],
+                      use_fts: bool = True) -> Tuple[str, list]:
+        clauses = []
+        params = []
+        use_fts = use_fts and self.has_fts
+
+        if name_desc:
+            if use_fts and len(name_desc) >= FTS_MIN_QUERY:
+                clauses.append("a.id IN (SELECT rowid FROM avatars_fts WHERE avatars_fts MATCH ?)")
+                params.append(f"{{name description}} : {fts_phrase(name_desc)}")
+            else:
+                name_sql, name_params = contains('a.name', name_desc)
+                description_sql, description_params = contains('a.description', name_desc)
+                clauses.append(f"({name_sql} OR {description_sql})")
+                params += name_params + description_params
+
+        if author:
+            if not use_fts:
+                sql, author_params = contains('au.name', author)
+                clauses.append(sql)
+                params += author_params
+            elif len(author) >= FTS_MIN_QUERY:
+                clauses.append("a.author_id IN (SELECT rowid FROM authors_fts WHERE authors_fts MATCH ?)")
+                params.append(fts_phrase(author))
+            else:
+                sql, author_params = contains('name', author)
+                clauses.append(f"a.author_id IN (SELECT id FROM authors WHERE {sql})")
+                params += author_params
+
+        mask = platforms_to_mask(platforms)
+        if mask:
+            clauses.append("a.platforms & ? != 0")
+            params.append(mask)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def search(self, name_desc: str = '', author: str = '', platforms: Iterable[str] = (),
+               offset: int = 0, limit: int = 100) -> Tuple[List[Dict], int]:
+        """Return one page of matching avatars in file order and the total match count."""
+        ids, total = self.search_ids(name_desc, author, platforms, offset, limit)
+        return self.get_rows(ids), total
+
+    def search_ids(self, name_desc: str = '', author: str = '', platforms: Iterable[str] = (),
+                   offset: int = 0, limit: int = 100) -> Tuple[List[int], int]:
+        where, params = self._build_filter(name_desc, author, platforms)
+        with self.lock:
+            total = self.conn.execute(
+                f"SELECT COUNT(*) FROM avatars a JOIN authors au ON au.id = a.author_id {where}", params
+            ).fetchone()[0]
+            ids = [row[0] for row in self.conn.execute(
+                f"SELECT a.id FROM avatars a JOIN authors au ON au.id = a.author_id {where} "
+                f"ORDER BY a.id LIMIT ? OFFSET ?", params + [limit, offset]
+            )]
+        return ids, total
+
+    def search_authors(self, query: str = '', offset: int = 0, limit: int = 100) -> Tuple[List[Dict], int]:
+        """Search the author table alone and return authors with their avatar counts."""
+        if not query:
+            where, params = "", []
+        elif self.has_fts and len(query) >= FTS_MIN_QUERY:
+            where, params = "WHERE au.id IN (SELECT rowid FROM authors_fts WHERE authors_fts MATCH ?)", [fts_phrase(query)]
+        else:
+            sql, params = contains('au.name', query)
+            where = f"WHERE {sql}"
+        with self.lock:
+            total = self.conn.execute(f"SELECT COUNT(*) FROM authors au {where}", params).fetchone()[0]
+            rows = self.conn.execute(
+                f"SELECT au.id, au.name, (SELECT COUNT(*) FROM avatars a WHERE a.author_id = au.id) AS avatars "
+                f"FROM authors au {where} ORDER BY au.name LIMIT ? OFFSET ?", params + [limit, offset]
+            ).fetchall()
+        return [{'author_id': row['id'], 'name': row['name'], 'avatars': row['avatars']} for row in rows], total
+
+    def top_authors(self, limit: int = 100) -> List[Dict]:
+        """Authors with the most avatars first."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT au.id, au.name, COUNT(*) AS avatars FROM avatars a JOIN authors au ON au.id = a.author_id "
+                "GROUP BY a.author_id ORDER BY avatars DESC, au.name LIMIT ?", (limit,)
+            ).fetchall()
+        return [{'author_id': row['id'], 'name': row['name'], 'avatars': row['avatars']} for row in rows]
+
+    def by_author(self, author: str, offset: int = 0, limit: int = 100) -> Tuple[List[Dict], int]:
+        """Every avatar of one author, read straight off the author index."""
+        ids, total = self.by_author_ids(author, offset, limit)
+        return self.get_rows(ids), total
+
+    def by_author_ids(self, author: str, offset: int = 0, limit: int = 100) -> Tuple[List[int], int]:
+        with self.lock:
+            row = self.conn.execute("SELECT id FROM authors WHERE name = ?", (author,)).fetchone()
+            if not row:
+                return [], 0
+            total = self.conn.execute("SELECT COUNT(*) FROM avatars WHERE author_id = ?", (row[0],)).fetchone()[0]
+            ids = [id_row[0] for id_row in self.conn.execute(
+                "SELECT id FROM avatars WHERE author_id = ? ORDER BY id LIMIT ? OFFSET ?", (row[0], limit, offset)
+            )]
+        return ids, total
+
+    def iter_matches(self, name_desc: str = '', author: str = '',
+                     platforms: Iterable[str] = ()) -> Iterator[Tuple[int, str, str, str]]:
+        """Yield (id, name, description, author) for every match, unordered.
+
+        The store lock is held until the generator is exhausted or closed, so
+        consume it in one go.
+        """
+        where, params = self._build_filter(name_desc, author, platforms)
+        with self.lock:
+            cursor = self.conn.execute(
+                f"SELECT a.id, a.name, a.description, au.name "
+                f"FROM avatars a JOIN authors au ON au.id = a.author_id {where}", params
+            )
+            cursor.row_factory = None
+            yield from cursor
+
+    def get_rows(self, ids: List[int]) -> List[Dict]:
+        """Fetch avatars by row id, returned in the order of ids."""
+        if not ids:
+            return []
+        placeholders = ",".join("?" * len(ids))
+        with self.lock:
+            rows = self.conn.execute(f"SELECT {AVATAR_COLUMNS} WHERE a.id IN ({placeholders})", ids).fetchall()
+        by_id = {row['id']: row for row in rows}
+        return [self.row_to_avatar(by_id[row_id]) for row_id in ids if row_id in by_id]
+
+    def tokens_for_variants(self, variants: Iterable[str]) -> List[Tuple[int, str]]:
+        """Return (token_id, token) for every indexed token sharing one of the delete variants."""
+        variants = list(variants)
+        placeholders = ",".join("?" * len(variants))
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT DISTINCT t.id, t.token FROM token_deletes d JOIN name_tokens t ON t.id = d.token_id "
+                f"WHERE d.variant IN ({placeholders})", variants
+            ).fetchall()
+
+    def token_postings(self, token_ids: List[int], row_ids: Optional[Iterable[int]] = None) -> List[Tuple[int, int]]:
+        """Return (token_id, avatar_rowid) for every avatar whose name has one of the tokens.
+
+        Passing row_ids restricts the lookup to those avatars, which turns a
+        long posting list scan into a few primary key probes.
+        """
+        placeholders = ",".join("?" * len(token_ids))
+        sql = f"SELECT token_id, avatar_rowid FROM token_avatars WHERE token_id IN ({placeholders})"
+        params = list(token_ids)
+        if row_ids is not None:
+            sql += " AND avatar_rowid IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(list(row_ids)))
+        with self.lock:
+            cursor = self.conn.execute(sql, params)
+            cursor.row_factory = None
+            return cursor.fetchall()
+
+    def posting_size(self, token_ids: List[int]) -> int:
+        placeholders = ",".join("?" * len(token_ids))
+        with self.lock:
+            return self.conn.execute(
+                f"SELECT COUNT(*) FROM token_avatars WHERE token_id IN ({placeholders})", list(token_ids)
+            ).fetchone()[0]
+
+    def filter_ids(self, ids: Iterable[int], name_desc: str = '', author: str = '',
+                   platforms: Iterable[str] = ()) -> List[int]:
+        """Keep only the row ids that also pass the regular search filters."""
+        where, params = self._build_filter(name_desc, author, platforms, use_fts=False)
+        return self.probe(ids, where[len("WHERE "):] or "1", params)
+
+    def probe(self, ids: Iterable[int], condition: str, params: list) -> List[int]:
+        """Return the ids whose row satisfies a SQL condition over avatars a / authors au."""
+        # Drive the query from the id list and test each row directly, an FTS
+        # lookup would have to produce every match first
+        with self.lock:
+            cursor = self.conn.execute(
+                f"SELECT a.id FROM json_each(?) j CROSS JOIN avatars a ON a.id = j.value "
+                f"JOIN authors au ON au.id = a.author_id WHERE {condition}", [json.dumps(list(ids))] + params
+            )
+            return [row[0] for row in cursor]
+
+    def all_rowids(self) -> Set[int]:
+        with self.lock:
+            return {row[0] for row in self.conn.execute("SELECT id FROM avatars")}
+
+    def iter_rows(self, ids: Iterable[int]) -> Iterator[Tuple[int, str, str, str]]:
+        """Yield (id, name, description, author) for the given ids, holding the lock like iter_matches."""
+        with self.lock:
+            cursor = self.conn.execute(
+                "SELECT a.id, a.name, a.description, au.name FROM json_each(?) j "
+                "CROSS JOIN avatars a ON a.id = j.value JOIN authors au ON au.id = a.author_id",
+                (json.dumps(list(ids)),)
+            )
+            cursor.row_factory = None
+            yield from cursor
+
+    def term_condition(self, field: str, value: str) -> Tuple[str, list]:
+        """SQL test for one query term, checked per row with contains() or the platform bits."""
+        if field == 'platform':
+            return "a.platforms & ? != 0", [platform_mask(value)]
+        if field == 'name':
+            return contains('a.name', value)
+        if field == 'description':
+            return contains('a.description', value)
+        if field == 'author':
+            return contains('au.name', value)
+        name_sql, name_params = contains('a.name', value)
+        description_sql, description_params = contains('a.description', value)
+        return f"({name_sql} OR {description_sql})", name_params + description_params
+
+    def term_rowids(self, field: str, value: str) -> Set[int]:
+        """Posting list for one query term, read from the best index for its field."""
+        if field == 'platform':
+            sql, params = "SELECT id FROM avatars WHERE platforms & ? != 0", [platform_mask(value)]
+        elif field == 'author':
+            where, params = self._build_filter('', value, ())
+            sql = f"SELECT a.id FROM avatars a JOIN authors au ON au.id = a.author_id {where}"
+        elif self.has_fts and len(value) >= FTS_MIN_QUERY:
+            columns = {'name': 'name', 'description': 'description'}.get(field, '{name description}')
+            sql, params = "SELECT rowid FROM avatars_fts WHERE avatars_fts MATCH ?", [f"{columns} : {fts_phrase(value)}"]
+        else:
+            condition, params = self.term_condition(field, value)
+            sql = f"SELECT a.id FROM avatars a JOIN authors au ON au.id = a.author_id WHERE {condition}"
+        with self.lock:
+            return {row[0] for row in self.conn.execute(sql, params)}
+
+    def estimate_term(self, field: str, value: str) -> int:
+        """Cheap upper bound on how many rows a query term matches."""
+        with self.lock:
+            if field == 'platform':
+                return self.conn.execute(
+                    "SELECT COUNT(*) FROM avatars WHERE platforms & ? != 0", (platform_mask(value),)
+                ).fetchone()[0]
+            if field == 'author':
+                where, params = self._build_filter('', value, ())
+                return self.conn.execute(
+                    f"SELECT COUNT(*) FROM avatars a JOIN authors au ON au.id = a.author_id {where}", params
+                ).fetchone()[0]
+            if self.has_fts and len(value) >= FTS_MIN_QUERY:
+                # A phrase matches at most as many rows as its rarest trigram
+                trigrams = list({value[i:i + 3] for i in range(len(value) - 2)})
+                placeholders = ",".join("?" * len(trigrams))
+                counts = self.conn.execute(
+                    f"SELECT term, doc FROM temp.avatars_fts_vocab WHERE term IN ({placeholders})", trigrams
+                ).fetchall()
+                if len(counts) < len(trigrams):
+                    return 0
+                return min(row['doc'] for row in counts)
+            return self.conn.execute("SELECT COUNT(*) FROM avatars").fetchone()[0]
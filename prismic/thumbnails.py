@@ -0,0 +1,80 @@
+"""Tile sized images kept on disk, keyed by image URL.
+
+The PNGs are written after the resize and before the platform labels are
+drawn, so a cached tile costs a small decode and no request. A URL names
+one version of an image, a new upload gets a new URL and a new file.
+"""
+import hashlib
+import io
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Union
+
+# Oldest files are pruned past this size
+MAX_BYTES = 256 * 1024 * 1024
+
+TILE_SIZE = (120, 120)
+
+def decode_tile(data: bytes):
+    """Decode image bytes to an RGBA PIL image of TILE_SIZE."""
+    from PIL import Image
+
+    img = Image.open(io.BytesIO(data)).convert("RGBA")
+    if img.size != TILE_SIZE:
+        img = img.resize(TILE_SIZE, Image.LANCZOS)  # Use LANCZOS for better quality
+    return img
+
+def encode_tile(img) -> bytes:
+    out = io.BytesIO()
+    img.save(out, format="PNG")
+    return out.getvalue()
+
+class ThumbnailCache:
+    def __init__(self, directory: Union[str, Path], max_bytes: int = MAX_BYTES):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    def path(self, url: str) -> Path:
+        return self.directory / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()}.png"
+
+    def get(self, url: str) -> Optional[bytes]:
+        try:
+            return self.path(url).read_bytes()
+        except OSError:
+            return None
+
+    def has(self, url: str) -> bool:
+        return self.path(url).is_file()
+
+    def put(self, url: str, data: bytes):
+        path = self.path(url)
+        temp = path.with_suffix(f".{os.getpid()}.{id(data)}.tmp")
+        try:
+            temp.write_bytes(data)
+            os.replace(temp, path)
+        except OSError as e:
+            logging.error(f"Error caching thumbnail {path.name}: {e}")
+            temp.unlink(missing_ok=True)
+
+    def prune(self) -> int:
+        """Delete the least recently written files until the cache fits, returns how many."""
+        files = []
+        total = 0
+        for path in self.directory.glob('*.png'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        return removed
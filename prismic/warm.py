@@ -0,0 +1,219 @@
+"""Fill the details and thumbnail caches ahead of time.
+
+    python -m prismic warm "cat ears" --platform quest --rate 5
+    python -m prismic warm --top-authors 50 --max-avatars 20000
+
+Walks a search result, or the avatars of the authors with the most
+avatars, a chunk at a time: details go through DetailsClient, so the
+image URLs land in the store exactly as the browser saves them, then the
+tile of every avatar whose thumbnail is not on disk yet is downloaded and
+written to the same ThumbnailCache. Every request waits on one shared
+RateLimiter, 429s push it back by Retry-After. An avatar whose details or
+tile cannot be fetched or decoded is counted as failed and skipped.
+
+After each chunk the position is written to the checkpoint file. Running
+the same job again continues from there, and avatars that are already
+warm cost no requests either way. The checkpoint is removed once the job
+finishes.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from prismic import profiling
+from prismic.details import DetailsClient
+from prismic.metrics import Metrics
+from prismic.thumbnails import ThumbnailCache, decode_tile, encode_tile
+
+API_BASE = os.environ.get("PRISMIC_API_BASE", "https://api.vrchat.cloud/api/1")
+
+CHUNK_SIZE = 100
+
+# Attempts per request when the API answers 429
+MAX_ATTEMPTS = 3
+
+class RateLimiter:
+    """Spaces requests from every thread evenly, rate per second (0 for no limit)."""
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.lock = threading.Lock()
+        self.next_at = time.monotonic()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            at = max(self.next_at, now)
+            self.next_at = at + self.interval
+        if at > now:
+            time.sleep(at - now)
+
+    def pause(self, seconds: float):
+        with self.lock:
+            self.next_at = max(self.next_at, time.monotonic() + seconds)
+
+class Checkpoint:
+    def __init__(self, path: Union[str, Path], job: Dict):
+        self.path = Path(path)
+        self.job = job
+
+    def load(self) -> int:
+        """Avatars of this job already done, 0 for a new or different job."""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if saved.get('job') != self.job:
+            print(f"Checkpoint {self.path} belongs to another job, starting over")
+            return 0
+        return int(saved.get('done', 0))
+
+    def save(self, done: int):
+        temp = self.path.with_suffix('.tmp')
+        with open(temp, 'w', encoding='utf-8') as f:
+            json.dump({'job': self.job, 'done': done, 'saved_at': time.time()}, f)
+        os.replace(temp, self.path)
+
+    def clear(self):
+        self.path.unlink(missing_ok=True)
+
+class Warmer:
+    def __init__(self, store, thumbnails: ThumbnailCache, headers: Dict[str, str], api_base: str = API_BASE,
+                 rate: float = 5.0, workers: int = 4):
+        self.thumbnails = thumbnails
+        self.headers = headers
+        self.api_base = api_base
+        self.workers = workers
+        self.limiter = RateLimiter(rate)
+        self.metrics = Metrics()
+        self.local = threading.local()
+
+        self.client = DetailsClient(api_base, headers, self.fetch_details, self.metrics)
+        self.client.store = store
+        self.client.limiter = self.limiter
+
+        self.lock = threading.Lock()
+        self.stats = {'avatars': 0, 'warm': 0, 'tiles': 0, 'missing': 0, 'failed': 0}
+
+    def count(self, key: str, n: int = 1):
+        with self.lock:
+            self.stats[key] += n
+
+    def session(self):
+        import requests
+
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+            session.headers.update(self.headers)
+        return session
+
+    def get(self, url: str, kind: str):
+        """GET under the rate limit, waiting out 429s. Returns the response or None."""
+        import requests
+
+        for attempt in range(MAX_ATTEMPTS):
+            self.limiter.acquire()
+            try:
+                with self.metrics.request(kind) as outcome:
+                    r = self.session().get(url, timeout=10)
+                    outcome['status'], outcome['bytes'] = r.status_code, len(r.content)
+            except requests.exceptions.RequestException as e:
+                logging.error(f"Error fetching {url}: {e}")
+                return None
+            if r.status_code != 429:
+                return r
+            retry_after = r.headers.get('Retry-After', '')
+            self.limiter.pause(float(retry_after) if retry_after.isdigit() else 2 ** attempt)
+        return r
+
+    def fetch_details(self, avatar_id: str) -> Optional[Dict]:
+        r = self.get(f"{self.api_base}/avatars/{avatar_id}", 'details')
+        if r is None:
+            self.count('failed')
+            return None
+        if r.status_code == 200:
+            try:
+                return r.json()
+            except ValueError as e:
+                # An HTML error or rate limit page instead of JSON
+                logging.error(f"Invalid details for avatar {avatar_id}: {e}")
+        elif r.status_code == 404:
+            self.count('missing')
+            return None
+        else:
+            logging.warning(f"Failed to fetch avatar {avatar_id}: Status {r.status_code}")
+        self.count('failed')
+        return None
+
+    def fetch_tile(self, url: str):
+        r = self.get(url, 'image')
+        if r is None or r.status_code != 200:
+            self.count('failed')
+            return
+        try:
+            self.thumbnails.put(url, encode_tile(decode_tile(r.content)))
+            self.count('tiles')
+        except Exception as e:
+            logging.error(f"Error decoding image {url}: {e}")
+            self.count('failed')
+
+    @profiling.timed('warm.chunk')
+    def warm(self, avatars: List[Dict]):
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            details = self.client.submit(avatars, executor)
+            tiles = []
+            for avatar in avatars:
+                try:
+                    result = details[avatar['avatar_id']].result()
+                except Exception as e:
+                    # One bad answer must not end the job before the checkpoint is saved
+                    logging.error(f"Error fetching details of {avatar['avatar_id']}: {e}")
+                    self.count('failed')
+                    continue
+                url = result and (result.get('imageUrl') or result.get('thumbnailImageUrl'))
+                if not url:
+                    continue
+                if self.thumbnails.has(url):
+                    self.count('warm')
+                else:
+                    tiles.append(executor.submit(self.fetch_tile, url))
+            for future in tiles:
+                try:
+                    future.result()
+                except Exception as e:
+                    logging.error(f"Error fetching tile: {e}")
+                    self.count('failed')
+        self.count('avatars', len(avatars))
+
+    def run(self, avatars: List[Dict], checkpoint: Optional[Checkpoint] = None) -> Dict:
+        done = checkpoint.load() if checkpoint else 0
+        if done:
+            print(f"Resuming after {done} of {len(avatars)} avatars")
+
+        start = time.perf_counter()
+        while done < len(avatars):
+            chunk = avatars[done:done + CHUNK_SIZE]
+            self.warm(chunk)
+            done += len(chunk)
+            if checkpoint:
+                checkpoint.save(done)
+            self.report(done, len(avatars), time.perf_counter() - start)
+
+        if checkpoint:
+            checkpoint.clear()
+        return dict(self.stats, seconds=time.perf_counter() - start)
+
+    def report(self, done: int, total: int, elapsed: float):
+        snapshot = self.metrics.drain()
+        print(f"{done}/{total} avatars  {self.stats['avatars'] / elapsed:.1f} avatars/s  "
+              f"{snapshot['requests'] / elapsed:.1f} req/s  {snapshot['requests']} requests  "
+              f"{snapshot['bytes'] / 1e6:.1f} MB  {self.stats['tiles']} tiles fetched  "
+              f"{self.stats['warm']} already warm  {self.stats['missing']} missing  {self.stats['failed']} failed")
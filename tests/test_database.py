@@ -0,0 +1,129 @@
+import json
+
+import pytest
+
+from prismic.database import AvatarDatabase
+
+
+def avatar(avatar_id, name, platforms, author='Tyty', description=''):
+    return {'avatar_id': avatar_id, 'name': name, 'author': author, 'description': description, 'platforms': platforms}
+
+
+CACHED = [
+    avatar('avtr_1', 'Cat', ['PC']),
+    avatar('avtr_2', 'Fox', ['PC', 'iOS']),
+    avatar('avtr_3', 'Dog', ['iOS']),
+    avatar('avtr_4', 'Owl', ['Quest']),
+]
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = AvatarDatabase(tmp_path)
+    with open(db.cache_path, 'w', encoding='utf-8') as f:
+        json.dump(CACHED, f)
+    return db
+
+
+def fetch(db, monkeypatch, fetched):
+    """Run process_database with each platform returning fetched[platform] or raising it."""
+    def get_prismic_obj(url, platform, progress=None, known=None):
+        result = fetched[platform]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(db, 'get_prismic_obj', get_prismic_obj)
+    return db.process_database()
+
+
+def by_id(avatars):
+    return {avatar['avatar_id']: avatar for avatar in avatars}
+
+
+def test_failed_platform_keeps_its_cached_entries(db, monkeypatch):
+    main_data = fetch(db, monkeypatch, {
+        'PC': [avatar('avtr_1', 'Cat', ['PC']), avatar('avtr_2', 'Fox', ['PC']), avatar('avtr_5', 'Bee', ['PC'])],
+        'Quest': None,
+        'iOS': IOError('404 Client Error'),
+    })
+
+    assert db.failed_platforms == ['iOS']
+    avatars = by_id(main_data)
+    assert avatars['avtr_2']['platforms'] == ['PC', 'iOS']
+    assert avatars['avtr_3']['platforms'] == ['iOS']
+
+    delta = db.compute_delta(db.cached_data(), main_data)
+    assert delta['removed'] == []
+    assert delta['updated'] == []
+    assert [added['avatar_id'] for added in delta['added']] == ['avtr_5']
+
+
+def test_unchanged_files_skip_the_update(db, monkeypatch):
+    assert fetch(db, monkeypatch, {'PC': None, 'Quest': None, 'iOS': None}) is None
+
+
+def test_update_fails_when_nothing_could_be_fetched(db, monkeypatch):
+    monkeypatch.setattr(db, 'get_prismic_obj', lambda *args, **kwargs: (_ for _ in ()).throw(IOError('offline')))
+    with pytest.raises(RuntimeError):
+        db.update()
+    assert json.loads(db.cache_path.read_text(encoding='utf-8')) == CACHED
+
+
+def test_compute_delta(db):
+    new = [
+        avatar('avtr_1', 'Cat', ['PC']),
+        avatar('avtr_2', 'Fox', ['PC'], description='now with a tail'),
+        avatar('avtr_4', 'Owl', ['Quest']),
+        avatar('avtr_5', 'Bee', ['PC']),
+    ]
+    delta = db.compute_delta(CACHED, new)
+    assert [added['avatar_id'] for added in delta['added']] == ['avtr_5']
+    assert delta['removed'] == ['avtr_3']
+    assert delta['updated'] == [
+        {'avatar_id': 'avtr_2', 'fields': {'platforms': ['PC'], 'description': 'now with a tail'}}
+    ]
+    assert db.compute_delta(CACHED, CACHED) == {'added': [], 'removed': [], 'updated': []}
+
+
+def test_compute_delta_never_removes_failed_platforms(db):
+    new = [avatar('avtr_1', 'Cat', ['PC']), avatar('avtr_2', 'Fox', ['PC']), avatar('avtr_4', 'Owl', ['Quest'])]
+    assert db.compute_delta(CACHED, new, failed=['iOS'])['removed'] == []
+    assert db.compute_delta(CACHED, new[:2], failed=['iOS'])['removed'] == ['avtr_4']
+
+
+def test_update_cache_with_failed_platform(db):
+    db.update_cache(CACHED)
+    db.failed_platforms = ['iOS']
+    summary = db.update_cache([avatar('avtr_1', 'Cat', ['PC']), avatar('avtr_4', 'Owl', ['Quest'])])
+    assert summary['removed'] == 0
+
+    store = db.open_store()
+    try:
+        assert store.search(platforms=['iOS'])[1] == 2
+    finally:
+        store.close()
+    reloaded = by_id(AvatarDatabase(db.cache_dir).load_cache())
+    assert {'avtr_2', 'avtr_3'} <= reloaded.keys()
+
+
+def test_update_cache_log_replays_to_the_same_data(db):
+    db.update_cache(CACHED)
+    new = [
+        avatar('avtr_1', 'Cat Girl', ['PC']),
+        avatar('avtr_2', 'Fox', ['PC', 'iOS']),
+        avatar('avtr_4', 'Owl', ['Quest', 'iOS']),
+        avatar('avtr_5', 'Bee', ['PC']),
+    ]
+    summary = db.update_cache(new)
+    assert summary == {'added': 1, 'removed': 1, 'updated': 2}
+    assert by_id(AvatarDatabase(db.cache_dir).load_cache()) == by_id(new)
+
+    store = db.open_store()
+    try:
+        assert store.count() == len(new)
+        assert store.get_avatar('avtr_1')['name'] == 'Cat Girl'
+        assert store.get_avatar('avtr_3') is None
+        assert store.search(platforms=['iOS'])[1] == 2
+    finally:
+        store.close()
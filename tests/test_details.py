@@ -0,0 +1,220 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import pytest
+
+from prismic.details import DetailsClient
+
+
+class RecordingExecutor(ThreadPoolExecutor):
+    """Keeps the futures of every task so a test can check none of them failed."""
+    def __init__(self):
+        super().__init__(max_workers=4)
+        self.tasks = []
+
+    def submit(self, fn, *args, **kwargs):
+        task = super().submit(fn, *args, **kwargs)
+        self.tasks.append(task)
+        return task
+
+    def errors(self):
+        self.shutdown(wait=True)
+        return [task.exception() for task in self.tasks if task.exception() is not None]
+
+
+class FakeApi:
+    """fetch_one and list_author stand-ins that count calls and can hold requests open."""
+    def __init__(self):
+        self.fetched = []
+        self.listed = []
+        self.release = threading.Event()
+        self.release.set()
+        self.started = threading.Event()
+
+    def fetch_one(self, avatar_id):
+        self.fetched.append(avatar_id)
+        self.started.set()
+        self.release.wait(5)
+        return {'id': avatar_id, 'authorId': 'usr_1', 'imageUrl': f"https://img/{avatar_id}"}
+
+    def list_author(self, user_id, wanted):
+        self.listed.append(user_id)
+        self.started.set()
+        self.release.wait(5)
+        return {avatar_id: {'id': avatar_id, 'imageUrl': f"https://img/{avatar_id}"} for avatar_id in wanted}
+
+
+def avatars(*ids, author='Tyty'):
+    return [{'avatar_id': avatar_id, 'author': author} for avatar_id in ids]
+
+
+@pytest.fixture
+def api():
+    return FakeApi()
+
+
+@pytest.fixture
+def client(api, monkeypatch):
+    client = DetailsClient('https://api.invalid', {}, api.fetch_one)
+    monkeypatch.setattr(client, 'list_author', api.list_author)
+    return client
+
+
+def test_details_resolve(client, api):
+    executor = RecordingExecutor()
+    futures = client.submit(avatars('avtr_1', 'avtr_2', 'avtr_3') + avatars('avtr_4', author='Solo'), executor)
+    wait(futures.values(), timeout=5)
+    assert {avatar_id: future.result()['id'] for avatar_id, future in futures.items()} == {
+        'avtr_1': 'avtr_1', 'avtr_2': 'avtr_2', 'avtr_3': 'avtr_3', 'avtr_4': 'avtr_4'
+    }
+    # The first avatar names the author, the rest come from one list
+    assert api.listed == ['usr_1']
+    assert sorted(api.fetched) == ['avtr_1', 'avtr_4']
+    assert executor.errors() == []
+
+
+def test_cancelled_before_start_makes_no_requests(client, api):
+    cancel = threading.Event()
+    cancel.set()
+    executor = RecordingExecutor()
+    futures = client.submit(avatars('avtr_1', 'avtr_2', 'avtr_3') + avatars('avtr_4', author='Solo'), executor, cancel)
+    assert executor.errors() == []
+    assert all(future.cancelled() for future in futures.values())
+    assert api.fetched == [] and api.listed == []
+
+
+def test_group_with_every_future_cancelled_skips_the_list(client, api):
+    client.user_ids['Tyty'] = 'usr_1'
+    api.release.clear()
+    executor = RecordingExecutor()
+    # Occupy every worker so the group task is still queued when its futures get cancelled
+    blockers = [executor.submit(api.release.wait, 5) for _ in range(4)]
+    futures = client.submit(avatars('avtr_1', 'avtr_2'), executor)
+    for future in futures.values():
+        future.cancel()
+    api.release.set()
+    wait(blockers)
+    assert executor.errors() == []
+    assert api.listed == [] and api.fetched == []
+
+
+@pytest.mark.parametrize('known_author', [False, True], ids=['fetch', 'list'])
+def test_cancelling_in_flight_requests(client, api, known_author):
+    if known_author:
+        client.user_ids['Tyty'] = 'usr_1'
+    api.release.clear()
+    executor = RecordingExecutor()
+    futures = client.submit(avatars('avtr_1', 'avtr_2', 'avtr_3'), executor)
+    assert api.started.wait(5)
+
+    # The page moved on while the request was under way, its late result is dropped
+    futures['avtr_2'].cancel()
+    api.release.set()
+    wait([futures['avtr_1'], futures['avtr_3']], timeout=5)
+
+    assert executor.errors() == []
+    assert futures['avtr_2'].cancelled()
+    assert futures['avtr_1'].result()['id'] == 'avtr_1'
+    assert futures['avtr_3'].result()['id'] == 'avtr_3'
+
+
+@pytest.fixture
+def stub():
+    from benchmarks.stub_api import StubVRChat
+
+    avatars = {f"avtr_{author}_{i}": {'author': author, 'name': f"{author} {i}"}
+               for author in ('Tyty', 'Solo') for i in range(3)}
+    server = StubVRChat(avatars=avatars).start()
+    yield server
+    server.stop()
+
+
+def page(server):
+    return [{'avatar_id': avatar_id, 'author': avatar['author']} for avatar_id, avatar in server.avatars.items()]
+
+
+def round_trips(server):
+    return server.requests.get('avatar', 0) + server.requests.get('avatar_list', 0)
+
+
+def load(client, avatars):
+    executor = RecordingExecutor()
+    futures = client.submit(avatars, executor)
+    wait(futures.values(), timeout=10)
+    assert executor.errors() == []
+    return {avatar_id: future.result() for avatar_id, future in futures.items()}
+
+
+def stub_client(server):
+    import requests
+
+    def fetch_one(avatar_id):
+        r = requests.get(f"{server.api_base}/avatars/{avatar_id}", timeout=10)
+        return r.json() if r.status_code == 200 else None
+
+    return DetailsClient(server.api_base, {}, fetch_one)
+
+
+def test_listed_authors_cost_one_list(stub):
+    client = stub_client(stub)
+    assert all(load(client, page(stub)).values())
+    assert stub.requests['avatar_list'] == 2
+    # Everything is cached now
+    before = round_trips(stub)
+    load(client, page(stub))
+    assert round_trips(stub) == before
+
+
+def test_unlisted_authors_are_not_listed_again(stub):
+    stub.listable_rate = 0.0
+    client = stub_client(stub)
+    assert all(load(client, page(stub)).values())
+    assert stub.requests['avatar_list'] == 2
+
+    client.cache.clear()
+    load(client, page(stub))
+    assert stub.requests['avatar_list'] == 2
+    assert not client.listable('Tyty')
+
+
+def test_refused_listing_stops_all_lists(stub):
+    stub.list_status = 403
+    client = stub_client(stub)
+    assert all(load(client, page(stub)).values())
+    assert client.listing_refused
+    lists = stub.requests['avatar_list']
+    assert lists <= 2
+
+    client.cache.clear()
+    load(client, page(stub))
+    assert stub.requests['avatar_list'] == lists
+
+
+def test_avatars_missing_from_a_full_list_are_fetched(stub):
+    # The list holds public avatars only, a private one still has details
+    client = stub_client(stub)
+    avatars = page(stub) + [{'avatar_id': 'avtr_private', 'author': 'Tyty'}]
+    details = load(client, avatars)
+    assert details['avtr_private']['id'] == 'avtr_private'
+    assert all(details.values())
+
+
+def test_failed_refresh_forgets_the_stale_url(tmp_path):
+    from prismic.store import AvatarStore
+
+    store = AvatarStore(tmp_path / 'avatars.db')
+    store.save_image_urls([('avtr_gone', 'https://img/gone', None, 0.0),
+                           ('avtr_kept', 'https://img/kept', None, 0.0)])
+    client = DetailsClient('https://api.invalid', {},
+                           lambda avatar_id: None if avatar_id == 'avtr_gone' else {'id': avatar_id, 'imageUrl': 'https://img/new'})
+    client.store = store
+    try:
+        futures = client.submit(avatars('avtr_gone') + avatars('avtr_kept', author='Solo'), RecordingExecutor())
+        # The page still gets the stored URLs, the refresh runs behind it
+        assert futures['avtr_gone'].result()['imageUrl'] == 'https://img/gone'
+        client.refresher.shutdown(wait=True)
+        stored = store.image_urls(['avtr_gone', 'avtr_kept'])
+        assert 'avtr_gone' not in stored
+        assert stored['avtr_kept']['imageUrl'] == 'https://img/new'
+    finally:
+        store.close()
@@ -0,0 +1,36 @@
+import threading
+
+from prismic import profiling
+
+
+def test_parallel_stage_passes_profile_one_at_a_time(monkeypatch):
+    profiler = profiling.Profiler()
+    profiler.enabled = True
+    profiler.stage = 'parse'
+    monkeypatch.setattr(profiling, 'profiler', profiler)
+
+    inside = threading.Barrier(3)
+    errors = []
+
+    def parse():
+        try:
+            with profiling.timer('parse'):
+                inside.wait(timeout=5)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=parse) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert profiler.timings['parse'][0] == 3
+    assert len(profiler.stage_profiles) == 1
+    assert not profiler.stage_lock.locked()
+
+    # The next pass gets profiled again
+    with profiling.timer('parse'):
+        pass
+    assert len(profiler.stage_profiles) == 2
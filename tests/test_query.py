@@ -0,0 +1,98 @@
+import pytest
+
+from prismic.query import Not, Term, lex, parse_query
+from prismic.search import SearchEngine
+from prismic.store import AvatarStore
+
+
+def shape(node):
+    """Nested tuples for comparing trees, terms as (field, value)."""
+    if node is None:
+        return None
+    if isinstance(node, Term):
+        return node.field, node.value
+    if isinstance(node, Not):
+        return 'NOT', shape(node.child)
+    return type(node).__name__.upper(), [shape(child) for child in node.children]
+
+
+def test_adjacent_terms_are_anded():
+    assert shape(parse_query('cat ears')) == ('AND', [('any', 'cat'), ('any', 'ears')])
+
+
+def test_keyword_operators():
+    assert shape(parse_query('cat OR dog')) == ('OR', [('any', 'cat'), ('any', 'dog')])
+    assert shape(parse_query('cat NOT girl')) == ('AND', [('any', 'cat'), ('NOT', ('any', 'girl'))])
+    assert shape(parse_query('cat AND dog')) == ('AND', [('any', 'cat'), ('any', 'dog')])
+
+
+def test_symbol_operators_match_keywords():
+    assert shape(parse_query('cat | dog')) == shape(parse_query('cat OR dog'))
+    assert shape(parse_query('cat -girl')) == shape(parse_query('cat NOT girl'))
+
+
+def test_terms_are_lowercased_keywords_are_not():
+    assert shape(parse_query('Cat OR DOG')) == ('OR', [('any', 'cat'), ('any', 'dog')])
+    # Lowercase operators are ordinary words, so "or" can still be searched for
+    assert shape(parse_query('cat or dog')) == ('AND', [('any', 'cat'), ('any', 'or'), ('any', 'dog')])
+
+
+def test_fields_and_quotes():
+    assert shape(parse_query('Author:Tyty "Cat Ears"')) == ('AND', [('author', 'tyty'), ('any', 'cat ears')])
+    assert shape(parse_query('by:tyty platform:quest')) == ('AND', [('author', 'tyty'), ('platform', 'quest')])
+    assert shape(parse_query('name: Cat')) == shape(parse_query('name:cat')) == ('name', 'cat')
+    # Unknown prefixes are part of the word
+    assert shape(parse_query('foo:bar')) == ('any', 'foo:bar')
+
+
+def test_grouping_and_precedence():
+    assert shape(parse_query('(cat | fox) -girl')) == (
+        'AND', [('OR', [('any', 'cat'), ('any', 'fox')]), ('NOT', ('any', 'girl'))]
+    )
+    assert shape(parse_query('a b OR c')) == ('OR', [('AND', [('any', 'a'), ('any', 'b')]), ('any', 'c')])
+
+
+def test_sloppy_input_is_tolerated():
+    assert parse_query('') is None
+    assert parse_query('   ') is None
+    assert parse_query('OR') is None
+    assert shape(parse_query('cat OR')) == ('any', 'cat')
+    assert shape(parse_query('(cat')) == ('any', 'cat')
+    assert shape(parse_query('cat) dog')) == ('AND', [('any', 'cat'), ('any', 'dog')])
+
+
+def test_lex_tokens():
+    assert [kind for kind, _ in lex('a OR -(b)')] == ['TERM', 'OR', 'NOT', '(', 'TERM', ')']
+
+
+UNICODE_AVATARS = [
+    {'avatar_id': 'avtr_1', 'name': 'Кошка Neon', 'author': 'Мила', 'description': '', 'platforms': ['PC']},
+    {'avatar_id': 'avtr_2', 'name': 'Neon Dog', 'author': 'Tyty', 'description': '', 'platforms': ['PC']},
+    {'avatar_id': 'avtr_3', 'name': 'Cat ÆRØ', 'author': 'Tyty', 'description': '', 'platforms': ['Quest']},
+    {'avatar_id': 'avtr_4', 'name': 'cat ærø', 'author': 'Ålesund', 'description': 'Øl', 'platforms': ['PC']},
+]
+
+
+@pytest.fixture(params=[True, False], ids=['fts', 'like'])
+def engine(request, tmp_path):
+    store = AvatarStore(tmp_path / 'avatars.db')
+    if not request.param:
+        store.has_fts = False
+    store.rebuild(UNICODE_AVATARS)
+    yield SearchEngine(store)
+    store.close()
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('кошка', ['avtr_1']),
+    ('neon -кошка', ['avtr_2']),
+    ('neon NOT КОШКА', ['avtr_2']),
+    ('cat ærø', ['avtr_3', 'avtr_4']),
+    ('CAT ÆRØ', ['avtr_3', 'avtr_4']),
+    ('ærø -author:ålesund', ['avtr_3']),
+    ('author:мила | desc:øl', ['avtr_1', 'avtr_4']),
+])
+def test_non_ascii_terms_ignore_case_on_every_path(engine, query, expected):
+    avatars, total = engine.search(query)
+    assert sorted(avatar['avatar_id'] for avatar in avatars) == expected
+    assert total == len(expected)
@@ -0,0 +1,133 @@
+import gzip
+import http.client
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from prismic import server as avatar_server
+from prismic.store import AvatarStore
+
+AVATARS = [
+    {'avatar_id': f"avtr_{i:03d}", 'name': f"{'Cat' if i % 2 else 'Dog'} {i} with a fairly long name",
+     'author': f"Author {i % 4}", 'description': f"description number {i}",
+     'platforms': ['PC', 'Quest'] if i % 3 else ['iOS']}
+    for i in range(120)
+]
+
+
+@pytest.fixture(scope='module')
+def server(tmp_path_factory):
+    db_path = tmp_path_factory.mktemp('server') / 'avatars.db'
+    store = AvatarStore(db_path)
+    store.rebuild(AVATARS)
+    store.close()
+
+    server = avatar_server.AvatarServer(db_path, workers=4)
+    thread = threading.Thread(target=lambda: avatar_server.asyncio.run(server.serve('127.0.0.1', 0)), daemon=True)
+    thread.start()
+    assert server.listening.wait(5)
+    yield server
+    server.stop()
+    thread.join(5)
+    server.close()
+
+
+def request(server, target, method='GET', headers=None, connection=None):
+    conn = connection or http.client.HTTPConnection(*server.address, timeout=10)
+    conn.request(method, target, headers=headers or {})
+    response = conn.getresponse()
+    body = response.read()
+    if connection is None:
+        conn.close()
+    if response.getheader('Content-Encoding') == 'gzip':
+        body = gzip.decompress(body)
+    return response, json.loads(body) if body else None
+
+
+def test_search(server):
+    response, result = request(server, '/search?q=cat&limit=10')
+    assert response.status == 200
+    assert result['total'] == 60 and result['limit'] == 10 and result['next_offset'] == 10
+    assert len(result['avatars']) == 10
+    assert all('cat' in avatar['name'].lower() for avatar in result['avatars'])
+
+
+def test_search_filters_and_paging(server):
+    _, result = request(server, '/search?q=cat&platform=ios&platform=PC&offset=50&limit=20')
+    assert result['total'] == 60 and result['next_offset'] is None
+    _, result = request(server, '/search?platform=ios')
+    assert result['total'] == 40
+    _, result = request(server, '/search?by_author=Author%201&limit=500')
+    assert result['total'] == 30 and {avatar['author'] for avatar in result['avatars']} == {'Author 1'}
+    _, result = request(server, '/search?q=dog&limit=100000')
+    assert result['limit'] == avatar_server.MAX_LIMIT
+
+
+def test_avatar_and_authors(server):
+    response, avatar = request(server, '/avatar/avtr_007')
+    assert response.status == 200 and avatar == AVATARS[7]
+    _, result = request(server, '/authors?q=author')
+    assert result['total'] == 4
+    assert {author['avatars'] for author in result['authors']} == {30}
+
+
+@pytest.mark.parametrize('target, status', [
+    ('/avatar/avtr_missing', 404),
+    ('/nowhere', 404),
+    ('/', 404),
+    ('/search?limit=abc', 400),
+    ('/search?offset=-1', 400),
+    ('/search?platform=xbox', 400),
+])
+def test_errors(server, target, status):
+    response, result = request(server, target)
+    assert response.status == status
+    assert result['error']
+
+
+def test_method_not_allowed(server):
+    response, _ = request(server, '/search', method='POST')
+    assert response.status == 405
+
+
+def test_gzip_negotiation(server):
+    response, plain = request(server, '/search?q=cat')
+    assert response.getheader('Content-Encoding') is None
+    assert response.getheader('Vary') == 'Accept-Encoding'
+
+    response, zipped = request(server, '/search?q=cat', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.getheader('Content-Encoding') == 'gzip'
+    assert zipped == plain
+
+    # Small bodies are not worth compressing
+    response, _ = request(server, '/avatar/avtr_001', headers={'Accept-Encoding': 'gzip'})
+    assert response.getheader('Content-Encoding') is None
+
+
+def test_head_and_keep_alive(server):
+    conn = http.client.HTTPConnection(*server.address, timeout=10)
+    try:
+        response, body = request(server, '/search?q=cat', method='HEAD', connection=conn)
+        assert response.status == 200 and body is None
+        assert int(response.getheader('Content-Length')) > 0
+        # Same connection, next request
+        response, result = request(server, '/search?q=dog', connection=conn)
+        assert response.status == 200 and result['total'] == 60
+    finally:
+        conn.close()
+
+
+def test_concurrent_requests_use_a_connection_per_thread(server):
+    targets = [f"/search?q={word}&offset={offset}" for word in ('cat', 'dog', 'fairly', 'number')
+               for offset in range(0, 40, 5)]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        results = list(pool.map(lambda target: request(server, target), targets))
+
+    assert all(response.status == 200 for response, _ in results)
+    assert [result['total'] for _, result in results] == [60] * 16 + [120] * 16
+    with server.stores_lock:
+        stores = list(server.stores)
+    assert 1 < len(stores) <= 4
+    assert len({id(store.conn) for store in stores}) == len(stores)
@@ -0,0 +1,150 @@
+import pytest
+
+from prismic.search import SearchEngine
+from prismic.store import AvatarStore
+
+AVATARS = [
+    {'avatar_id': 'avtr_1', 'name': 'Cat Girl', 'author': 'Tyty', 'description': 'cute cat', 'platforms': ['PC']},
+    {'avatar_id': 'avtr_2', 'name': 'Fox Boy', 'author': 'Tyty', 'description': 'orange fox', 'platforms': ['PC', 'Quest']},
+    {'avatar_id': 'avtr_3', 'name': 'Dog', 'author': 'Someone', 'description': 'good dog', 'platforms': ['Quest']},
+    {'avatar_id': 'avtr_4', 'name': 'Catfish', 'author': 'Angler', 'description': 'a fish', 'platforms': ['iOS']},
+    {'avatar_id': 'avtr_5', 'name': 'Robot', 'author': 'Someone', 'description': 'beep, not a cat', 'platforms': ['PC']},
+]
+
+
+@pytest.fixture(params=[True, False], ids=['fts', 'like'])
+def store(request, tmp_path):
+    store = AvatarStore(tmp_path / 'avatars.db')
+    if not request.param:
+        # As on a SQLite built without FTS5
+        store.has_fts = False
+    store.rebuild(AVATARS)
+    yield store
+    store.close()
+
+
+def ids(avatars):
+    return sorted(avatar['avatar_id'] for avatar in avatars)
+
+
+def test_rows_round_trip(store):
+    assert store.count() == len(AVATARS)
+    assert store.get_avatar('avtr_2') == AVATARS[1]
+
+
+def test_store_search(store):
+    assert ids(store.search('cat')[0]) == ['avtr_1', 'avtr_4', 'avtr_5']
+    assert ids(store.search('cat', author='tyty')[0]) == ['avtr_1']
+    assert ids(store.search('', platforms=['Quest'])[0]) == ['avtr_2', 'avtr_3']
+    assert store.search('zebra') == ([], 0)
+
+
+def test_store_search_pages(store):
+    first, total = store.search(offset=0, limit=2)
+    second, _ = store.search(offset=2, limit=2)
+    assert total == len(AVATARS)
+    assert ids(first + second) == ['avtr_1', 'avtr_2', 'avtr_3', 'avtr_4']
+
+
+def test_by_author(store):
+    avatars, total = store.by_author('Someone')
+    assert total == 2 and ids(avatars) == ['avtr_3', 'avtr_5']
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('cat', ['avtr_1', 'avtr_4', 'avtr_5']),
+    ('cat OR dog', ['avtr_1', 'avtr_3', 'avtr_4', 'avtr_5']),
+    ('cat | dog', ['avtr_1', 'avtr_3', 'avtr_4', 'avtr_5']),
+    ('cat NOT girl', ['avtr_4', 'avtr_5']),
+    ('cat -girl', ['avtr_4', 'avtr_5']),
+    ('author:tyty cat', ['avtr_1']),
+    ('by:someone', ['avtr_3', 'avtr_5']),
+    ('name:cat platform:ios', ['avtr_4']),
+    ('(fox | dog) -author:tyty', ['avtr_3']),
+    ('"orange fox"', ['avtr_2']),
+])
+def test_engine_query_syntax(store, query, expected):
+    avatars, total = SearchEngine(store).search(query)
+    assert ids(avatars) == expected
+    assert total == len(expected)
+
+
+def test_engine_filters_and_ranking(store):
+    engine = SearchEngine(store)
+    avatars, total = engine.search('cat', author='tyty')
+    assert ids(avatars) == ['avtr_1'] and total == 1
+    # A name hit outranks a description hit
+    avatars, _ = engine.search('cat')
+    assert avatars[-1]['avatar_id'] == 'avtr_5'
+
+
+def test_engine_query_case(store):
+    engine = SearchEngine(store)
+    assert ids(engine.search('CAT  OR   Dog')[0]) == ['avtr_1', 'avtr_3', 'avtr_4', 'avtr_5']
+    # Lowercase "or" is a word to look for, not an operator
+    assert engine.search('cat or dog') == ([], 0)
+
+
+def test_engine_fuzzy(store):
+    avatars, _ = SearchEngine(store).search('rbot', fuzzy=True)
+    assert ids(avatars) == ['avtr_5']
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('cat -girl', []),
+    ('robt -girl', ['avtr_5']),
+    ('robt -beep', []),
+    ('robt author:someone', ['avtr_5']),
+    ('robt author:tyty', []),
+    ('cat OR dog', ['avtr_1', 'avtr_3', 'avtr_4', 'avtr_5']),
+    ('name:cat', ['avtr_1', 'avtr_4']),
+    ('author:tyty cat', ['avtr_1']),
+])
+def test_engine_fuzzy_query_syntax(store, query, expected):
+    avatars, total = SearchEngine(store).search(query, fuzzy=True)
+    assert ids(avatars) == expected
+    assert total == len(expected)
+
+
+def test_engine_cache_key_is_the_parsed_query(store):
+    engine = SearchEngine(store)
+    for query in ('cat', 'Cat', '  CAT ', '"cat"'):
+        assert ids(engine.search(query)[0]) == ['avtr_1', 'avtr_4', 'avtr_5']
+    for query in ('name:cat', 'name: cat', 'Name:CAT'):
+        assert ids(engine.search(query)[0]) == ['avtr_1', 'avtr_4']
+    assert engine.cache_misses == 2
+    assert engine.cache_hits == 5
+
+
+def test_engine_cache_follows_store(store):
+    engine = SearchEngine(store)
+    assert engine.search('dog')[1] == 1
+    store.rebuild(AVATARS[:2])
+    assert engine.search('dog')[1] == 0
+
+
+def test_apply_delta(store):
+    store.apply_delta({
+        'added': [{'avatar_id': 'avtr_6', 'name': 'Bunny', 'author': 'Newcomer', 'description': 'hops',
+                   'platforms': ['Quest']}],
+        'removed': ['avtr_3'],
+        'updated': [{'avatar_id': 'avtr_1', 'fields': {'name': 'Cat Lady', 'platforms': ['PC', 'iOS']}},
+                    {'avatar_id': 'avtr_missing', 'fields': {'name': 'Ignored'}}],
+    })
+    assert store.count() == len(AVATARS)
+    assert store.get_avatar('avtr_3') is None
+    assert store.get_avatar('avtr_1')['platforms'] == ['PC', 'iOS']
+
+    engine = SearchEngine(store)
+    assert ids(engine.search('lady')[0]) == ['avtr_1']
+    assert engine.search('girl') == ([], 0)
+    assert ids(engine.search('author:newcomer')[0]) == ['avtr_6']
+    assert engine.search('dog') == ([], 0)
+    assert ids(engine.search('bunyy', fuzzy=True)[0]) == ['avtr_6']
+    # The author of the removed avatar keeps their other avatar
+    assert store.by_author('Someone')[1] == 1
+
+
+def test_apply_delta_removes_orphaned_authors(store):
+    store.apply_delta({'added': [], 'removed': ['avtr_4'], 'updated': []})
+    assert store.search_authors('angler') == ([], 0)
@@ -0,0 +1,88 @@
+import time
+
+from ui_bus import UIBus
+
+
+class FakeRoot:
+    """Records root.after calls instead of running a Tk loop."""
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, fn, *args):
+        self.scheduled.append(ms)
+
+
+def started_bus(budget_ms=8):
+    bus = UIBus(FakeRoot(), budget_ms=budget_ms)
+    bus.start()
+    return bus
+
+
+def test_posts_run_in_order_before_newer_latest_values():
+    bus = started_bus()
+    calls = []
+    bus.post_latest('progress', calls.append, 'progress 10')
+    bus.post(calls.append, 'start page')
+    bus.post_latest('progress', calls.append, 'progress 20')
+    bus.post_latest('progress', calls.append, 'progress 30')
+    bus.post(calls.append, 'tile')
+    bus.drain()
+    # The first progress value was replaced before it ran, the newest one runs after what preceded it
+    assert calls == ['start page', 'tile', 'progress 30']
+
+
+def test_latest_values_coalesce_per_key():
+    bus = started_bus()
+    calls = []
+    for value in range(100):
+        bus.post_latest('avatars', calls.append, ('avatars', value))
+        bus.post_latest('images', calls.append, ('images', value))
+    bus.drain()
+    assert calls == [('avatars', 99), ('images', 99)]
+
+
+def test_drain_stops_at_the_budget_and_keeps_order():
+    bus = started_bus(budget_ms=8)
+    calls = []
+
+    def slow(value):
+        time.sleep(0.003)
+        calls.append(value)
+
+    for value in range(10):
+        bus.post(slow, value)
+    bus.post_latest('progress', calls.append, 'progress')
+
+    start = time.perf_counter()
+    bus.drain()
+    elapsed = time.perf_counter() - start
+    ran = len(calls)
+    assert 1 <= ran < 10
+    assert elapsed < 0.008 + 0.01
+    # Work is left, so the next drain comes straight back
+    assert bus.root.scheduled[-1] == 1
+    # The progress value was posted after the queued events and waits for them
+    assert 'progress' not in calls
+
+    while bus.root.scheduled[-1] == 1:
+        bus.drain()
+    assert calls == list(range(10)) + ['progress']
+    assert bus.root.scheduled[-1] == bus.interval_ms
+
+
+def test_failing_update_does_not_stop_the_drain():
+    bus = started_bus()
+    calls = []
+    bus.post(lambda: 1 / 0)
+    bus.post(calls.append, 'after')
+    bus.drain()
+    assert calls == ['after']
+
+
+def test_stopped_bus_runs_nothing():
+    bus = started_bus()
+    calls = []
+    bus.post(calls.append, 'ignored')
+    bus.stop()
+    bus.drain()
+    assert calls == []
@@ -0,0 +1,58 @@
+import json
+
+import pytest
+
+from benchmarks.stub_api import StubHandler, StubVRChat
+from prismic import warm
+from prismic.store import AvatarStore
+from prismic.thumbnails import ThumbnailCache
+
+AVATARS = [{'avatar_id': f"avtr_{i}", 'author': f"Author {i % 3}", 'name': f"Avatar {i}"} for i in range(12)]
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    api_avatar = StubHandler.api_avatar
+
+    def html_for_bad_ids(handler, avatar_id, select=False):
+        # What a proxy or rate limit page looks like to fetch_details
+        if avatar_id in ('avtr_4', 'avtr_7'):
+            handler.send(200, b'<html><body>Slow down</body></html>', 'text/html')
+        else:
+            api_avatar(handler, avatar_id, select)
+
+    monkeypatch.setattr(StubHandler, 'api_avatar', html_for_bad_ids)
+    server = StubVRChat(avatars={avatar['avatar_id']: avatar for avatar in AVATARS}, image_size=64).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def warmer(stub, tmp_path, monkeypatch):
+    monkeypatch.setattr(warm, 'CHUNK_SIZE', 5)
+    store = AvatarStore(tmp_path / 'avatars.db')
+    yield warm.Warmer(store, ThumbnailCache(tmp_path / 'thumbnails'), {}, stub.api_base, rate=0)
+    store.close()
+
+
+def test_bad_answers_are_skipped(warmer, tmp_path):
+    checkpoint = warm.Checkpoint(tmp_path / 'checkpoint.json', {'job': 'test'})
+    stats = warmer.run(AVATARS, checkpoint)
+    assert stats['avatars'] == len(AVATARS)
+    assert stats['failed'] == 2
+    assert stats['tiles'] == len(AVATARS) - 2
+    assert not checkpoint.path.exists()
+
+
+def test_job_resumes_from_checkpoint(warmer, stub, tmp_path):
+    checkpoint = warm.Checkpoint(tmp_path / 'checkpoint.json', {'job': 'test'})
+    checkpoint.path.write_text(json.dumps({'job': {'job': 'test'}, 'done': 10}))
+    stats = warmer.run(AVATARS, checkpoint)
+    assert stats['avatars'] == 2
+    assert stub.requests['image'] == 2
+
+
+def test_checkpoint_of_another_job_starts_over(tmp_path):
+    warm.Checkpoint(tmp_path / 'checkpoint.json', {'query': 'cat'}).save(40)
+    assert warm.Checkpoint(tmp_path / 'checkpoint.json', {'query': 'cat'}).load() == 40
+    assert warm.Checkpoint(tmp_path / 'checkpoint.json', {'query': 'dog'}).load() == 0
@@ -0,0 +1,82 @@
+import itertools
+import logging
+import queue
+import threading
+import time
+
+class UIBus:
+    """Hand UI work from worker threads to the Tk thread.
+
+    Workers post callables, the Tk thread runs them from root.after in
+    batches that stop after budget_ms so a flood of tiles never freezes
+    the window. post_latest keeps only the newest call per key, which is
+    what progress bars want: a hundred updates collapse into one redraw.
+
+    Everything runs in the order it was posted. A latest value waits until
+    the posts queued before it have run, so a start_page that resets a
+    bar is never applied after the newer progress that followed it.
+    """
+    def __init__(self, root, budget_ms: float = 8, interval_ms: int = 16):
+        self.root = root
+        self.budget = budget_ms / 1000
+        self.interval_ms = interval_ms
+        self.events = queue.SimpleQueue()
+        self.latest = {}
+        self.latest_lock = threading.Lock()
+        self.sequence = itertools.count()
+        self.held = None  # The next event, taken off the queue when the budget ran out
+        self.running = False
+
+    def post(self, fn, *args):
+        with self.latest_lock:
+            self.events.put((next(self.sequence), fn, args))
+
+    def post_latest(self, key, fn, *args):
+        with self.latest_lock:
+            self.latest[key] = (next(self.sequence), fn, args)
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self.root.after(self.interval_ms, self.drain)
+
+    def stop(self):
+        self.running = False
+
+    def run(self, fn, args):
+        try:
+            fn(*args)
+        except Exception:
+            logging.exception("UI update failed")
+
+    def drain(self):
+        if not self.running:
+            return
+        deadline = time.perf_counter() + self.budget
+
+        while True:
+            if self.held is None:
+                try:
+                    self.held = self.events.get_nowait()
+                except queue.Empty:
+                    break
+            if time.perf_counter() >= deadline:
+                break
+            _, fn, args = self.held
+            self.held = None
+            self.run(fn, args)
+        backlog = self.held is not None
+
+        # Latest values posted before the first event still queued are due now
+        with self.latest_lock:
+            if backlog:
+                due = {key: entry for key, entry in self.latest.items() if entry[0] < self.held[0]}
+                for key in due:
+                    del self.latest[key]
+            else:
+                due, self.latest = self.latest, {}
+        for _, fn, args in sorted(due.values(), key=lambda entry: entry[0]):
+            self.run(fn, args)
+
+        # Come straight back while work is queued, otherwise poll at frame rate
+        self.root.after(1 if backlog else self.interval_ms, self.drain)